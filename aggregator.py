@@ -1,95 +1,378 @@
-import websocket
-import json
+import argparse
 import threading
 import time
 import pickle
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-import requests
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 from textblob import TextBlob
+from snapshot import SnapshotWriter, atomic_write
+from market_state import MarketState
+from quote_board import QuoteBoard
+from tick_history import TickHistory
+from bars import BarEngine
+from tick_log import TickLogWriter, TickLogReader
+from feed_engine import FeedEngine, CoinbaseAdapter, KrakenAdapter
+from products import ProductRegistry
+from frame_capture import FrameRecorder
+from metrics import MetricsRegistry, MetricsServer
+from market_feed import MarketPublisher, parse_address
+from consolidated import ConsolidatedBook
+from order_book import OrderBookStore
+from sentiment_fetcher import SentimentFetcher
+from sentiment_cache import SentimentCache
+from sentiment_batch import BatchSentimentScorer
+from sentiment_aggregator import IncrementalSentiment
+from correlation import CorrelationEngine
+from latency import LatencyTracker, EXCHANGE_TO_RECEIVE, RECEIVE_TO_UPDATE, UPDATE_TO_BOARD, UPDATE_TO_PICKLE
+
+# Subscribe to Coinbase level2_batch and Kraken book channels alongside tickers (--order-books).
+# Off by default: level2_batch carries no sequence numbers, so a dropped Coinbase update
+# goes unnoticed until the book crosses; only Kraken's books are checksummed.
+ENABLE_ORDER_BOOKS = False
+
+# Products to subscribe to per exchange; edits are picked up while running
+PRODUCTS_FILE = Path('products.json')
 
 class MarketDataAggregator:
-    def __init__(self):
-        self.data = {}
-        self.lock = threading.Lock()
+    def __init__(self, subreddits=None, news_urls=None):
+        # Quotes are sharded per exchange; readers use self.market.snapshot() and never lock
+        self.market = MarketState()
+        self.sentiment_lock = threading.Lock()
+        # Optional MarketPublisher streaming deltas to dashboards
+        self.publisher = None
         self.data_file = Path('market_data.pkl')
         self.sentiment_file = Path('sentiment_data.pkl')
+        self.board_file = Path('quote_board.bin')
+        self.quote_board = None
+        self.history = TickHistory(capacity=100_000)
+        # 1s/1m/5m/1h OHLCV bars per product, updated on every tick
+        self.bars = BarEngine(capacity=1000)
+        self.bars_file = Path('bars.pkl')
+        self.tick_log_dir = Path('tick_log')
+        # One tick log writer per exchange, each used only under that exchange's shard lock
+        self.tick_logs = None
+        # Set by FeedEngine.replay: ticks then carry capture time, and clock() follows them
+        self.replaying = False
+        self.last_tick_time = None
+        # Per-exchange (market, bars) DirtyCounters, each marked only under that exchange's shard lock
+        self.dirty = {}
+        self.consolidated = ConsolidatedBook()
+        self.depth_file = Path('order_book.pkl')
+        self.latency_file = Path('latency_stats.pkl')
+        self.latency = LatencyTracker()
+        self.books = OrderBookStore(on_update=lambda book: self.depth_writer.mark_dirty())
         self.sentiment_data = {
             'reddit': [],
             'news': [],
             'overall_sentiment': 0,
             'last_update': None
         }
+        # Sentiment sources; point these at a local stub server for testing
+        self.subreddits = list(subreddits or ['cryptocurrency', 'bitcoin', 'ethereum'])
+        self.reddit_url = 'https://www.reddit.com/r/{subreddit}/hot.json?limit=10'
+        self.news_urls = list(news_urls or ['https://min-api.cryptocompare.com/data/v2/news/?lang=EN'])
+        self.fetcher = SentimentFetcher()
+        self.sentiment_cache = SentimentCache(Path('sentiment_cache.db'))
+        self.sentiment_scorer = BatchSentimentScorer()
+        # Running, time-decayed sentiment plus the most recent distinct items for display
+        self.sentiment_aggregator = IncrementalSentiment(half_life=3600.0)
+        self.recent_reddit = deque(maxlen=20)
+        self.recent_news = deque(maxlen=20)
+        # Sentiment vs. return correlations, precomputed for the dashboard
+        self.correlations = CorrelationEngine(interval=60.0)
+        self.correlation_file = Path('correlation.pkl')
+        # Pipeline metrics, served in Prometheus format by MetricsServer
+        self.metrics = MetricsRegistry()
+        self.update_seconds = self.metrics.histogram(
+            'aggregator_update_seconds', 'update_data duration', ['exchange'])
+        self.lock_wait_seconds = self.metrics.histogram(
+            'aggregator_lock_wait_seconds', 'Time update_data waited for its shard lock', ['exchange'])
+        self.flush_seconds = self.metrics.histogram(
+            'snapshot_flush_seconds', 'Time to pickle and write a snapshot', ['snapshot'])
+        self.fetch_seconds = self.metrics.histogram(
+            'sentiment_fetch_seconds', 'Sentiment source request duration', ['source'])
+        self.fetch_errors = self.metrics.counter(
+            'sentiment_fetch_errors_total', 'Failed sentiment source requests', ['source'])
+        self.board_full = self.metrics.counter(
+            'quote_board_full_total', 'Quotes dropped because the quote board had no free slot', ['exchange'])
+        # Products already reported as missing from a full quote board
+        self.board_misses = set()
+        # Market data is flushed to disk by a background writer rather than on every tick;
+        # it pickles a point-in-time snapshot, so it needs no lock
+        self.snapshot_writer = SnapshotWriter(
+            self.data_file,
+            self.market.snapshot,
+            interval=1.0,
+            max_updates=500,
+            on_flush=self._on_market_flush
+        )
+        self.depth_writer = SnapshotWriter(
+            self.depth_file,
+            lambda: self.books.depth_snapshot(10),
+            self.books.lock,
+            interval=1.0,
+            max_updates=1000,
+            on_flush=lambda coalesced, duration, lag_ns: self.flush_seconds.labels('depth').observe(duration)
+        )
+        # Takes each shard lock per product itself, so the writer needs no lock of its own
+        self.bars_writer = SnapshotWriter(
+            self.bars_file,
+            self.bars_snapshot,
+            interval=1.0,
+            max_updates=5000,
+            on_flush=lambda coalesced, duration, lag_ns: self.flush_seconds.labels('bars').observe(duration)
+        )
+    
+    @property
+    def data(self):
+        """Read-only {exchange: {product: quote}} view of the latest quotes"""
+        return self.market.snapshot()
+    
+    def bars_snapshot(self, limit=120):
+        """{exchange: {product: {resolution: columns}}} of the newest bars, for the dashboard's charts"""
+        return {exchange: self.bars.snapshot(exchange, limit, shard.lock)
+                for exchange, shard in list(self.market.shards.items())}
+    
+    def _on_market_flush(self, coalesced, duration, lag_ns):
+        self.latency.record('all', UPDATE_TO_PICKLE, lag_ns)
+        self.flush_seconds.labels('market').observe(duration)
+    
+    def use_output_dir(self, directory):
+        """Write every snapshot file and the quote board under directory instead of the working directory.
         
-    def update_data(self, exchange, product, bid, ask, volume):
-        """Thread-safe data update"""
-        with self.lock:
-            if exchange not in self.data:
-                self.data[exchange] = {}
-            
+        Must be called before the writers start. Replays use this so they
+        never overwrite the live aggregator's files.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ('data_file', 'sentiment_file', 'board_file', 'bars_file', 'depth_file',
+                     'latency_file', 'correlation_file'):
+            setattr(self, name, directory / getattr(self, name).name)
+        self.tick_log_dir = directory / self.tick_log_dir.name
+        self.snapshot_writer.path = self.data_file
+        self.depth_writer.path = self.depth_file
+        self.bars_writer.path = self.bars_file
+    
+    def open_quote_board(self, capacity=64):
+        """Create the shared-memory quote board that display.py reads from"""
+        try:
+            self.quote_board = QuoteBoard(self.board_file, capacity=capacity, create=True)
+        except Exception as e:
+            print(f"Error creating quote board: {e}")
+            self.quote_board = None
+    
+    def reserve_quote_board(self, products):
+        """Replace the quote board with one twice as large once `products` no longer fit.
+        
+        Slots still held by products that have not been released count too.
+        Every current quote is copied across while all shard locks are held, so
+        no tick is lost; display.py notices the new file and remaps it.
+        """
+        board = self.quote_board
+        if board is None:
+            return
+        products = max(products, board.used())
+        if products <= board.capacity:
+            return
+        shards = sorted(self.market.shards.items())
+        for _, shard in shards:
+            shard.lock.acquire()
+        try:
+            grown = QuoteBoard(self.board_file, capacity=2 * products, create=True)
+            for exchange, shard in shards:
+                for product, quote in shard.snapshot().items():
+                    grown.publish(exchange, product, quote['bid'], quote['ask'], quote['spread'],
+                                  quote['spread_percent'], quote['volume'], quote['timestamp'])
+            # The old mapping is left to the garbage collector in case a shard
+            # created after the locks were taken is still writing to it
+            self.quote_board = grown
+            self.board_misses.clear()
+            print(f"Quote board grown to {grown.capacity} slots")
+        except Exception as e:
+            print(f"Error growing quote board: {e}")
+        finally:
+            for _, shard in shards:
+                shard.lock.release()
+    
+    def open_tick_log(self):
+        """Start persisting every tick to the append-only binary tick log"""
+        self.tick_logs = {}
+    
+    def flush_tick_log(self):
+        """Make buffered ticks visible to tick log readers"""
+        for exchange, tick_log in list((self.tick_logs or {}).items()):
+            with self.market.shard(exchange).lock:
+                tick_log.flush()
+    
+    def close_tick_log(self):
+        tick_logs, self.tick_logs = self.tick_logs or {}, None
+        for exchange, tick_log in tick_logs.items():
+            with self.market.shard(exchange).lock:
+                tick_log.close()
+        
+    def clock(self):
+        """Current time on the ticks' clock: wall time when live, the newest tick's capture time in a replay"""
+        if self.replaying and self.last_tick_time is not None:
+            return self.last_tick_time
+        return time.time()
+    
+    def update_data(self, exchange, product, bid, ask, volume, exchange_time=None, receive_ns=None, timestamp=None):
+        """Thread-safe data update
+        
+        exchange_time is the exchange's own event time (epoch seconds) and
+        receive_ns the time.monotonic_ns() at which the frame arrived; both
+        feed the per-stage latency histograms. timestamp stamps the tick
+        instead of the current time; replays pass the captured wall time.
+        """
+        if receive_ns is None:
+            receive_ns = time.monotonic_ns()
+        start_ns = time.perf_counter_ns()
+        
+        shard = self.market.shard(exchange)
+        with shard.lock:
+            locked_ns = time.perf_counter_ns()
             spread = ask - bid
             spread_percent = (spread / bid) * 100 if bid > 0 else 0
+            now = time.time() if timestamp is None else timestamp
+            self.last_tick_time = now
+            update_ns = time.monotonic_ns()
             
-            self.data[exchange][product] = {
-                'bid': bid,
-                'ask': ask,
-                'spread': spread,
-                'spread_percent': spread_percent,
-                'volume': volume,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+            shard.update(product, bid, ask, spread, spread_percent, volume, now, exchange_time, receive_ns)
             
-            # Save data to file for Streamlit to read
-            self.save_data()
+            self.history.append(exchange, product, now, bid, ask, volume)
+            self.bars.update(exchange, product, now, bid, ask, volume)
+            if self.tick_logs is not None:
+                tick_log = self.tick_logs.get(exchange)
+                if tick_log is None:
+                    tick_log = self.tick_logs[exchange] = TickLogWriter(self.tick_log_dir)
+                tick_log.append(exchange, product, now, bid, ask, volume)
+            
+            board_ns = None
+            if self.quote_board is not None:
+                if self.quote_board.publish(exchange, product, bid, ask, spread, spread_percent, volume, now):
+                    board_ns = time.monotonic_ns()
+                else:
+                    self.board_full.labels(exchange).inc()
+                    if (exchange, product) not in self.board_misses:
+                        self.board_misses.add((exchange, product))
+                        print(f"Quote board full ({self.quote_board.capacity} slots), "
+                              f"{exchange} {product} is only in the pickle snapshot")
+            
+            # Counted per shard, so the snapshot writers' shared condition is rarely touched
+            dirty = self.dirty.get(exchange)
+            if dirty is None:
+                dirty = self.dirty[exchange] = (self.snapshot_writer.counter(), self.bars_writer.counter())
+            dirty[0].mark()
+            dirty[1].mark()
+        
+        # The consolidated book is shared across venues, but locked per instrument
+        self.consolidated.update(exchange, product, bid, ask, now)
+        
+        self.latency.record(exchange, RECEIVE_TO_UPDATE, update_ns - receive_ns)
+        if board_ns is not None:
+            self.latency.record(exchange, UPDATE_TO_BOARD, board_ns - update_ns)
+        if exchange_time is not None:
+            receive_time = now - (update_ns - receive_ns) / 1e9
+            self.latency.record(exchange, EXCHANGE_TO_RECEIVE, int((receive_time - exchange_time) * 1e9))
+        
+        self.lock_wait_seconds.labels(exchange).observe((locked_ns - start_ns) / 1e9)
+        self.update_seconds.labels(exchange).observe((time.perf_counter_ns() - start_ns) / 1e9)
+    
+    def remove_products(self, exchange, products):
+        """Forget unsubscribed products: their quotes, board slots, history, bars and consolidated entries"""
+        shard = self.market.shard(exchange)
+        with shard.lock:
+            shard.remove(products)
+            for product in products:
+                if self.quote_board is not None:
+                    self.quote_board.release(exchange, product)
+                self.board_misses.discard((exchange, product))
+                self.history.remove(exchange, product)
+                self.bars.remove(exchange, product)
+        self.drop_venue(exchange, products)
+    
+    def drop_venue(self, exchange, products=None):
+        """Take an exchange's quotes (all of them, or just `products`) out of the consolidated book"""
+        self.consolidated.remove(exchange, products)
     
     def save_data(self):
-        """Save data to pickle file"""
-        try:
-            with open(self.data_file, 'wb') as f:
-                pickle.dump(self.data, f)
-        except Exception as e:
-            print(f"Error saving data: {e}")
+        """Force an immediate snapshot of the market data"""
+        return self.snapshot_writer.flush()
     
     def analyze_sentiment(self, text):
-        """Analyze sentiment using TextBlob"""
+        """Analyze sentiment, reusing cached scores for text seen before"""
+        try:
+            return self.sentiment_cache.get_or_compute(text, self.score_sentiment)
+        except:
+            return 0
+    
+    def analyze_sentiment_batch(self, texts):
+        """Analyze many texts at once: cached scores are reused and misses are scored in one batch"""
+        scorer = self.sentiment_scorer.name
+        scores = [self.sentiment_cache.get(text, scorer) for text in texts]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        
+        if missing:
+            try:
+                computed = self.sentiment_scorer.score([texts[i] for i in missing])
+            except Exception as e:
+                print(f"Error in batch sentiment scoring, falling back to TextBlob: {e}")
+                computed = [self.score_sentiment(texts[i]) for i in missing]
+                scorer = 'textblob'
+            for i, score in zip(missing, computed):
+                scores[i] = score
+                self.sentiment_cache.put(texts[i], score, scorer)
+        
+        return scores
+    
+    def score_sentiment(self, text):
+        """Score text with TextBlob"""
         try:
             analysis = TextBlob(text)
             return analysis.sentiment.polarity
         except:
             return 0
     
+    def record_fetch(self, source, result):
+        """Feed one sentiment request into the fetch metrics"""
+        self.fetch_seconds.labels(source).observe(result.elapsed)
+        if not result.ok:
+            self.fetch_errors.labels(source).inc()
+    
     def fetch_reddit_sentiment(self):
         """Fetch posts from crypto subreddits"""
         try:
-            subreddits = ['cryptocurrency', 'bitcoin', 'ethereum']
             reddit_sentiments = []
             
-            for subreddit in subreddits:
-                url = f'https://www.reddit.com/r/{subreddit}/hot.json?limit=10'
-                headers = {'User-Agent': 'CryptoSentimentBot/1.0'}
-                
-                print(f"  Fetching r/{subreddit}...")
-                response = requests.get(url, headers=headers, timeout=10)
-                print(f"  Status: {response.status_code}")
+            print(f"  Fetching {', '.join('r/' + subreddit for subreddit in self.subreddits)}...")
+            urls = [self.reddit_url.format(subreddit=subreddit) for subreddit in self.subreddits]
+            results = self.fetcher.fetch_many(urls)
+            
+            for subreddit, result in zip(self.subreddits, results):
+                status = 'not modified' if result.not_modified else result.status or result.error
+                print(f"  r/{subreddit} Status: {status} ({result.elapsed:.2f}s)")
+                self.record_fetch(f'r/{subreddit}', result)
                 
-                if response.status_code == 200:
-                    data = response.json()
+                if result.ok:
+                    data = result.data
                     
                     for post in data['data']['children']:
-                        title = post['data']['title']
-                        sentiment = self.analyze_sentiment(title)
-                        
                         reddit_sentiments.append({
+                            'id': post['data'].get('name') or post['data'].get('permalink'),
                             'source': f'r/{subreddit}',
-                            'text': title,
-                            'sentiment': sentiment,
+                            'text': post['data']['title'],
                             'score': post['data']['score'],
                             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                         })
                     
                     print(f"   Fetched {len(data['data']['children'])} posts")
-                
-                time.sleep(2)
+            
+            scores = self.analyze_sentiment_batch([item['text'] for item in reddit_sentiments])
+            for item, sentiment in zip(reddit_sentiments, scores):
+                item['sentiment'] = sentiment
             
             print(f"Total Reddit posts: {len(reddit_sentiments)}")
             return reddit_sentiments
@@ -105,29 +388,28 @@ class MarketDataAggregator:
             print("  Fetching crypto news...")
             news_sentiments = []
             
-            url = 'https://min-api.cryptocompare.com/data/v2/news/?lang=EN'
-            
-            response = requests.get(url, timeout=10)
-            print(f"  News API Status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
+            for result in self.fetcher.fetch_many(self.news_urls):
+                status = 'not modified' if result.not_modified else result.status or result.error
+                print(f"  News API Status: {status} ({result.elapsed:.2f}s)")
+                self.record_fetch(urlsplit(result.url).netloc, result)
                 
-                if 'Data' in data:
-                    for article in data['Data'][:10]:
-                        title = article.get('title', '')
-                        sentiment = self.analyze_sentiment(title)
-                        
-                        news_sentiments.append({
-                            'source': article.get('source', 'Unknown'),
-                            'text': title,
-                            'sentiment': sentiment,
-                            'url': article.get('url', ''),
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        })
+                if result.ok:
+                    data = result.data
                     
-                    print(f"   Fetched {len(news_sentiments)} news articles")
+                    if 'Data' in data:
+                        for article in data['Data'][:10]:
+                            news_sentiments.append({
+                                'source': article.get('source', 'Unknown'),
+                                'text': article.get('title', ''),
+                                'url': article.get('url', ''),
+                                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                            })
+            
+            scores = self.analyze_sentiment_batch([item['text'] for item in news_sentiments])
+            for item, sentiment in zip(news_sentiments, scores):
+                item['sentiment'] = sentiment
             
+            print(f"   Fetched {len(news_sentiments)} news articles")
             return news_sentiments
         except Exception as e:
             print(f" Error fetching news: {e}")
@@ -139,163 +421,306 @@ class MarketDataAggregator:
         """Update sentiment analysis data"""
         print("\nFetching sentiment data...")
         
-        reddit_data = self.fetch_reddit_sentiment()
-        news_data = self.fetch_crypto_news()
+        # Reddit and news are fetched concurrently; each fans out over its own sources
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            reddit_future = executor.submit(self.fetch_reddit_sentiment)
+            news_future = executor.submit(self.fetch_crypto_news)
+            reddit_data = reddit_future.result()
+            news_data = news_future.result()
         
         print(f"\nSummary:")
         print(f"  Reddit posts: {len(reddit_data)}")
         print(f"  News articles: {len(news_data)}")
         
+        self.sentiment_cache.flush()
+        cache_stats = self.sentiment_cache.stats()
+        print(f"  Sentiment cache: {cache_stats['memory_hits']} memory hits, "
+              f"{cache_stats['disk_hits']} disk hits, {cache_stats['misses']} misses "
+              f"({cache_stats['hit_rate']:.0%} hit rate)")
+        
         if reddit_data or news_data:
-            all_sentiments = [item['sentiment'] for item in reddit_data + news_data]
-            overall_sentiment = sum(all_sentiments) / len(all_sentiments) if all_sentiments else 0
+            # Only items not seen in earlier refreshes touch the running sums
+            fresh_reddit = self.sentiment_aggregator.add(reddit_data)
+            fresh_news = self.sentiment_aggregator.add(news_data)
+            overall_sentiment = self.sentiment_aggregator.record()
+            timestamps, values = self.sentiment_aggregator.history.arrays()
             
+            print(f"  New items: {len(fresh_reddit)} Reddit, {len(fresh_news)} news")
             print(f"  Overall sentiment: {overall_sentiment:.3f}")
             
-            with self.lock:
+            with self.sentiment_lock:
+                self.recent_reddit.extend(fresh_reddit)
+                self.recent_news.extend(fresh_news)
                 self.sentiment_data = {
-                    'reddit': reddit_data[-20:],
-                    'news': news_data[-20:],
+                    'reddit': list(self.recent_reddit),
+                    'news': list(self.recent_news),
                     'overall_sentiment': overall_sentiment,
+                    'sources': self.sentiment_aggregator.by_source(),
+                    'history': list(zip(timestamps.tolist(), values.tolist())),
                     'last_update': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 }
-                
-                try:
-                    with open(self.sentiment_file, 'wb') as f:
-                        pickle.dump(self.sentiment_data, f)
-                    print(f" Sentiment data saved to {self.sentiment_file}")
-                except Exception as e:
-                    print(f" Error saving sentiment data: {e}")
+                payload = pickle.dumps(self.sentiment_data)
+            
+            try:
+                atomic_write(self.sentiment_file, payload)
+                print(f" Sentiment data saved to {self.sentiment_file}")
+            except Exception as e:
+                print(f" Error saving sentiment data: {e}")
+            if self.publisher is not None:
+                self.publisher.publish_sentiment(self.sentiment_data)
         else:
             print(" No sentiment data collected")
     
+    def save_latency_stats(self):
+        """Write latency percentiles for the dashboard's latency panel"""
+        try:
+            atomic_write(self.latency_file, pickle.dumps(self.latency.summary()))
+        except Exception as e:
+            print(f"Error saving latency stats: {e}")
+    
+    def seed_correlations(self, products):
+        """Rebuild the correlation trackers from the saved sentiment series and the tick log.
+        
+        products is {exchange: [product, ...]}; without this the correlations
+        start empty after every restart and need hours of samples again.
+        """
+        try:
+            with open(self.sentiment_file, 'rb') as f:
+                history = pickle.load(f).get('history') or []
+        except Exception:
+            history = []
+        if not history:
+            return
+        timestamps, values = zip(*history)
+        reader = TickLogReader(self.tick_log_dir)
+        # One extra interval so the first grid point has a mid to return from
+        t0 = timestamps[0] - self.correlations.interval
+        prices = {}
+        for exchange, symbols in products.items():
+            for product in symbols:
+                ticks = reader.read(exchange, product, t0, timestamps[-1])
+                if len(ticks):
+                    prices[(exchange, product)] = (ticks['timestamp'], (ticks['bid'] + ticks['ask']) * 0.5)
+        try:
+            self.correlations.seed(timestamps, values, prices)
+            atomic_write(self.correlation_file, pickle.dumps(self.correlations.results()))
+        except Exception as e:
+            print(f"Error seeding correlations: {e}")
+            return
+        print(f"Correlations seeded from {len(history)} sentiment samples and {len(prices)} tick logs")
+    
+    def update_correlations(self, now=None):
+        """Sample sentiment and mid prices if a sampling interval has passed and save the correlations"""
+        if now is None:
+            now = time.time()
+        # Nothing to correlate until the first sentiment refresh
+        if not self.sentiment_aggregator.sources or not self.correlations.due(now):
+            return
+        self.correlations.sample(now, self.sentiment_aggregator.overall(now), self.market.snapshot())
+        try:
+            atomic_write(self.correlation_file, pickle.dumps(self.correlations.results()))
+        except Exception as e:
+            print(f"Error saving correlations: {e}")
+    
+    def book_summary(self, exchange, product, levels=10, size=1.0):
+        """Top-of-book depth totals and VWAP fill prices for a given size, or None without a synced book"""
+        with self.books.lock:
+            book = self.books.books.get((exchange, product))
+            if book is None or not book.synced:
+                return None
+            top = book.top(levels)
+            buy_vwap, _ = book.vwap_fill('buy', size)
+            sell_vwap, _ = book.vwap_fill('sell', size)
+        if buy_vwap is None or sell_vwap is None:
+            return None
+        return {
+            'bid_size': sum(level[1] for level in top['bids']),
+            'ask_size': sum(level[1] for level in top['asks']),
+            'buy_vwap': buy_vwap,
+            'sell_vwap': sell_vwap
+        }
+    
     def display_data(self):
         """Display aggregated data"""
-        with self.lock:
-            print("\n" + "="*80)
-            print(f"{'MARKET DATA AGGREGATOR':^80}")
-            print(f"{'Updated: ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S'):^80}")
-            print("="*80)
+        # Work from point-in-time copies so slow console output never holds up the feeds
+        market = self.market.snapshot()
+        now = self.clock()
+        consolidated = self.consolidated.snapshot(now)
+        
+        print("\n" + "="*80)
+        print(f"{'MARKET DATA AGGREGATOR':^80}")
+        print(f"{'Updated: ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S'):^80}")
+        print("="*80)
+        
+        for exchange, products in market.items():
+            print(f"\n{exchange.upper()}")
+            print("-" * 80)
             
-            for exchange, products in self.data.items():
-                print(f"\n{exchange.upper()}")
-                print("-" * 80)
+            shard = self.market.shard(exchange)
+            for product, data in products.items():
+                # Tick history and bars are written under the shard lock; read them under it too
+                with shard.lock:
+                    spread_range = self.history.spread_range(exchange, product, 60, now)
+                    mean_mid = self.history.mean_mid(exchange, product, 60, now) if spread_range is not None else None
+                    bar = self.bars.get(exchange, product, 60)
+                    bar = bar.current() if bar is not None else None
                 
-                for product, data in products.items():
-                    print(f"\n  Product: {product}")
-                    print(f"  Best Bid: ${data['bid']:,.2f}")
-                    print(f"  Best Ask: ${data['ask']:,.2f}")
-                    print(f"  Spread: ${data['spread']:.2f} ({data['spread_percent']:.3f}%)")
-                    print(f"  24h Volume: {data['volume']:,.2f}")
-                    print(f"  Last Update: {data['timestamp']}")
+                print(f"\n  Product: {product}")
+                print(f"  Best Bid: ${data['bid']:,.2f}")
+                print(f"  Best Ask: ${data['ask']:,.2f}")
+                print(f"  Spread: ${data['spread']:.2f} ({data['spread_percent']:.3f}%)")
+                print(f"  24h Volume: {data['volume']:,.2f}")
+                print(f"  Last Update: {datetime.fromtimestamp(data['timestamp']).strftime('%Y-%m-%d %H:%M:%S')}")
+                
+                if spread_range is not None:
+                    print(f"  1m Spread: ${spread_range[0]:.2f} - ${spread_range[1]:.2f}, Mean Mid: ${mean_mid:,.2f}")
+                
+                if bar is not None:
+                    _, open_, high, low, close, volume, vwap, _ = bar
+                    print(f"  1m Bar: O ${open_:,.2f} H ${high:,.2f} L ${low:,.2f} C ${close:,.2f}, "
+                          f"Vol {volume:,.4f}, VWAP ${vwap:,.2f}")
+                
+                depth = self.book_summary(exchange, product)
+                if depth is not None:
+                    print(f"  Depth (top 10): {depth['bid_size']:,.4f} bid / {depth['ask_size']:,.4f} ask, "
+                          f"Buy 1.0 VWAP: ${depth['buy_vwap']:,.2f}, Sell 1.0 VWAP: ${depth['sell_vwap']:,.2f}")
+        
+        if consolidated:
+            print("\nCONSOLIDATED (BEST ACROSS EXCHANGES)")
+            print("-" * 80)
             
-            print("\n" + "="*80 + "\n")
+            for symbol, book in consolidated.items():
+                print(f"\n  Instrument: {symbol} ({book['venues']} venues)")
+                print(f"  Best Bid: ${book['best_bid']:,.2f} ({book['bid_exchange']})")
+                print(f"  Best Ask: ${book['best_ask']:,.2f} ({book['ask_exchange']})")
+                print(f"  Spread: ${book['spread']:.2f} ({book['spread_percent']:.3f}%)")
+                if book['arbitrage']:
+                    print(f"  ARBITRAGE: buy {book['ask_exchange']}, sell {book['bid_exchange']} "
+                          f"for ${book['arbitrage_edge']:.2f}")
+        
+        latency = self.latency.summary()
+        if latency:
+            print("\nLATENCY (ms)")
+            print("-" * 80)
+            print(f"  {'Feed':<10}{'Stage':<20}{'Count':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'Max':>10}")
+            for feed, stages in latency.items():
+                for stage, summary in stages.items():
+                    print(f"  {feed:<10}{stage:<20}{summary['count']:>10}{summary['p50_ms']:>10.3f}"
+                          f"{summary['p90_ms']:>10.3f}{summary['p99_ms']:>10.3f}{summary['max_ms']:>10.3f}")
+        
+        stats = self.snapshot_writer.stats()
+        print(f"\nSnapshots: {stats['flushes']} flushes, "
+              f"{stats['last_flush_updates']} updates in last flush "
+              f"(avg {stats['avg_updates_per_flush']:.1f}), "
+              f"{stats['last_flush_ms']:.2f} ms")
+        
+        print("\n" + "="*80 + "\n")
 
 # Global aggregator instance
 aggregator = MarketDataAggregator()
+product_registry = ProductRegistry.load(PRODUCTS_FILE)
 
-# ============= COINBASE WEBSOCKET =============
-def coinbase_on_message(ws, message):
-    data = json.loads(message)
-    
-    if data.get('type') == 'ticker':
-        product = data.get('product_id')
-        best_bid = float(data.get('best_bid', 0))
-        best_ask = float(data.get('best_ask', 0))
-        volume_24h = float(data.get('volume_24h', 0))
-        
-        aggregator.update_data('coinbase', product, best_bid, best_ask, volume_24h)
-
-def coinbase_on_error(ws, error):
-    print(f"Coinbase Error: {error}")
+# Set by --capture; FeedEngine records every raw frame into it
+frame_recorder = None
 
-def coinbase_on_close(ws, close_status_code, close_msg):
-    print("Coinbase connection closed")
+# ============= EXCHANGE ADAPTERS =============
+# FeedEngine owns the connections; the adapters parse frames and build subscriptions
+coinbase_adapter = CoinbaseAdapter(product_registry.products('coinbase'),
+                                   books=aggregator.books if ENABLE_ORDER_BOOKS else None)
+kraken_adapter = KrakenAdapter(product_registry.products('kraken'),
+                               books=aggregator.books if ENABLE_ORDER_BOOKS else None)
 
-def coinbase_on_open(ws):
-    print(" Connected to Coinbase")
+# ============= MAIN EXECUTION =============
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crypto market data and sentiment aggregator")
+    parser.add_argument('--capture', nargs='?', const='', metavar='PATH',
+                        help='record every raw exchange frame to a compressed capture file')
+    parser.add_argument('--replay', metavar='PATH', help='replay a capture instead of connecting to the exchanges')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed multiplier; 0 replays as fast as possible')
+    parser.add_argument('--replay-dir', default='replay_output', metavar='PATH',
+                        help='where a replay writes its snapshots and quote board, apart from the live files')
+    parser.add_argument('--metrics-port', type=int, default=9108,
+                        help='serve Prometheus metrics on localhost:PORT/metrics; 0 disables')
+    parser.add_argument('--publish', default='127.0.0.1:9109', metavar='ADDRESS',
+                        help="stream market deltas to dashboards on HOST:PORT or unix:PATH; '' disables")
+    parser.add_argument('--products', default=str(PRODUCTS_FILE), metavar='PATH',
+                        help='JSON {exchange: [product, ...]} config, reloaded when it changes')
+    parser.add_argument('--order-books', action='store_true', default=ENABLE_ORDER_BOOKS,
+                        help='also maintain level-2 order books (Kraken checksummed, Coinbase unverified)')
+    args = parser.parse_args()
     
-    subscribe_message = {
-        "type": "subscribe",
-        "product_ids": ["BTC-USD", "ETH-USD"],
-        "channels": ["ticker"]
-    }
+    # Adapters pick their channels when they subscribe, so this only has to happen before connecting
+    if args.order_books:
+        coinbase_adapter.books = kraken_adapter.books = aggregator.books
     
-    ws.send(json.dumps(subscribe_message))
-
-def start_coinbase():
-    ws = websocket.WebSocketApp(
-        "wss://ws-feed.exchange.coinbase.com",
-        on_open=coinbase_on_open,
-        on_message=coinbase_on_message,
-        on_error=coinbase_on_error,
-        on_close=coinbase_on_close
-    )
-    ws.run_forever()
-
-# ============= KRAKEN WEBSOCKET =============
-def kraken_on_message(ws, message):
-    data = json.loads(message)
-    
-    if isinstance(data, list) and len(data) >= 4:
-        if isinstance(data[1], dict) and 'a' in data[1] and 'b' in data[1]:
-            ticker_data = data[1]
-            pair = data[3]
-            
-            best_ask = float(ticker_data['a'][0])
-            best_bid = float(ticker_data['b'][0])
-            volume_24h = float(ticker_data['v'][1])
-            
-            aggregator.update_data('kraken', pair, best_bid, best_ask, volume_24h)
-
-def kraken_on_error(ws, error):
-    print(f"Kraken Error: {error}")
-
-def kraken_on_close(ws, close_status_code, close_msg):
-    print("Kraken connection closed")
-
-def kraken_on_open(ws):
-    print("Connected to Kraken")
-    
-    subscribe_message = {
-        "event": "subscribe",
-        "pair": ["XBT/USD", "ETH/USD"],
-        "subscription": {"name": "ticker"}
-    }
+    product_registry.path = Path(args.products)
+    product_registry.reload()
     
-    ws.send(json.dumps(subscribe_message))
-
-def start_kraken():
-    ws = websocket.WebSocketApp(
-        "wss://ws.kraken.com",
-        on_open=kraken_on_open,
-        on_message=kraken_on_message,
-        on_error=kraken_on_error,
-        on_close=kraken_on_close
-    )
-    ws.run_forever()
-
-# ============= MAIN EXECUTION =============
-if __name__ == "__main__":
     print("Starting Market Data Aggregator...")
-    print("Connecting to exchanges...\n")
+    print(f"Replaying {args.replay} at {f'{args.speed:g}x' if args.speed else 'full'} speed...\n" if args.replay else "Connecting to exchanges...\n")
     
-    # Start Coinbase WebSocket in a thread
-    coinbase_thread = threading.Thread(target=start_coinbase, daemon=True)
-    coinbase_thread.start()
+    if args.replay:
+        aggregator.use_output_dir(args.replay_dir)
+        print(f"Writing replay snapshots to {args.replay_dir}")
     
-    # Start Kraken WebSocket in a thread
-    kraken_thread = threading.Thread(target=start_kraken, daemon=True)
-    kraken_thread.start()
+    if args.capture is not None and not args.replay:
+        frame_recorder = FrameRecorder(args.capture or None).start()
+        print(f"Capturing raw frames to {frame_recorder.path}")
+    
+    # Dashboards subscribe to the delta feed; the quote board and pickles remain as fallbacks
+    if args.publish:
+        address = parse_address(args.publish)
+        if isinstance(address, str):
+            aggregator.publisher = MarketPublisher(aggregator.market, path=address)
+        else:
+            aggregator.publisher = MarketPublisher(aggregator.market, *address)
+        aggregator.publisher.start()
+        print(f"Publishing market deltas on {args.publish}")
+    
+    # Shared-memory quote board for the dashboard, pickle snapshots as fallback
+    # Leave room for products subscribed at runtime
+    aggregator.open_quote_board(capacity=max(64, 2 * product_registry.count()))
+    # A replay's ticks are already in the tick log from when they were captured
+    if not args.replay:
+        aggregator.open_tick_log()
+        aggregator.seed_correlations({exchange: product_registry.products(exchange)
+                                      for exchange in product_registry.exchanges()})
+    aggregator.snapshot_writer.start()
+    aggregator.depth_writer.start()
+    aggregator.bars_writer.start()
+    
+    # All exchange feeds share one asyncio event loop with automatic reconnects
+    feed_engine = FeedEngine(aggregator, [coinbase_adapter, kraken_adapter], recorder=frame_recorder)
+    feed_engine.watch(product_registry)
+    # Removed products free their board slots before the board is sized for new ones
+    product_registry.on_change(lambda exchange, added, removed:
+                               removed and aggregator.remove_products(exchange, removed))
+    product_registry.on_change(lambda exchange, added, removed:
+                               aggregator.reserve_quote_board(product_registry.count()))
+    feed_engine.register_metrics(aggregator.metrics)
+    metrics_server = None
+    if args.metrics_port:
+        try:
+            metrics_server = MetricsServer(aggregator.metrics, port=args.metrics_port).start()
+            print(f"Metrics at http://127.0.0.1:{metrics_server.port}/metrics")
+        except OSError as e:
+            # Most likely another aggregator already holds the port; run without metrics
+            print(f"Error starting metrics server on port {args.metrics_port}: {e}")
+    if args.replay:
+        feed_engine.start_replay(args.replay, args.speed)
+    else:
+        feed_engine.start()
     
     # Wait for connections to establish
     time.sleep(2)
     
     print("\nPress Ctrl+C to exit\n")
     
-    # Fetch sentiment data immediately on startup
-    print("Fetching initial sentiment data...")
-    aggregator.update_sentiment_data()
+    # Fetch sentiment data immediately on startup; replays stay offline
+    if not args.replay:
+        print("Fetching initial sentiment data...")
+        aggregator.update_sentiment_data()
     
     try:
         # Display data every 5 seconds
@@ -303,11 +728,31 @@ if __name__ == "__main__":
         while True:
             time.sleep(5)
             aggregator.display_data()
+            if product_registry.reload():
+                print(f"Products reloaded from {product_registry.path}: {product_registry.count()} subscribed")
+            aggregator.flush_tick_log()
+            aggregator.save_latency_stats()
+            aggregator.update_correlations()
             
             # Update sentiment data every 5 minutes (60 cycles)
             counter += 1
             if counter % 60 == 0:
-                aggregator.update_sentiment_data()
+                if not args.replay:
+                    aggregator.update_sentiment_data()
                 counter = 0
     except KeyboardInterrupt:
-        print("\n\nShutting down...")
\ No newline at end of file
+        print("\n\nShutting down...")
+        feed_engine.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if aggregator.publisher is not None:
+            aggregator.publisher.stop()
+        if frame_recorder is not None:
+            frame_recorder.stop()
+        aggregator.snapshot_writer.stop()
+        aggregator.depth_writer.stop()
+        aggregator.bars_writer.stop()
+        aggregator.close_tick_log()
+        aggregator.sentiment_cache.close()
+        aggregator.fetcher.close()
+        aggregator.sentiment_scorer.close()
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""Micro-benchmark for the exchange frame decoders.
+
+Replays a mix of captured Coinbase and Kraken frames (tickers plus the
+heartbeats and status events that make up most of the traffic) through
+the original json.loads path and through every available fast decoder,
+and reports messages/sec for each.
+
+    python bench_decoding.py [iterations]
+"""
+import json
+import sys
+import time
+
+from decoding import CoinbaseDecoder, KrakenDecoder, available_backends
+
+COINBASE_FRAMES = [
+    '{"type":"ticker","sequence":112855375398,"product_id":"BTC-USD","price":"87900.21","open_24h":"88512.01",'
+    '"volume_24h":"10210.14411916","low_24h":"86123.55","high_24h":"89120.00","volume_30d":"301234.99210001",'
+    '"best_bid":"87900.20","best_bid_size":"0.01138000","best_ask":"87900.21","best_ask_size":"0.25000000",'
+    '"side":"buy","time":"2025-11-25T19:38:33.241877Z","trade_id":913245771,"last_size":"0.00012000"}',
+    '{"type":"heartbeat","last_trade_id":913245771,"product_id":"BTC-USD","sequence":112855375401,'
+    '"time":"2025-11-25T19:38:33.512011Z"}',
+    '{"type":"ticker","sequence":60421199876,"product_id":"ETH-USD","price":"2968.89","open_24h":"3010.44",'
+    '"volume_24h":"124252.98916445","low_24h":"2930.10","high_24h":"3044.87","volume_30d":"4123456.12000000",'
+    '"best_bid":"2968.71","best_bid_size":"1.20000000","best_ask":"2968.89","best_ask_size":"0.80000000",'
+    '"side":"sell","time":"2025-11-25T19:38:33.301245Z","trade_id":611245090,"last_size":"0.05000000"}',
+    '{"type":"heartbeat","last_trade_id":611245090,"product_id":"ETH-USD","sequence":60421199880,'
+    '"time":"2025-11-25T19:38:33.512090Z"}',
+]
+
+KRAKEN_FRAMES = [
+    '[340,{"a":["87880.00000",1,"1.00000000"],"b":["87879.90000",0,"0.51950000"],"c":["87880.00000","0.00100000"],'
+    '"v":["412.13810219","1603.96058693"],"p":["87720.23417","87801.11920"],"t":[10432,41207],'
+    '"l":["86950.00000","86120.00000"],"h":["88200.10000","89111.00000"],"o":["87512.40000","88490.00000"]},'
+    '"ticker","XBT/USD"]',
+    '{"event":"heartbeat"}',
+    '[214,{"a":["2967.75000",4,"4.00000000"],"b":["2967.74000",2,"2.50000000"],"c":["2967.75000","0.10000000"],'
+    '"v":["5012.12345678","21395.82496293"],"p":["2961.11","2966.02"],"t":[3321,15222],'
+    '"l":["2931.00000","2929.10000"],"h":["3002.00000","3043.00000"],"o":["2990.00000","3009.90000"]},'
+    '"ticker","ETH/USD"]',
+    '{"event":"heartbeat"}',
+    '{"connectionID":12601239866273455843,"event":"systemStatus","status":"online","version":"1.9.2"}',
+]
+
+
+def baseline_coinbase(message):
+    """The original coinbase_on_message parsing path"""
+    data = json.loads(message)
+    if data.get('type') == 'ticker':
+        return (data.get('product_id'), float(data.get('best_bid', 0)),
+                float(data.get('best_ask', 0)), float(data.get('volume_24h', 0)))
+    return None
+
+
+def baseline_kraken(message):
+    """The original kraken_on_message parsing path"""
+    data = json.loads(message)
+    if isinstance(data, list) and len(data) >= 4:
+        if isinstance(data[1], dict) and 'a' in data[1] and 'b' in data[1]:
+            ticker_data = data[1]
+            return (data[3], float(ticker_data['b'][0]),
+                    float(ticker_data['a'][0]), float(ticker_data['v'][1]))
+    return None
+
+
+def run(decode, frames, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for frame in frames:
+            decode(frame)
+    elapsed = time.perf_counter() - start
+    return iterations * len(frames) / elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"{'exchange':<10}{'decoder':<28}{'msgs/sec':>14}")
+    print("-" * 52)
+    for exchange, frames, baseline, decoder_class in (
+        ('coinbase', COINBASE_FRAMES, baseline_coinbase, CoinbaseDecoder),
+        ('kraken', KRAKEN_FRAMES, baseline_kraken, KrakenDecoder),
+    ):
+        print(f"{exchange:<10}{'baseline json.loads':<28}{run(baseline, frames, iterations):>14,.0f}")
+        for backend in available_backends():
+            for prefilter in (False, True):
+                decoder = decoder_class(backend, prefilter=prefilter)
+                label = f"{backend}{' + prefilter' if prefilter else ''}"
+                print(f"{exchange:<10}{label:<28}{run(decoder.decode, frames, iterations):>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""End-to-end throughput benchmark for the market data aggregator.
+
+Starts exchange_sim.py locally, points a FeedEngine with Coinbase and
+Kraken adapters at it and runs the real MarketDataAggregator (quote
+board, tick history, consolidated book and background snapshot writer)
+at each requested message rate. For every rate it reports:
+
+  - sustained ticks/sec reaching update_data (vs. what was sent)
+  - update_data call duration percentiles
+  - time spent waiting for the exchange shard and consolidated book locks
+  - snapshot writer flush cost and updates coalesced per flush
+
+The simulator runs in a child process so generating frames does not
+compete with the aggregator for the GIL. Each run happens in a fresh
+temporary directory so nothing in the working tree is touched.
+
+    python bench_feed.py [--rates 1000,5000,20000] [--products 10] [--duration 10]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from exchange_sim import ExchangeSimulator, synthetic_products
+from latency import LatencyHistogram, RECEIVE_TO_UPDATE
+
+
+class TimedLock:
+    """Wraps a lock and records how long every acquire waited"""
+
+    def __init__(self, lock, histogram):
+        self.lock = lock
+        self.histogram = histogram
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter_ns()
+        acquired = self.lock.acquire(blocking, timeout)
+        if acquired:
+            # Every feed runs on the FeedEngine's one thread, so the histogram needs no lock
+            self.histogram.record(time.perf_counter_ns() - start)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def serve_simulator(conn, rate):
+    """Child process: run the simulator and answer 'sent' / 'stop' requests"""
+    simulator = ExchangeSimulator(rate=rate, seed=1).start()
+    conn.send(simulator.port)
+    while True:
+        command = conn.recv()
+        conn.send(sum(simulator.sent.values()))
+        if command == 'stop':
+            simulator.stop()
+            return
+
+
+class SimulatorProcess:
+    def __init__(self, rate):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve_simulator, args=(child, rate), daemon=True)
+        self.process.start()
+        self.port = self.conn.recv()
+
+    def url(self, exchange):
+        return f"ws://127.0.0.1:{self.port}/{exchange}"
+
+    def sent(self):
+        self.conn.send('sent')
+        return self.conn.recv()
+
+    def stop(self):
+        self.conn.send('stop')
+        self.conn.recv()
+        self.process.join(timeout=5)
+
+
+def instrument(aggregator):
+    """Wrap update_data, the market state locks and the snapshot writer with timers"""
+    stats = {
+        'update': LatencyHistogram(),
+        'lock_wait': LatencyHistogram(),
+        'flush': LatencyHistogram(),
+        'coalesced': 0,
+        'ticks': 0,
+    }
+
+    # Shards are created on the first tick, so new shard locks come pre-wrapped
+    aggregator.market.lock_factory = lambda: TimedLock(threading.Lock(), stats['lock_wait'])
+    aggregator.consolidated.lock_factory = lambda: TimedLock(threading.Lock(), stats['lock_wait'])
+
+    update_data = aggregator.update_data
+
+    def timed_update(*args, **kwargs):
+        start = time.perf_counter_ns()
+        update_data(*args, **kwargs)
+        stats['update'].record(time.perf_counter_ns() - start)
+        stats['ticks'] += 1
+
+    aggregator.update_data = timed_update
+
+    on_flush = aggregator.snapshot_writer.on_flush
+
+    def timed_flush(coalesced, duration, lag_ns):
+        stats['flush'].record(int(duration * 1e9))
+        stats['coalesced'] += coalesced
+        if on_flush is not None:
+            on_flush(coalesced, duration, lag_ns)
+
+    aggregator.snapshot_writer.on_flush = timed_flush
+    return stats
+
+
+def run(rate, products, duration, warmup):
+    # Imported here so the module-level aggregator is created inside the temp directory
+    from aggregator import MarketDataAggregator
+    from feed_engine import FeedEngine, CoinbaseAdapter, KrakenAdapter
+
+    aggregator = MarketDataAggregator()
+    aggregator.open_quote_board(capacity=max(64, 2 * products))
+    stats = instrument(aggregator)
+    aggregator.snapshot_writer.start()
+
+    simulator = SimulatorProcess(rate)
+    engine = FeedEngine(aggregator, [
+        CoinbaseAdapter(synthetic_products('coinbase', products), url=simulator.url('coinbase')),
+        KrakenAdapter(synthetic_products('kraken', products), url=simulator.url('kraken')),
+    ]).start()
+
+    time.sleep(warmup)
+    ticks_before, sent_before = stats['ticks'], simulator.sent()
+    start = time.perf_counter()
+    time.sleep(duration)
+    elapsed = time.perf_counter() - start
+    ticks, sent = stats['ticks'] - ticks_before, simulator.sent() - sent_before
+
+    engine.stop()
+    simulator.stop()
+    aggregator.snapshot_writer.stop()
+    aggregator.sentiment_cache.close()
+    aggregator.fetcher.close()
+
+    return {
+        'sent_rate': sent / elapsed,
+        'tick_rate': ticks / elapsed,
+        'update': stats['update'].summary(),
+        'lock_wait': stats['lock_wait'].summary(),
+        'flush': stats['flush'].summary(),
+        'per_flush': stats['coalesced'] / stats['flush'].count if stats['flush'].count else 0,
+        'receive_to_update': aggregator.latency.summary(),
+    }
+
+
+def format_us(summary, key):
+    return f"{summary[key] * 1000:.1f}" if summary else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rates', default='1000,5000,20000',
+                        help='comma-separated ticker messages/sec per exchange connection')
+    parser.add_argument('--products', type=int, default=10, help='products per exchange')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per rate')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(',')]
+    home = os.getcwd()
+    results = []
+    for rate in rates:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                print(f"Running {rate:g} msgs/sec x 2 exchanges, {args.products} products each...")
+                results.append((rate, run(rate, args.products, args.duration, args.warmup)))
+            finally:
+                os.chdir(home)
+
+    print(f"\n{'target/s':>10}{'sent/s':>10}{'ticks/s':>10}"
+          f"{'upd p50':>9}{'upd p99':>9}{'upd max':>9}"
+          f"{'lock p50':>10}{'lock p99':>10}{'lock max':>10}"
+          f"{'flush p50':>11}{'flush p99':>11}{'upd/flush':>11}")
+    print(f"{'':>30}{'(µs)':>27}{'(µs)':>30}{'(ms)':>22}")
+    print("-" * 120)
+    for rate, result in results:
+        flush = result['flush']
+        print(f"{2 * rate:>10,.0f}{result['sent_rate']:>10,.0f}{result['tick_rate']:>10,.0f}"
+              f"{format_us(result['update'], 'p50_ms'):>9}{format_us(result['update'], 'p99_ms'):>9}"
+              f"{format_us(result['update'], 'max_ms'):>9}"
+              f"{format_us(result['lock_wait'], 'p50_ms'):>10}{format_us(result['lock_wait'], 'p99_ms'):>10}"
+              f"{format_us(result['lock_wait'], 'max_ms'):>10}"
+              f"{flush['p50_ms'] if flush else 0:>11.2f}{flush['p99_ms'] if flush else 0:>11.2f}"
+              f"{result['per_flush']:>11,.0f}")
+
+    print(f"\n{RECEIVE_TO_UPDATE} latency (ms, p50 / p99) per feed at each rate:")
+    for rate, result in results:
+        cells = []
+        for feed, stages in sorted(result['receive_to_update'].items()):
+            summary = stages.get(RECEIVE_TO_UPDATE)
+            if summary:
+                cells.append(f"{feed} {summary['p50_ms']:.2f} / {summary['p99_ms']:.2f}")
+        print(f"  {2 * rate:>10,.0f}/s  " + ", ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Micro-benchmark for the market state's per-product quote storage.
+
+Compares the original layout, a fresh 8-key dict published on every tick,
+with the in-place QuoteRecord used by MarketShard. For each product count
+it reports:
+
+  - memory retained by the stored quotes (tracemalloc)
+  - updates/sec for ticks spread round-robin over every product
+  - time for a snapshot after 1% of products ticked
+
+    python bench_quotes.py [--products 500,2000,10000] [--ticks 500000]
+"""
+import argparse
+import gc
+import threading
+import time
+import tracemalloc
+
+from market_state import MarketShard
+
+
+class DictShard(MarketShard):
+    """The pre-QuoteRecord shard: every tick allocates and publishes a new dict"""
+
+    def update(self, product, bid, ask, spread, spread_percent, volume, timestamp,
+               exchange_time=None, receive_ns=None):
+        self.quotes[product] = {
+            'bid': bid,
+            'ask': ask,
+            'spread': spread,
+            'spread_percent': spread_percent,
+            'volume': volume,
+            'timestamp': timestamp,
+            'exchange_time': exchange_time,
+            'receive_ns': receive_ns
+        }
+        self.version += 1
+
+    def snapshot(self):
+        return dict(self.quotes)
+
+
+def fill(shard, products):
+    for i, product in enumerate(products):
+        bid = 100.0 + i
+        shard.update(product, bid, bid + 0.5, 0.5, 0.5 / bid * 100, 1000.0 + i, time.time())
+
+
+def measure_memory(shard_class, products):
+    gc.collect()
+    tracemalloc.start()
+    shard = shard_class('coinbase', threading.Lock())
+    fill(shard, products)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained
+
+
+def measure_updates(shard_class, products, ticks):
+    shard = shard_class('coinbase', threading.Lock())
+    fill(shard, products)
+    count = len(products)
+    now = time.time()
+    start = time.perf_counter()
+    for i in range(ticks):
+        bid = 100.0 + (i & 1023)
+        shard.update(products[i % count], bid, bid + 0.5, 0.5, 0.5, 1000.0, now, now, i)
+    return ticks / (time.perf_counter() - start)
+
+
+def measure_snapshot(shard_class, products, repeats=20):
+    shard = shard_class('coinbase', threading.Lock())
+    fill(shard, products)
+    shard.snapshot()
+    step = max(1, len(products) // 100)
+    now = time.time()
+    total = 0.0
+    for _ in range(repeats):
+        for product in products[::step]:
+            shard.update(product, 1.0, 1.5, 0.5, 50.0, 1000.0, now)
+        start = time.perf_counter()
+        shard.snapshot()
+        total += time.perf_counter() - start
+    return total / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', default='500,2000,10000', help='comma-separated product counts')
+    parser.add_argument('--ticks', type=int, default=500_000, help='updates timed per layout')
+    args = parser.parse_args()
+
+    print(f"{'products':>10}{'layout':>14}{'memory':>12}{'bytes/quote':>13}{'updates/s':>14}{'snapshot ms':>13}")
+    print("-" * 76)
+    for count in (int(value) for value in args.products.split(',')):
+        products = [f"SIM{i}-USD" for i in range(count)]
+        for label, shard_class in (('dict/tick', DictShard), ('QuoteRecord', MarketShard)):
+            memory = measure_memory(shard_class, products)
+            rate = measure_updates(shard_class, products, args.ticks)
+            snapshot = measure_snapshot(shard_class, products)
+            print(f"{count:>10,}{label:>14}{memory / 1024:>10,.0f}KB{memory / count:>13,.0f}"
+                  f"{rate:>14,.0f}{snapshot * 1000:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Throughput and accuracy benchmark for batched sentiment scoring.
+
+Scores a corpus one text at a time through TextBlob (the current path)
+and through sentiment_batch, in-process and with the process pool, then
+reports texts/sec and how closely the batch polarities match TextBlob.
+
+The corpus is the titles in sentiment_data.pkl, or one text per line from
+a file given as the first argument, repeated up to the requested size.
+
+    python bench_sentiment.py [corpus.txt] [--size 20000]
+"""
+import argparse
+import pickle
+import time
+from pathlib import Path
+
+import numpy as np
+from textblob import TextBlob
+
+from sentiment_batch import BatchSentimentScorer, get_lexicon, score_batch
+
+
+def load_corpus(path):
+    if path:
+        return [line.strip() for line in Path(path).read_text(encoding='utf-8').splitlines() if line.strip()]
+    with open('sentiment_data.pkl', 'rb') as f:
+        data = pickle.load(f)
+    return [item['text'] for item in data.get('reddit', []) + data.get('news', [])]
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    result = fn(texts)
+    return np.asarray(result, dtype=float), len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('corpus', nargs='?')
+    parser.add_argument('--size', type=int, default=20000)
+    args = parser.parse_args()
+
+    base = load_corpus(args.corpus)
+    texts = (base * (args.size // max(len(base), 1) + 1))[:args.size]
+    print(f"Corpus: {len(base)} distinct texts, {len(texts)} scored")
+
+    get_lexicon()
+    reference, textblob_rate = timed(lambda batch: [TextBlob(text).sentiment.polarity for text in batch], texts)
+    batch, batch_rate = timed(score_batch, texts)
+    scorer = BatchSentimentScorer(parallel_threshold=0, chunk_size=max(len(texts) // 8, 1))
+    pooled, pool_rate = timed(scorer.score, texts)
+    scorer.close()
+
+    print(f"\n{'path':<28}{'texts/sec':>14}{'speedup':>10}")
+    print("-" * 52)
+    for label, rate in (('TextBlob per text', textblob_rate),
+                        ('score_batch', batch_rate),
+                        ('process pool', pool_rate)):
+        print(f"{label:<28}{rate:>14,.0f}{rate / textblob_rate:>9.1f}x")
+
+    for label, result in (('score_batch', batch), ('process pool', pooled)):
+        diff = np.abs(result - reference)
+        print(f"\n{label} vs TextBlob: max |diff| {diff.max():.2e}, "
+              f"{(diff <= 1e-9).mean():.2%} exact, {(diff <= 0.05).mean():.2%} within 0.05")
+
+
+if __name__ == "__main__":
+    main()
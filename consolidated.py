@@ -0,0 +1,163 @@
+import threading
+import time
+
+
+class SymbolRegistry:
+    """Maps exchange-specific product names onto canonical BASE-QUOTE instruments"""
+
+    # Exchange asset codes that differ from the common ticker
+    DEFAULT_ALIASES = {
+        'XBT': 'BTC',
+        'XDG': 'DOGE'
+    }
+
+    def __init__(self, aliases=None):
+        self.aliases = dict(self.DEFAULT_ALIASES)
+        if aliases:
+            self.aliases.update(aliases)
+        self.overrides = {}
+        self._cache = {}
+
+    def register(self, exchange, product, canonical):
+        """Pin an explicit mapping for symbols the default rules get wrong"""
+        self.overrides[(exchange, product)] = canonical
+        self._cache[(exchange, product)] = canonical
+
+    def canonical(self, exchange, product):
+        key = (exchange, product)
+        symbol = self._cache.get(key)
+        if symbol is None:
+            symbol = self.overrides.get(key) or self._normalize(product)
+            self._cache[key] = symbol
+        return symbol
+
+    def _normalize(self, product):
+        for separator in ('/', '-', '_'):
+            if separator in product:
+                base, quote = product.split(separator, 1)
+                break
+        else:
+            return product.upper()
+        base = self.aliases.get(base.upper(), base.upper())
+        quote = self.aliases.get(quote.upper(), quote.upper())
+        return f'{base}-{quote}'
+
+
+class ConsolidatedBook:
+    """Best bid/offer across exchanges for each canonical instrument.
+
+    Every update only recomputes the instrument it touched, scanning just
+    the handful of venues quoting that instrument. Venue quotes older than
+    `max_age` seconds are left out, so a venue that stopped ticking cannot
+    keep setting the best price or flag phantom arbitrage; remove() drops a
+    venue outright when its feed disconnects or the product is unsubscribed.
+
+    Each instrument has its own lock, so venues only contend while quoting
+    the same instrument. Entries in `books` are replaced rather than
+    mutated, so readers need no lock.
+    """
+
+    def __init__(self, registry=None, max_age=30.0, lock_factory=threading.Lock):
+        self.registry = registry or SymbolRegistry()
+        self.max_age = max_age
+        self.lock_factory = lock_factory
+        # symbol -> (lock, {exchange: (bid, ask, timestamp)})
+        self.quotes = {}
+        self.books = {}
+        self._create_lock = threading.Lock()
+
+    def _instrument(self, symbol):
+        instrument = self.quotes.get(symbol)
+        if instrument is None:
+            with self._create_lock:
+                instrument = self.quotes.get(symbol)
+                if instrument is None:
+                    instrument = (self.lock_factory(), {})
+                    # Replaced rather than mutated so other instruments can be iterated without a lock
+                    self.quotes = {**self.quotes, symbol: instrument}
+        return instrument
+
+    def update(self, exchange, product, bid, ask, timestamp=None):
+        """Apply one venue quote and return the instrument's refreshed consolidated entry"""
+        if timestamp is None:
+            timestamp = time.time()
+        symbol = self.registry.canonical(exchange, product)
+        lock, venues = self._instrument(symbol)
+        with lock:
+            venues[exchange] = (bid, ask, timestamp)
+            return self._refresh(symbol, venues, timestamp)
+
+    def remove(self, exchange, products=None):
+        """Drop an exchange's quotes for the given products, or for every product if None"""
+        if products is None:
+            symbols = list(self.quotes)
+        else:
+            symbols = {self.registry.canonical(exchange, product) for product in products}
+        for symbol in symbols:
+            instrument = self.quotes.get(symbol)
+            if instrument is None:
+                continue
+            lock, venues = instrument
+            with lock:
+                if venues.pop(exchange, None) is not None:
+                    self._refresh(symbol, venues)
+
+    def expire(self, now=None):
+        """Recompute every instrument whose consolidated entry includes a quote past max_age"""
+        if now is None:
+            now = time.time()
+        cutoff = now - self.max_age
+        for symbol, book in list(self.books.items()):
+            if book['oldest'] < cutoff:
+                lock, venues = self.quotes[symbol]
+                with lock:
+                    self._refresh(symbol, venues, now)
+
+    def _refresh(self, symbol, venues, now=None):
+        """Recompute one instrument's entry; callers hold its lock"""
+        if now is None:
+            now = time.time()
+        cutoff = now - self.max_age
+        best_bid, bid_exchange = -1.0, None
+        best_ask, ask_exchange = float('inf'), None
+        oldest = now
+        live = 0
+        for venue, (venue_bid, venue_ask, timestamp) in venues.items():
+            if timestamp < cutoff:
+                continue
+            live += 1
+            oldest = min(oldest, timestamp)
+            if venue_bid > best_bid:
+                best_bid, bid_exchange = venue_bid, venue
+            if 0 < venue_ask < best_ask:
+                best_ask, ask_exchange = venue_ask, venue
+
+        if bid_exchange is None or ask_exchange is None:
+            self.books.pop(symbol, None)
+            return None
+
+        spread = best_ask - best_bid
+        # A crossed consolidated book across two venues is an arbitrage opportunity
+        arbitrage = spread < 0 and bid_exchange != ask_exchange
+        book = {
+            'best_bid': best_bid,
+            'bid_exchange': bid_exchange,
+            'best_ask': best_ask,
+            'ask_exchange': ask_exchange,
+            'spread': spread,
+            'spread_percent': (spread / best_bid) * 100 if best_bid > 0 else 0,
+            'venues': live,
+            'arbitrage': arbitrage,
+            'arbitrage_edge': -spread if arbitrage else 0.0,
+            'oldest': oldest
+        }
+        self.books[symbol] = book
+        return book
+
+    def get(self, symbol):
+        return self.books.get(symbol)
+
+    def snapshot(self, now=None):
+        """Copy of every consolidated entry, with quotes past max_age dropped first"""
+        self.expire(now)
+        return {symbol: dict(book) for symbol, book in list(self.books.items())}
@@ -0,0 +1,253 @@
+"""Rolling correlation of sentiment with each product's price returns.
+
+CorrelationEngine samples the overall sentiment score and every product's
+mid price on one shared grid, every `interval` seconds. For each product
+the sentiment level is paired with the log return of the mid since the
+previous sample. LaggedCorrelation then tracks corr(sentiment[t - lag],
+return[t]) for every window and lag at once:
+
+  - positive lags: sentiment leads price
+  - negative lags: price leads sentiment
+  - lag 0: contemporaneous
+
+Each sample updates the running sums (n, Σx, Σy, Σx², Σy², Σxy) for every
+(window, lag) cell. The update is one vectorized add of the pairs entering
+the windows and one subtract of the pairs leaving them, so its cost does
+not depend on window length. The sums are recomputed exactly from the
+stored series every `resync_every` samples, which bounds floating-point
+drift.
+
+A grid point with no sample (the aggregator was down, or a product had no
+usable mid) is stored as a NaN sample instead of being dropped, so the
+series stays on the grid and no pair straddles a gap. Pairs involving a
+NaN are left out of every sum.
+"""
+import math
+
+import numpy as np
+
+# Defaults: 1-minute samples, 30m/2h/12h windows, lags of up to ±10 minutes
+SAMPLE_INTERVAL = 60.0
+WINDOWS = (30, 120, 720)
+MAX_LAG = 10
+# Sentiment is recorded every 5 minutes; a longer silence in the stored series means the aggregator was down
+SEED_MAX_GAP = 900.0
+
+
+class LaggedCorrelation:
+    """Rolling correlations of x[t - lag] with y[t] over several windows and lags"""
+
+    def __init__(self, windows=WINDOWS, max_lag=MAX_LAG, resync_every=1000):
+        self.windows = np.asarray(windows, dtype=np.int64)
+        self.lags = np.arange(-max_lag, max_lag + 1)
+        self.resync_every = resync_every
+        # Enough history for the oldest pair leaving the longest window
+        self.capacity = int(self.windows.max()) + max_lag + 1
+        self.x = np.zeros(self.capacity)
+        self.y = np.zeros(self.capacity)
+        self.count = 0
+
+        shape = (len(self.windows), len(self.lags))
+        self.n = np.zeros(shape)
+        self.sx = np.zeros(shape)
+        self.sy = np.zeros(shape)
+        self.sxx = np.zeros(shape)
+        self.syy = np.zeros(shape)
+        self.sxy = np.zeros(shape)
+
+    def __len__(self):
+        return self.count
+
+    def _pairs(self, times):
+        """x and y of the pair each lag forms at sample `times`, zeroed where it does not exist.
+
+        Returns (x, y, valid) shaped times.shape + (lags,).
+        """
+        times = np.asarray(times)[..., None]
+        x_index = times - np.maximum(self.lags, 0)
+        y_index = times + np.minimum(self.lags, 0)
+        x = self.x[x_index % self.capacity]
+        y = self.y[y_index % self.capacity]
+        valid = (x_index >= 0) & (y_index >= 0) & np.isfinite(x) & np.isfinite(y)
+        return np.where(valid, x, 0.0), np.where(valid, y, 0.0), valid
+
+    def append(self, x, y):
+        t = self.count
+        self.x[t % self.capacity] = x
+        self.y[t % self.capacity] = y
+        self.count += 1
+
+        entering_x, entering_y, entering = self._pairs(t)
+        leaving_x, leaving_y, leaving = self._pairs(t - self.windows)
+        self.n += entering
+        self.n -= leaving
+        self.sx += entering_x - leaving_x
+        self.sy += entering_y - leaving_y
+        self.sxx += entering_x * entering_x - leaving_x * leaving_x
+        self.syy += entering_y * entering_y - leaving_y * leaving_y
+        self.sxy += entering_x * entering_y - leaving_x * leaving_y
+
+        if self.count % self.resync_every == 0:
+            self.resync()
+
+    def skip(self, n):
+        """Record n missing samples"""
+        self.extend(np.full(n, np.nan), np.full(n, np.nan))
+
+    def extend(self, x, y):
+        """Append many samples at once, then rebuild the sums from the stored series"""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) == 0:
+            return
+        # Only the newest `capacity` samples can still be in any window
+        keep = min(len(x), self.capacity)
+        slots = (self.count + np.arange(len(x) - keep, len(x))) % self.capacity
+        self.x[slots] = x[-keep:]
+        self.y[slots] = y[-keep:]
+        self.count += len(x)
+        self.resync()
+
+    def resync(self):
+        """Recompute every window's sums exactly from the stored samples"""
+        if self.count == 0:
+            return
+        offsets = np.arange(int(self.windows.max()))
+        x, y, valid = self._pairs(self.count - 1 - offsets)
+        # (windows, offsets, lags): a pair counts for a window if it is one of its newest samples
+        mask = valid[None] & (offsets[None, :] < self.windows[:, None])[:, :, None]
+        self.n = mask.sum(axis=1).astype(np.float64)
+        self.sx = (mask * x[None]).sum(axis=1)
+        self.sy = (mask * y[None]).sum(axis=1)
+        self.sxx = (mask * (x * x)[None]).sum(axis=1)
+        self.syy = (mask * (y * y)[None]).sum(axis=1)
+        self.sxy = (mask * (x * y)[None]).sum(axis=1)
+
+    def correlations(self, min_count=3):
+        """(windows, lags) array of Pearson correlations, NaN where undefined"""
+        n = self.n
+        covariance = n * self.sxy - self.sx * self.sy
+        x_variance = n * self.sxx - self.sx * self.sx
+        y_variance = n * self.syy - self.sy * self.sy
+        # Tolerance for what is left of a constant series after running sums cancel out
+        defined = ((n >= min_count)
+                   & (x_variance > 1e-12 * n * self.sxx)
+                   & (y_variance > 1e-12 * n * self.syy))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = covariance / np.sqrt(x_variance * y_variance)
+        return np.where(defined, np.clip(result, -1.0, 1.0), np.nan)
+
+
+class CorrelationEngine:
+    """Sentiment vs. mid-price-return correlations for every product, sampled on a fixed grid"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, windows=WINDOWS, max_lag=MAX_LAG):
+        self.interval = interval
+        self.windows = tuple(windows)
+        self.max_lag = max_lag
+        self.trackers = {}
+        self.last_mid = {}
+        self.samples = 0
+        self.last_sample = None
+
+    def due(self, now):
+        return self.last_sample is None or now - self.last_sample >= self.interval
+
+    def sample(self, now, sentiment, market):
+        """Add one sentiment reading and the matching return of every product in a market snapshot"""
+        if self.last_sample is not None:
+            missed = int(round((now - self.last_sample) / self.interval)) - 1
+            if missed > 0:
+                # No return may span the gap, and the trackers must stay on the grid
+                self.last_mid.clear()
+                for tracker in self.trackers.values():
+                    tracker.skip(min(missed, tracker.capacity))
+        sampled = set()
+        for exchange, products in market.items():
+            for product, quote in products.items():
+                mid = (quote['bid'] + quote['ask']) * 0.5
+                if mid <= 0:
+                    continue
+                key = (exchange, product)
+                previous = self.last_mid.get(key)
+                self.last_mid[key] = mid
+                if previous is None:
+                    continue
+                tracker = self.trackers.get(key)
+                if tracker is None:
+                    tracker = self.trackers[key] = LaggedCorrelation(self.windows, self.max_lag)
+                tracker.append(sentiment, math.log(mid / previous))
+                sampled.add(key)
+        for key, tracker in self.trackers.items():
+            if key not in sampled:
+                tracker.append(math.nan, math.nan)
+        self.samples += 1
+        self.last_sample = now
+
+    def seed(self, sentiment_times, sentiment_values, prices, max_gap=SEED_MAX_GAP):
+        """Rebuild the trackers from stored history instead of starting empty.
+
+        sentiment_times/sentiment_values is the recorded overall sentiment
+        series and prices maps (exchange, product) to (timestamps, mids),
+        both oldest first. Each is resampled onto the grid live sampling
+        would have used, ending at the newest sentiment sample, by taking the
+        latest value at or before every grid point. Grid points more than
+        max_gap after the latest sentiment sample fall in downtime: like grid
+        points without a mid they become gaps, never a return across them.
+        """
+        sentiment_times = np.asarray(sentiment_times, dtype=np.float64)
+        sentiment_values = np.asarray(sentiment_values, dtype=np.float64)
+        if len(sentiment_times) == 0:
+            return
+        end = sentiment_times[-1]
+        # Older samples would only pass through the trackers' windows
+        steps = min(int((end - sentiment_times[0]) // self.interval), max(self.windows) + self.max_lag + 1)
+        grid = end - self.interval * np.arange(steps, -1, -1)
+        latest = np.searchsorted(sentiment_times, grid, side='right') - 1
+        sentiment = sentiment_values[latest]
+        running = grid - sentiment_times[latest] <= max_gap
+
+        for key, (timestamps, mids) in prices.items():
+            timestamps = np.asarray(timestamps, dtype=np.float64)
+            mids = np.asarray(mids, dtype=np.float64)
+            index = np.searchsorted(timestamps, grid, side='right') - 1
+            valid = index >= 0
+            mid = np.where(valid, mids[np.maximum(index, 0)], 0.0)
+            valid &= (mid > 0) & running
+            if not valid.any():
+                continue
+            # Like sample(), a return needs a positive mid at this grid point and the previous one
+            pairs = valid[1:] & valid[:-1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns = np.where(pairs, np.log(mid[1:] / mid[:-1]), np.nan)
+            if valid[-1]:
+                self.last_mid[key] = float(mid[-1])
+            if pairs.any():
+                # The tracker starts at the first return, as a live one would
+                first = int(np.argmax(pairs))
+                tracker = self.trackers.get(key)
+                if tracker is None:
+                    tracker = self.trackers[key] = LaggedCorrelation(self.windows, self.max_lag)
+                tracker.extend(np.where(pairs, sentiment[1:], np.nan)[first:], returns[first:])
+        self.samples += len(grid)
+        self.last_sample = float(end)
+
+    def results(self):
+        """Precomputed correlations in the shape written to correlation.pkl"""
+        lag0 = self.max_lag
+        products = {}
+        for (exchange, product), tracker in self.trackers.items():
+            correlation = tracker.correlations()
+            products.setdefault(exchange, {})[product] = {
+                'correlation': correlation,
+                'lag0': correlation[:, lag0],
+                'samples': tracker.n[:, lag0].astype(np.int64)
+            }
+        return {
+            'interval': self.interval,
+            'windows': list(self.windows),
+            'lags': list(range(-self.max_lag, self.max_lag + 1)),
+            'samples': self.samples,
+            'updated': self.last_sample,
+            'products': products
+        }
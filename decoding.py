@@ -0,0 +1,149 @@
+import json
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class Quote(NamedTuple):
+    product: str
+    bid: float
+    ask: float
+    volume: float
+    exchange_time: Optional[float] = None
+
+
+def parse_iso_time(value):
+    """Epoch seconds from an exchange ISO-8601 timestamp, or None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def available_backends():
+    """JSON backends importable in this environment, fastest first"""
+    backends = []
+    if msgspec is not None:
+        backends.append('msgspec')
+    if orjson is not None:
+        backends.append('orjson')
+    backends.append('json')
+    return backends
+
+
+def get_loads(backend=None):
+    """Return a loads() function for the named backend, or the fastest available one"""
+    if backend is None:
+        backend = available_backends()[0]
+    if backend == 'msgspec':
+        return msgspec.json.decode
+    if backend == 'orjson':
+        return orjson.loads
+    if backend == 'json':
+        return json.loads
+    raise ValueError(f"Unknown JSON backend: {backend}")
+
+
+# Cheap substring checks that reject heartbeats, status events and other
+# non-ticker frames before any JSON parsing happens. The rare frames that
+# slip through (e.g. subscription acks naming the channel) are still
+# rejected after parsing.
+TICKER_MARKER = '"ticker"'
+TICKER_MARKER_BYTES = TICKER_MARKER.encode()
+
+
+def _is_coinbase_ticker(message):
+    if isinstance(message, bytes):
+        return TICKER_MARKER_BYTES in message
+    return TICKER_MARKER in message
+
+
+def _is_kraken_ticker(message):
+    # Ticker updates are JSON arrays; events and heartbeats are objects
+    if isinstance(message, bytes):
+        return message[:1] == b'[' and TICKER_MARKER_BYTES in message
+    return message[:1] == '[' and TICKER_MARKER in message
+
+
+class CoinbaseDecoder:
+    """Decode Coinbase ticker frames into Quotes, skipping everything else unparsed"""
+
+    def __init__(self, backend=None, prefilter=True):
+        self.backend = backend or available_backends()[0]
+        self.prefilter = prefilter
+        self._loads = get_loads(self.backend)
+        self._typed = None
+        if self.backend == 'msgspec':
+            # Decode straight into a struct; strict=False converts the numeric strings
+            self._typed = msgspec.json.Decoder(_CoinbaseTicker, strict=False)
+
+    def decode(self, message):
+        if self.prefilter and not _is_coinbase_ticker(message):
+            return None
+
+        if self._typed is not None:
+            try:
+                ticker = self._typed.decode(message)
+            except msgspec.ValidationError:
+                return None
+            if ticker.type != 'ticker':
+                return None
+            return Quote(ticker.product_id, ticker.best_bid, ticker.best_ask, ticker.volume_24h,
+                         parse_iso_time(ticker.time))
+
+        data = self._loads(message)
+        if data.get('type') != 'ticker':
+            return None
+        return Quote(
+            data.get('product_id'),
+            float(data.get('best_bid', 0)),
+            float(data.get('best_ask', 0)),
+            float(data.get('volume_24h', 0)),
+            parse_iso_time(data.get('time'))
+        )
+
+
+class KrakenDecoder:
+    """Decode Kraken ticker frames into Quotes, skipping events and heartbeats unparsed"""
+
+    def __init__(self, backend=None, prefilter=True):
+        self.backend = backend or available_backends()[0]
+        self.prefilter = prefilter
+        self._loads = get_loads(self.backend)
+
+    def decode(self, message):
+        if self.prefilter and not _is_kraken_ticker(message):
+            return None
+
+        data = self._loads(message)
+        if isinstance(data, list) and len(data) >= 4:
+            ticker_data = data[1]
+            if isinstance(ticker_data, dict) and 'a' in ticker_data and 'b' in ticker_data:
+                return Quote(
+                    data[3],
+                    float(ticker_data['b'][0]),
+                    float(ticker_data['a'][0]),
+                    float(ticker_data['v'][1])
+                )
+        return None
+
+
+if msgspec is not None:
+    class _CoinbaseTicker(msgspec.Struct):
+        type: str
+        product_id: str = ''
+        best_bid: float = 0.0
+        best_ask: float = 0.0
+        volume_24h: float = 0.0
+        time: str = ''
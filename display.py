@@ -1,4 +1,5 @@
 import streamlit as st
+import os
 import pickle
 import time
 from pathlib import Path
@@ -6,6 +7,9 @@ from datetime import datetime
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from quote_board import QuoteBoard
+from market_feed import MarketFeedClient
+from order_book import vwap_from_levels
 
 # Page configuration
 st.set_page_config(
@@ -22,231 +26,618 @@ page = st.sidebar.radio("Select Page", ["Market Data", "Sentiment Analysis"])
 # Data file paths
 market_data_file = Path('market_data.pkl')
 sentiment_data_file = Path('sentiment_data.pkl')
+quote_board_file = Path('quote_board.bin')
+depth_data_file = Path('order_book.pkl')
+latency_data_file = Path('latency_stats.pkl')
+bars_data_file = Path('bars.pkl')
+correlation_data_file = Path('correlation.pkl')
+
+# Bar resolutions kept by the aggregator's bar engine, in seconds
+BAR_RESOLUTIONS = {'1s': 1, '1m': 60, '5m': 300, '1h': 3600}
+
+# Minimum seconds between redraws of one product's bar chart
+BAR_REDRAW_INTERVAL = 2.0
+
+# Address of the aggregator's delta feed (HOST:PORT or unix:PATH); '' reads files only
+MARKET_FEED = os.environ.get('MARKET_FEED', '127.0.0.1:9109')
+
+# Seconds between checks for new data, as before version checks; nothing is redrawn unless a version changed
+MARKET_POLL_INTERVAL = 2.0
+SENTIMENT_POLL_INTERVAL = 3.0
+
+quote_board = None
+
+def file_version(path):
+    """Modification time in ns, or None if the file does not exist"""
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_pickle(path, version):
+    """Unpickle a data file once per modification; all open tabs share the result"""
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def get_quote_board():
+    """The mapped quote board, remapped if the aggregator replaced it, or None"""
+    global quote_board
+    
+    if quote_board is not None and quote_board.is_stale():
+        quote_board.close()
+        quote_board = None
+    if quote_board is None:
+        quote_board = QuoteBoard.open(quote_board_file)
+    return quote_board
+
+@st.cache_resource(show_spinner=False)
+def get_feed_client(address):
+    """One subscription per dashboard process, shared by every open tab"""
+    return MarketFeedClient(address).start()
+
+def feed_client():
+    """The delta feed client if it is connected and has a snapshot, else None"""
+    if not MARKET_FEED:
+        return None
+    client = get_feed_client(MARKET_FEED)
+    if client.connected and client.version:
+        return client
+    return None
+
+def market_data_version():
+    """Cheap change marker: the feed's message count, the quote board's publish count, or the pickle's mtime"""
+    client = feed_client()
+    if client is not None:
+        return ('feed', id(client), client.version)
+    board = get_quote_board()
+    if board is not None:
+        return ('board', id(board), board.generation())
+    return ('pickle', file_version(market_data_file))
+
+def load_market_data():
+    """Read market data from the delta feed or the shared-memory quote board, falling back to the pickle"""
+    client = feed_client()
+    if client is not None:
+        return client.snapshot()
+    board = get_quote_board()
+    if board is not None:
+        return board.snapshot()
+    
+    version = file_version(market_data_file)
+    if version is not None:
+        return load_pickle(str(market_data_file), version)
+    return None
+
+def sentiment_data_version():
+    client = feed_client()
+    if client is not None and client.sentiment is not None:
+        return ('feed', id(client), client.sentiment_version)
+    version = file_version(sentiment_data_file)
+    return ('pickle', version) if version is not None else None
+
+def load_sentiment_data(version):
+    if version[0] == 'feed':
+        # Read from the client directly; it keeps its last state even if it just disconnected
+        return get_feed_client(MARKET_FEED).sentiment
+    return load_pickle(str(sentiment_data_file), version[1])
+
+def load_depth_data():
+    """Read the latest top-of-book depth snapshot, or an empty dict if order books are disabled"""
+    version = file_version(depth_data_file)
+    if version is not None:
+        return load_pickle(str(depth_data_file), version)
+    return {}
+
+def load_latency_data():
+    """Read the aggregator's per-feed latency percentiles, or an empty dict"""
+    version = file_version(latency_data_file)
+    if version is not None:
+        return load_pickle(str(latency_data_file), version) or {}
+    return {}
+
+def load_bars_data():
+    """Read the aggregator's {exchange: {product: {resolution: columns}}} bars, or an empty dict"""
+    version = file_version(bars_data_file)
+    if version is not None:
+        return load_pickle(str(bars_data_file), version) or {}
+    return {}
+
+def load_correlation_data():
+    """Read the aggregator's precomputed sentiment/return correlations, or None"""
+    version = file_version(correlation_data_file)
+    if version is not None:
+        return load_pickle(str(correlation_data_file), version)
+    return None
+
+def format_window(samples, interval):
+    """'30m' style label for a window of `samples` samples taken every `interval` seconds"""
+    seconds = samples * interval
+    if seconds >= 3600 and seconds % 3600 == 0:
+        return f"{seconds / 3600:g}h"
+    if seconds >= 60:
+        return f"{seconds / 60:g}m"
+    return f"{seconds:g}s"
+
+def format_timestamp(timestamp):
+    """Quote timestamps are epoch seconds; older snapshots stored preformatted strings"""
+    if isinstance(timestamp, str):
+        return timestamp
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+def render_readout(placeholder, label, elapsed, detail=''):
+    """Show when the page last changed and how long that redraw took"""
+    placeholder.info(f" {label}: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | "
+                     f"render {elapsed * 1000:.1f} ms{detail}")
 
 # ====================== PAGE 1: MARKET DATA ======================
+def build_market_layout(placeholder, data):
+    """One column per exchange with an empty slot per product; returns {(exchange, product): slot}"""
+    slots = {}
+    with placeholder.container():
+        if len(data) == 0:
+            st.warning(" Waiting for market data...")
+            return slots
+        
+        cols = st.columns(len(data))
+        for idx, (exchange, products) in enumerate(data.items()):
+            with cols[idx]:
+                st.header(f"{exchange.upper()}")
+                for product in products:
+                    slots[(exchange, product)] = st.empty()
+    return slots
+
+def render_product(slot, product, info, depth):
+    with slot.container():
+        st.subheader(f" {product}")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric(
+                label="Best Bid",
+                value=f"${info['bid']:,.2f}"
+            )
+            st.metric(
+                label="Spread",
+                value=f"${info['spread']:.2f}",
+                delta=f"{info['spread_percent']:.3f}%"
+            )
+        
+        with col2:
+            st.metric(
+                label="Best Ask",
+                value=f"${info['ask']:,.2f}"
+            )
+            st.metric(
+                label="24h Volume",
+                value=f"{info['volume']:,.2f}"
+            )
+        
+        st.caption(f" {format_timestamp(info['timestamp'])}")
+        
+        if depth and depth['bids'] and depth['asks']:
+            with st.expander("Order Book Depth"):
+                buy_vwap, buy_filled = vwap_from_levels(depth['asks'], 1.0)
+                sell_vwap, sell_filled = vwap_from_levels(depth['bids'], 1.0)
+                st.caption(f"Fill 1.0: buy ${buy_vwap:,.2f} ({buy_filled:g}) | "
+                           f"sell ${sell_vwap:,.2f} ({sell_filled:g})")
+                
+                depth_df = pd.DataFrame({
+                    'Bid Size': [level[1] for level in depth['bids']],
+                    'Bid': [level[0] for level in depth['bids']],
+                }).join(pd.DataFrame({
+                    'Ask': [level[0] for level in depth['asks']],
+                    'Ask Size': [level[1] for level in depth['asks']],
+                }), how='outer')
+                st.dataframe(depth_df, hide_index=True, use_container_width=True)
+        st.markdown("---")
+
+def render_latency(placeholder, latency_data):
+    if not latency_data:
+        placeholder.empty()
+        return
+    
+    with placeholder.container():
+        st.markdown("---")
+        st.subheader("Feed Latency (ms)")
+        latency_rows = [
+            {
+                'Feed': feed,
+                'Stage': stage,
+                'Count': summary['count'],
+                'p50': summary['p50_ms'],
+                'p90': summary['p90_ms'],
+                'p99': summary['p99_ms'],
+                'Max': summary['max_ms']
+            }
+            for feed, stages in latency_data.items()
+            for stage, summary in stages.items()
+        ]
+        st.dataframe(pd.DataFrame(latency_rows), hide_index=True, use_container_width=True)
+
+def charted_bars(bars_data, resolution):
+    """{(exchange, product): columns} for every product with at least one bar at `resolution`"""
+    return {
+        (exchange, product): resolutions[resolution]
+        for exchange, products in bars_data.items()
+        for product, resolutions in products.items()
+        if resolution in resolutions and len(resolutions[resolution]['start'])
+    }
+
+def bar_signature(bars):
+    """Changes whenever a bar closes or the open bar moves"""
+    return (len(bars['start']), bars['start'][-1], bars['high'][-1], bars['low'][-1],
+            bars['close'][-1], bars['volume'][-1])
+
+def build_bar_layout(placeholder, label, keys):
+    """Heading plus an empty slot per charted product; returns {(exchange, product): slot}"""
+    slots = {}
+    if not keys:
+        placeholder.empty()
+        return slots
+    
+    with placeholder.container():
+        st.markdown("---")
+        st.subheader(f"{label} Bars")
+        cols = st.columns(2)
+        for idx, key in enumerate(keys):
+            with cols[idx % 2]:
+                slots[key] = st.empty()
+    return slots
+
+def build_bar_figure(exchange, product, bars):
+    """Candlestick + VWAP figure for one product"""
+    times = pd.to_datetime(bars['start'], unit='s')
+    fig = go.Figure([
+        go.Candlestick(x=times, open=bars['open'], high=bars['high'], low=bars['low'],
+                       close=bars['close'], name='Mid'),
+        go.Scatter(x=times, y=bars['vwap'], name='VWAP', line={'width': 1})
+    ])
+    fig.update_layout(title=f"{product} ({exchange})", height=300, xaxis_rangeslider_visible=False,
+                      margin={'t': 40, 'b': 20})
+    return fig
+
 if page == "Market Data":
     st.title("Real-Time Crypto Market Data")
     st.markdown("---")
     
-    placeholder = st.empty()
+    bar_label = st.sidebar.selectbox("Bar Resolution", list(BAR_RESOLUTIONS), index=1)
+    
+    status = st.empty()
+    board_placeholder = st.empty()
+    bars_placeholder = st.empty()
+    latency_placeholder = st.empty()
+    
+    # Versions last drawn, the exchange/product layout and each product's last drawn quote
+    market_seen = latency_seen = bars_seen = None
+    layout = None
+    slots = {}
+    rendered = {}
+    # Same for the bar charts: charted products, their slots and (signature, time) last drawn
+    bars_layout = None
+    bar_slots = {}
+    bars_drawn = {}
     
     while True:
         try:
-            if market_data_file.exists():
-                with open(market_data_file, 'rb') as f:
-                    data = pickle.load(f)
+            current = (market_data_version(), file_version(depth_data_file))
+            if current != market_seen:
+                market_seen = current
+                start = time.perf_counter()
+                data = load_market_data()
                 
-                with placeholder.container():
-                    st.info(f" Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                if data is not None:
+                    depth_data = load_depth_data()
                     
-                    exchanges = list(data.keys())
+                    # Rebuild the page skeleton only when exchanges or products come and go
+                    current_layout = tuple((exchange, tuple(products)) for exchange, products in data.items())
+                    if current_layout != layout:
+                        layout = current_layout
+                        slots = build_market_layout(board_placeholder, data)
+                        rendered.clear()
                     
-                    if len(exchanges) == 0:
-                        st.warning(" Waiting for market data...")
-                    else:
-                        cols = st.columns(len(exchanges))
-                        
-                        for idx, exchange in enumerate(exchanges):
-                            with cols[idx]:
-                                st.header(f"{exchange.upper()}")
-                                
-                                products = data[exchange]
-                                
-                                for product, info in products.items():
-                                    st.subheader(f" {product}")
-                                    
-                                    col1, col2 = st.columns(2)
-                                    
-                                    with col1:
-                                        st.metric(
-                                            label="Best Bid",
-                                            value=f"${info['bid']:,.2f}"
-                                        )
-                                        st.metric(
-                                            label="Spread",
-                                            value=f"${info['spread']:.2f}",
-                                            delta=f"{info['spread_percent']:.3f}%"
-                                        )
-                                    
-                                    with col2:
-                                        st.metric(
-                                            label="Best Ask",
-                                            value=f"${info['ask']:,.2f}"
-                                        )
-                                        st.metric(
-                                            label="24h Volume",
-                                            value=f"{info['volume']:,.2f}"
-                                        )
-                                    
-                                    st.caption(f" {info['timestamp']}")
-                                    st.markdown("---")
-            else:
-                st.warning("No data file found. Make sure the WebSocket aggregator is running!")
-                st.info("Run the market data aggregator script first to start collecting data.")
+                    redrawn = 0
+                    for exchange, products in data.items():
+                        for product, info in products.items():
+                            depth = depth_data.get(exchange, {}).get(product)
+                            key = (info['bid'], info['ask'], info['volume'], info['timestamp'], depth)
+                            if rendered.get((exchange, product)) != key:
+                                render_product(slots[(exchange, product)], product, info, depth)
+                                rendered[(exchange, product)] = key
+                                redrawn += 1
+                    
+                    render_readout(status, "Last Updated", time.perf_counter() - start,
+                                   f" ({redrawn}/{len(rendered)} products redrawn)")
+                else:
+                    layout = None
+                    status.empty()
+                    with board_placeholder.container():
+                        st.warning("No data file found. Make sure the WebSocket aggregator is running!")
+                        st.info("Run the market data aggregator script first to start collecting data.")
+            
+            bars_version = file_version(bars_data_file)
+            if bars_version != bars_seen:
+                bars_seen = bars_version
+                charted = charted_bars(load_bars_data(), BAR_RESOLUTIONS[bar_label])
+                if tuple(charted) != bars_layout:
+                    bars_layout = tuple(charted)
+                    bar_slots = build_bar_layout(bars_placeholder, bar_label, bars_layout)
+                    bars_drawn.clear()
+                
+                # Only charts whose bars moved are rebuilt and re-sent, each at most every BAR_REDRAW_INTERVAL
+                now = time.monotonic()
+                for key, bars in charted.items():
+                    signature = bar_signature(bars)
+                    drawn = bars_drawn.get(key)
+                    if drawn is not None and drawn[0] == signature:
+                        continue
+                    if drawn is not None and now - drawn[1] < BAR_REDRAW_INTERVAL:
+                        # Throttled; look again on the next poll even if the file does not change
+                        bars_seen = None
+                        continue
+                    bar_slots[key].plotly_chart(build_bar_figure(*key, bars), use_container_width=True)
+                    bars_drawn[key] = (signature, now)
+            
+            latency_version = file_version(latency_data_file)
+            if latency_version != latency_seen:
+                latency_seen = latency_version
+                render_latency(latency_placeholder, load_latency_data())
         
         except Exception as e:
-            st.error(f" Error loading data: {e}")
+            market_seen = None
+            status.error(f" Error loading data: {e}")
         
-        time.sleep(2)
+        time.sleep(MARKET_POLL_INTERVAL)
 
 # ====================== PAGE 2: SENTIMENT ANALYSIS ======================
-elif page == "Sentiment Analysis":
-    st.title("Market Sentiment Analysis")
-    st.markdown("---")
+@st.cache_resource(max_entries=2, show_spinner=False)
+def build_sentiment_figures(version, _sentiment_data):
+    """Histogram, gauge and history figures, built once per sentiment file version"""
+    overall = _sentiment_data.get('overall_sentiment', 0)
+    all_items = _sentiment_data.get('reddit', []) + _sentiment_data.get('news', [])
+    
+    fig = fig_gauge = fig_history = None
+    if all_items:
+        sentiments = [item['sentiment'] for item in all_items]
+        
+        # Create histogram
+        fig = px.histogram(
+            x=sentiments,
+            nbins=20,
+            title="Sentiment Distribution",
+            labels={'x': 'Sentiment Score', 'y': 'Count'},
+            color_discrete_sequence=['#1f77b4']
+        )
+        fig.add_vline(x=0, line_dash="dash", line_color="red", annotation_text="Neutral")
+        fig.update_layout(height=400)
+        
+        # Create sentiment gauge
+        fig_gauge = go.Figure(go.Indicator(
+            mode="gauge+number+delta",
+            value=overall,
+            domain={'x': [0, 1], 'y': [0, 1]},
+            title={'text': "Overall Sentiment Score"},
+            delta={'reference': 0},
+            gauge={
+                'axis': {'range': [-1, 1]},
+                'bar': {'color': "darkblue"},
+                'steps': [
+                    {'range': [-1, -0.3], 'color': "lightcoral"},
+                    {'range': [-0.3, 0.3], 'color': "lightyellow"},
+                    {'range': [0.3, 1], 'color': "lightgreen"}
+                ],
+                'threshold': {
+                    'line': {'color': "red", 'width': 4},
+                    'thickness': 0.75,
+                    'value': 0
+                }
+            }
+        ))
+        fig_gauge.update_layout(height=300)
     
-    placeholder = st.empty()
+    # Rolling time-decayed sentiment
+    history = _sentiment_data.get('history', [])
+    if len(history) > 1:
+        history_df = pd.DataFrame(history, columns=['time', 'sentiment'])
+        history_df['time'] = pd.to_datetime(history_df['time'], unit='s')
+        fig_history = px.line(history_df, x='time', y='sentiment', title="Sentiment Over Time")
+        fig_history.update_layout(height=300)
     
-    while True:
-        try:
-            if sentiment_data_file.exists():
-                with open(sentiment_data_file, 'rb') as f:
-                    sentiment_data = pickle.load(f)
-                
-                with placeholder.container():
-                    # Header with overall sentiment
-                    col1, col2, col3 = st.columns(3)
-                    
-                    overall = sentiment_data.get('overall_sentiment', 0)
-                    sentiment_label = "Bullish" if overall > 0.1 else "Bearish" if overall < -0.1 else "🟡 Neutral"
-                    
-                    with col1:
-                        st.metric(
-                            label="Overall Sentiment",
-                            value=sentiment_label,
-                            delta=f"{overall:.3f}"
-                        )
-                    
-                    with col2:
-                        reddit_count = len(sentiment_data.get('reddit', []))
-                        st.metric(
-                            label="Reddit Posts Analyzed",
-                            value=reddit_count
-                        )
-                    
-                    with col3:
-                        news_count = len(sentiment_data.get('news', []))
-                        st.metric(
-                            label="News Articles Analyzed",
-                            value=news_count
-                        )
-                    
-                    st.info(f"Last Updated: {sentiment_data.get('last_update', 'Never')}")
-                    st.markdown("---")
-                    
-                    # Sentiment Distribution Chart
-                    all_items = sentiment_data.get('reddit', []) + sentiment_data.get('news', [])
+    return fig, fig_gauge, fig_history
+
+def render_sentiment(placeholder, sentiment_data, figures):
+    overall = sentiment_data.get('overall_sentiment', 0)
+    
+    with placeholder.container():
+        # Header with overall sentiment
+        col1, col2, col3 = st.columns(3)
+        
+        sentiment_label = "Bullish" if overall > 0.1 else "Bearish" if overall < -0.1 else "🟡 Neutral"
+        
+        with col1:
+            st.metric(
+                label="Overall Sentiment",
+                value=sentiment_label,
+                delta=f"{overall:.3f}"
+            )
+        
+        with col2:
+            reddit_count = len(sentiment_data.get('reddit', []))
+            st.metric(
+                label="Reddit Posts Analyzed",
+                value=reddit_count
+            )
+        
+        with col3:
+            news_count = len(sentiment_data.get('news', []))
+            st.metric(
+                label="News Articles Analyzed",
+                value=news_count
+            )
+        
+        st.info(f"Last Updated: {sentiment_data.get('last_update', 'Never')}")
+        st.markdown("---")
+        
+        # Sentiment Distribution Chart
+        for fig in figures:
+            if fig is not None:
+                st.plotly_chart(fig, use_container_width=True)
+        
+        st.markdown("---")
+        
+        # Display Reddit and News side by side
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader(" Reddit Sentiment")
+            reddit_items = sentiment_data.get('reddit', [])
+            
+            if reddit_items:
+                for item in reddit_items[-10:]:  # Show last 10
+                    sentiment_emoji = "🟢" if item['sentiment'] > 0.1 else "🔴" if item['sentiment'] < -0.1 else "🟡"
                     
-                    if all_items:
-                        sentiments = [item['sentiment'] for item in all_items]
-                        
-                        # Create histogram
-                        fig = px.histogram(
-                            x=sentiments,
-                            nbins=20,
-                            title="Sentiment Distribution",
-                            labels={'x': 'Sentiment Score', 'y': 'Count'},
-                            color_discrete_sequence=['#1f77b4']
-                        )
-                        fig.add_vline(x=0, line_dash="dash", line_color="red", annotation_text="Neutral")
-                        fig.update_layout(height=400)
-                        st.plotly_chart(fig, use_container_width=True)
-                        
-                        # Create sentiment gauge
-                        fig_gauge = go.Figure(go.Indicator(
-                            mode="gauge+number+delta",
-                            value=overall,
-                            domain={'x': [0, 1], 'y': [0, 1]},
-                            title={'text': "Overall Sentiment Score"},
-                            delta={'reference': 0},
-                            gauge={
-                                'axis': {'range': [-1, 1]},
-                                'bar': {'color': "darkblue"},
-                                'steps': [
-                                    {'range': [-1, -0.3], 'color': "lightcoral"},
-                                    {'range': [-0.3, 0.3], 'color': "lightyellow"},
-                                    {'range': [0.3, 1], 'color': "lightgreen"}
-                                ],
-                                'threshold': {
-                                    'line': {'color': "red", 'width': 4},
-                                    'thickness': 0.75,
-                                    'value': 0
-                                }
-                            }
-                        ))
-                        fig_gauge.update_layout(height=300)
-                        st.plotly_chart(fig_gauge, use_container_width=True)
+                    with st.expander(f"{sentiment_emoji} {item['source']} ({item['sentiment']:.2f})"):
+                        st.write(item['text'])
+                        st.caption(f"Score: {item['score']} | {item['timestamp']}")
+            else:
+                st.info("No Reddit data available yet")
+        
+        with col2:
+            st.subheader("News Sentiment")
+            news_items = sentiment_data.get('news', [])
+            
+            if news_items:
+                for item in news_items[-10:]:  # Show last 10
+                    sentiment_emoji = "🟢" if item['sentiment'] > 0.1 else "🔴" if item['sentiment'] < -0.1 else "🟡"
                     
-                    st.markdown("---")
+                    with st.expander(f"{sentiment_emoji} {item['source']} ({item['sentiment']:.2f})"):
+                        st.write(item['text'])
+                        if item.get('url'):
+                            st.markdown(f"[Read more]({item['url']})")
+                        st.caption(item['timestamp'])
+            else:
+                st.info("No news data available yet")
+        
+        st.markdown("---")
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def build_correlation_figures(version, _correlation_data):
+    """One product x lag heatmap per window, built once per correlation file version"""
+    interval = _correlation_data['interval']
+    lags = _correlation_data['lags']
+    rows = [(f"{product} ({exchange})", result['correlation'])
+            for exchange, products in _correlation_data['products'].items()
+            for product, result in products.items()]
+    figures = []
+    if not rows:
+        return figures
+    for index, window in enumerate(_correlation_data['windows']):
+        label = format_window(window, interval)
+        fig = go.Figure(go.Heatmap(
+            z=[correlation[index] for _, correlation in rows],
+            x=[format_window(lag, interval) if lag else '0' for lag in lags],
+            y=[name for name, _ in rows],
+            zmin=-1, zmax=1, colorscale='RdBu', zmid=0
+        ))
+        fig.update_layout(title=f"Sentiment vs Return Correlation by Lag ({label} window)",
+                          xaxis_title="Lag (positive: sentiment leads price)",
+                          height=max(250, 60 + 30 * len(rows)))
+        figures.append((label, fig))
+    return figures
+
+def render_market_context(placeholder, market_data, correlation_data, figures):
+    with placeholder.container():
+        # Market Impact Analysis
+        st.subheader("Sentiment vs Market Data")
+        
+        if market_data is not None:
+            results = correlation_data['products'] if correlation_data else {}
+            if correlation_data:
+                labels = [format_window(window, correlation_data['interval'])
+                          for window in correlation_data['windows']]
+                st.write(f"**Rolling correlation of sentiment with mid-price returns** "
+                         f"({correlation_data['samples']} samples, every {correlation_data['interval']:g}s):")
+            else:
+                labels = []
+                st.write("**Current Market Prices** (correlations appear after the first sentiment refresh):")
+            
+            for exchange, products in market_data.items():
+                for product, info in products.items():
+                    col_a, col_b, col_c = st.columns([2, 2, 3])
                     
-                    # Display Reddit and News side by side
-                    col1, col2 = st.columns(2)
+                    with col_a:
+                        st.write(f"**{product}** ({exchange})")
                     
-                    with col1:
-                        st.subheader(" Reddit Sentiment")
-                        reddit_items = sentiment_data.get('reddit', [])
-                        
-                        if reddit_items:
-                            for item in reddit_items[-10:]:  # Show last 10
-                                sentiment_emoji = "🟢" if item['sentiment'] > 0.1 else "🔴" if item['sentiment'] < -0.1 else "🟡"
-                                
-                                with st.expander(f"{sentiment_emoji} {item['source']} ({item['sentiment']:.2f})"):
-                                    st.write(item['text'])
-                                    st.caption(f"Score: {item['score']} | {item['timestamp']}")
-                        else:
-                            st.info("No Reddit data available yet")
+                    with col_b:
+                        st.write(f"${info['bid']:,.2f}")
                     
-                    with col2:
-                        st.subheader("News Sentiment")
-                        news_items = sentiment_data.get('news', [])
-                        
-                        if news_items:
-                            for item in news_items[-10:]:  # Show last 10
-                                sentiment_emoji = "🟢" if item['sentiment'] > 0.1 else "🔴" if item['sentiment'] < -0.1 else "🟡"
-                                
-                                with st.expander(f"{sentiment_emoji} {item['source']} ({item['sentiment']:.2f})"):
-                                    st.write(item['text'])
-                                    if item.get('url'):
-                                        st.markdown(f"[Read more]({item['url']})")
-                                    st.caption(item['timestamp'])
+                    with col_c:
+                        result = results.get(exchange, {}).get(product)
+                        if result is None:
+                            st.caption("Not enough samples yet")
                         else:
-                            st.info("No news data available yet")
-                    
-                    st.markdown("---")
-                    
-                    # Market Impact Analysis
-                    st.subheader("Sentiment vs Market Data")
-                    
-                    if market_data_file.exists():
-                        with open(market_data_file, 'rb') as f:
-                            market_data = pickle.load(f)
-                        
-                        st.write("**Current Market Prices with Sentiment Context:**")
-                        
-                        for exchange, products in market_data.items():
-                            for product, info in products.items():
-                                col_a, col_b, col_c = st.columns([2, 2, 3])
-                                
-                                with col_a:
-                                    st.write(f"**{product}** ({exchange})")
-                                
-                                with col_b:
-                                    st.write(f"${info['bid']:,.2f}")
-                                
-                                with col_c:
-                                    if overall > 0.1:
-                                        st.success(f"🟢 Bullish sentiment may support upward price movement")
-                                    elif overall < -0.1:
-                                        st.error(f"🔴 Bearish sentiment may indicate downward pressure")
-                                    else:
-                                        st.info(f"🟡 Neutral sentiment - market consolidation likely")
-                    else:
-                        st.warning("Market data not available. Start the aggregator to see correlation.")
-                    
-            else:
-                st.warning("No sentiment data available yet.")
-                st.info("The aggregator will fetch sentiment data every 5 minutes. Please wait...")
+                            st.write(" | ".join(
+                                f"{label}: {value:+.2f} (n={count})" if pd.notna(value) else f"{label}: n/a (n={count})"
+                                for label, value, count in zip(labels, result['lag0'], result['samples'])
+                            ))
+            
+            if figures:
+                tabs = st.tabs([label for label, _ in figures])
+                for tab, (_, fig) in zip(tabs, figures):
+                    with tab:
+                        st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.warning("Market data not available. Start the aggregator to see correlation.")
+
+if page == "Sentiment Analysis":
+    st.title("Market Sentiment Analysis")
+    st.markdown("---")
+    
+    status = st.empty()
+    sentiment_placeholder = st.empty()
+    context_placeholder = st.empty()
+    
+    sentiment_seen = context_seen = None
+    overall = None
+    correlation_figures = []
+    
+    while True:
+        try:
+            sentiment_version = sentiment_data_version()
+            if sentiment_version != sentiment_seen:
+                sentiment_seen = sentiment_version
+                start = time.perf_counter()
+                
+                if sentiment_version is not None:
+                    sentiment_data = load_sentiment_data(sentiment_version)
+                    overall = sentiment_data.get('overall_sentiment', 0)
+                    figures = build_sentiment_figures(sentiment_version, sentiment_data)
+                    render_sentiment(sentiment_placeholder, sentiment_data, figures)
+                    render_readout(status, "Sentiment Updated", time.perf_counter() - start)
+                else:
+                    overall = None
+                    status.empty()
+                    context_placeholder.empty()
+                    with sentiment_placeholder.container():
+                        st.warning("No sentiment data available yet.")
+                        st.info("The aggregator will fetch sentiment data every 5 minutes. Please wait...")
+            
+            if overall is not None:
+                correlation_version = file_version(correlation_data_file)
+                # Prices follow the market data like the market page; correlations change once
+                # per sample and their loads and figures are cached by file version
+                context_version = (correlation_version, market_data_version())
+                if context_version != context_seen:
+                    context_seen = context_version
+                    correlation_data = load_correlation_data()
+                    if correlation_data is not None:
+                        correlation_figures = build_correlation_figures(correlation_version, correlation_data)
+                    render_market_context(context_placeholder, load_market_data(), correlation_data,
+                                          correlation_figures)
         
         except Exception as e:
-            st.error(f"Error loading sentiment data: {e}")
+            sentiment_seen = None
+            status.error(f"Error loading sentiment data: {e}")
         
-        time.sleep(3)
\ No newline at end of file
+        time.sleep(SENTIMENT_POLL_INTERVAL)
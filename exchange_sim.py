@@ -0,0 +1,269 @@
+"""Local stand-in for the Coinbase and Kraken WebSocket ticker feeds.
+
+Serves ws://host:port/coinbase and ws://host:port/kraken. Every
+connection waits for the same subscribe messages the real exchanges
+expect, acknowledges them the way the exchange does, then streams
+ticker frames for the subscribed products at a fixed message rate with
+random-walk prices. Heartbeats are interleaved so the prefilters in
+decoding.py see a realistic mix.
+
+Order book channels are not simulated: Coinbase leaves them out of its
+subscriptions ack and Kraken answers with an error status.
+
+    python exchange_sim.py [--port 8765] [--rate 1000]
+
+Point the feed engine at it with CoinbaseAdapter(url=sim.url('coinbase'))
+and KrakenAdapter(url=sim.url('kraken')).
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import websockets
+
+EXCHANGES = ('coinbase', 'kraken')
+
+
+def synthetic_products(exchange, count):
+    """`count` made-up product names in the exchange's own symbol format"""
+    separator = '/' if exchange == 'kraken' else '-'
+    return [f"SIM{i}{separator}USD" for i in range(count)]
+
+
+class _Instrument:
+    """Random-walk top of book for one simulated product"""
+
+    __slots__ = ('mid', 'volume', 'sequence')
+
+    def __init__(self, rng):
+        self.mid = rng.uniform(10, 100_000)
+        self.volume = rng.uniform(1_000, 100_000)
+        self.sequence = 0
+
+    def step(self, rng):
+        self.mid *= 1 + rng.gauss(0, 1e-4)
+        self.volume += rng.random()
+        self.sequence += 1
+        half_spread = self.mid * 5e-5
+        return self.mid - half_spread, self.mid + half_spread
+
+
+def coinbase_ticker(product, instrument, bid, ask, now):
+    stamp = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return (
+        f'{{"type":"ticker","sequence":{instrument.sequence},"product_id":"{product}",'
+        f'"price":"{ask:.2f}","open_24h":"{instrument.mid:.2f}","volume_24h":"{instrument.volume:.8f}",'
+        f'"low_24h":"{bid:.2f}","high_24h":"{ask:.2f}","best_bid":"{bid:.2f}","best_bid_size":"0.50000000",'
+        f'"best_ask":"{ask:.2f}","best_ask_size":"0.50000000","side":"buy","time":"{stamp}",'
+        f'"trade_id":{instrument.sequence},"last_size":"0.01000000"}}'
+    )
+
+
+def kraken_ticker(channel_id, pair, instrument, bid, ask):
+    return (
+        f'[{channel_id},{{"a":["{ask:.5f}",1,"1.00000000"],"b":["{bid:.5f}",1,"1.00000000"],'
+        f'"c":["{ask:.5f}","0.01000000"],"v":["{instrument.volume / 4:.8f}","{instrument.volume:.8f}"],'
+        f'"p":["{instrument.mid:.5f}","{instrument.mid:.5f}"],"t":[{instrument.sequence},{instrument.sequence}],'
+        f'"l":["{bid:.5f}","{bid:.5f}"],"h":["{ask:.5f}","{ask:.5f}"],"o":["{instrument.mid:.5f}","{instrument.mid:.5f}"]}},'
+        f'"ticker","{pair}"]'
+    )
+
+
+class ExchangeSimulator:
+    """Synthetic Coinbase/Kraken ticker server running on its own event loop thread.
+
+    `rate` is the number of ticker messages per second sent on each
+    connection, spread round-robin over the products that connection
+    subscribed to. A client that cannot keep up slows the sender down
+    through WebSocket backpressure; `sent` counts what was actually sent.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, rate=1000.0, heartbeat_interval=1.0, seed=None):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.heartbeat_interval = heartbeat_interval
+        self.rng = random.Random(seed)
+
+        self.sent = {exchange: 0 for exchange in EXCHANGES}
+        self.connections = {exchange: 0 for exchange in EXCHANGES}
+
+        self.loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._stopped = None
+        self._instruments = {}
+
+    def url(self, exchange):
+        return f"ws://{self.host}:{self.port}/{exchange}"
+
+    def start(self):
+        """Start serving on a background daemon thread; returns once the port is bound"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name='exchange-sim', daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+
+    def stop(self):
+        if self.loop is not None and self._stopped is not None:
+            self.loop.call_soon_threadsafe(self._stopped.set_result, None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.serve())
+        finally:
+            self.loop.close()
+
+    async def serve(self):
+        """Serve until stop() is called"""
+        self._stopped = asyncio.get_running_loop().create_future()
+        async with websockets.serve(self._handle, self.host, self.port, max_size=None) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stopped
+
+    def _instrument(self, exchange, product):
+        key = (exchange, product)
+        instrument = self._instruments.get(key)
+        if instrument is None:
+            instrument = self._instruments[key] = _Instrument(self.rng)
+        return instrument
+
+    async def _handle(self, ws):
+        exchange = ws.request.path.strip('/')
+        if exchange not in EXCHANGES:
+            await ws.close(1008, f"unknown exchange {exchange!r}")
+            return
+
+        self.connections[exchange] += 1
+        try:
+            if exchange == 'coinbase':
+                await self._serve_coinbase(ws)
+            else:
+                await self._serve_kraken(ws)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _serve_coinbase(self, ws):
+        request = json.loads(await ws.recv())
+        products = list(request.get('product_ids', []))
+        channels = [name for name in request.get('channels', []) if name in ('ticker', 'heartbeat')]
+        await ws.send(json.dumps({
+            "type": "subscriptions",
+            "channels": [{"name": name, "product_ids": products} for name in channels]
+        }))
+        if 'ticker' not in channels or not products:
+            await ws.wait_closed()
+            return
+
+        def frame(index, now):
+            product = products[index % len(products)]
+            instrument = self._instrument('coinbase', product)
+            bid, ask = instrument.step(self.rng)
+            return coinbase_ticker(product, instrument, bid, ask, now)
+
+        def heartbeats():
+            now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            return [
+                f'{{"type":"heartbeat","last_trade_id":0,"product_id":"{product}","sequence":0,"time":"{now}"}}'
+                for product in products
+            ] if 'heartbeat' in channels else []
+
+        await self._stream(ws, 'coinbase', frame, heartbeats)
+
+    async def _serve_kraken(self, ws):
+        await ws.send(json.dumps({
+            "connectionID": self.rng.getrandbits(63), "event": "systemStatus", "status": "online", "version": "sim"
+        }))
+
+        pairs = []
+        channel_ids = {}
+        # The aggregator sends its subscriptions back to back, so take whatever arrives first
+        while True:
+            try:
+                request = json.loads(await asyncio.wait_for(ws.recv(), timeout=0.2 if pairs else None))
+            except asyncio.TimeoutError:
+                break
+            name = request.get('subscription', {}).get('name')
+            for pair in request.get('pair', []):
+                if name != 'ticker':
+                    await ws.send(json.dumps({
+                        "event": "subscriptionStatus", "pair": pair, "status": "error",
+                        "errorMessage": f"Subscription {name} not supported by simulator",
+                        "subscription": request.get('subscription', {})
+                    }))
+                    continue
+                channel_ids[pair] = channel_ids.get(pair, 100 + len(channel_ids))
+                pairs.append(pair)
+                await ws.send(json.dumps({
+                    "channelID": channel_ids[pair], "channelName": "ticker", "event": "subscriptionStatus",
+                    "pair": pair, "status": "subscribed", "subscription": {"name": "ticker"}
+                }))
+
+        def frame(index, now):
+            pair = pairs[index % len(pairs)]
+            instrument = self._instrument('kraken', pair)
+            bid, ask = instrument.step(self.rng)
+            return kraken_ticker(channel_ids[pair], pair, instrument, bid, ask)
+
+        await self._stream(ws, 'kraken', frame, lambda: ['{"event":"heartbeat"}'])
+
+    async def _stream(self, ws, exchange, frame, heartbeats):
+        """Send frame(i) at self.rate messages/sec with heartbeats every heartbeat_interval"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        next_heartbeat = started + self.heartbeat_interval
+        index = 0
+        while True:
+            now = loop.time()
+            due = int((now - started) * self.rate) - index
+            if due > self.rate:
+                # Too far behind to catch up; drop the backlog rather than burst
+                started = now - index / self.rate
+                due = 0
+
+            if due > 0:
+                wall = time.time()
+                for _ in range(min(due, 1000)):
+                    await ws.send(frame(index, wall))
+                    index += 1
+                self.sent[exchange] += min(due, 1000)
+
+            if now >= next_heartbeat:
+                for message in heartbeats():
+                    await ws.send(message)
+                next_heartbeat = now + self.heartbeat_interval
+
+            if due < 1000:
+                await asyncio.sleep(0.001)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=1000.0, help='ticker messages/sec per connection')
+    args = parser.parse_args()
+
+    simulator = ExchangeSimulator(args.host, args.port, args.rate).start()
+    print(f"Simulating {', '.join(simulator.url(exchange) for exchange in EXCHANGES)} at {args.rate:g} msgs/sec")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"  sent {simulator.sent}")
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+
+import websockets
+
+from decoding import CoinbaseDecoder, KrakenDecoder, get_loads
+from frame_capture import read_frames, replay_frames
+from order_book import ResyncRequired
+
+
+class ExchangeAdapter:
+    """Describes how to talk to one exchange: where to connect, what to subscribe to and how to parse"""
+
+    name = None
+    url = None
+
+    def __init__(self, products, url=None):
+        self.set_products(products)
+        # Override the exchange endpoint, e.g. to point at exchange_sim.py
+        if url is not None:
+            self.url = url
+
+    def set_products(self, products):
+        """Replace the subscribed products; takes effect on the next (re)connect"""
+        products = [sys.intern(product) for product in dict.fromkeys(products)]
+        # Decoded frames carry fresh strings; symbols maps them back onto the interned ones
+        self.symbols = {product: product for product in products}
+        self.products = products
+
+    def subscribe_messages(self, products=None):
+        """Messages to send after every (re)connect, or to add `products` to a live connection"""
+        raise NotImplementedError
+
+    def unsubscribe_messages(self, products):
+        """Messages that drop `products` from a live connection"""
+        raise NotImplementedError
+
+    def parse(self, message):
+        """Return a list of Quotes found in a raw frame"""
+        raise NotImplementedError
+
+
+class CoinbaseAdapter(ExchangeAdapter):
+    name = 'coinbase'
+    url = 'wss://ws-feed.exchange.coinbase.com'
+
+    def __init__(self, products=('BTC-USD', 'ETH-USD'), heartbeat=True, json_backend=None,
+                 books=None, book_channel='level2_batch', url=None):
+        super().__init__(products, url)
+        self.heartbeat = heartbeat
+        self.decoder = CoinbaseDecoder(json_backend)
+        self.loads = get_loads(self.decoder.backend)
+        self.books = books
+        self.book_channel = book_channel
+
+    def _channels(self):
+        channels = ['ticker', 'heartbeat'] if self.heartbeat else ['ticker']
+        if self.books is not None:
+            channels.append(self.book_channel)
+        return channels
+
+    def subscribe_messages(self, products=None):
+        return [{
+            "type": "subscribe",
+            "product_ids": list(self.products if products is None else products),
+            "channels": self._channels()
+        }]
+
+    def unsubscribe_messages(self, products):
+        return [{
+            "type": "unsubscribe",
+            "product_ids": list(products),
+            "channels": self._channels()
+        }]
+
+    def parse(self, message):
+        quote = self.decoder.decode(message)
+        if quote is not None:
+            return [quote]
+        if self.books is not None and ('"l2update"' in message or '"snapshot"' in message):
+            self._parse_book(message)
+        return []
+
+    def _parse_book(self, message):
+        """Apply a level2 snapshot or l2update.
+
+        level2_batch messages carry no sequence numbers, so a dropped update
+        cannot be detected as a gap; the only consistency check is a crossed
+        book. Gap detection proper applies only to Kraken, via its checksum.
+        """
+        data = self.loads(message)
+        kind = data.get('type')
+        if kind not in ('snapshot', 'l2update'):
+            return
+
+        with self.books.lock:
+            book = self.books.get(self.name, data['product_id'])
+            if kind == 'snapshot':
+                book.clear()
+                for price, size in data.get('bids', []):
+                    book.apply('bid', price, size)
+                for price, size in data.get('asks', []):
+                    book.apply('ask', price, size)
+                book.synced = True
+            else:
+                if not book.synced:
+                    raise ResyncRequired(f"{self.name} {book.product} update before snapshot")
+                for side, price, size in data.get('changes', []):
+                    book.apply('bid' if side == 'buy' else 'ask', price, size)
+
+            if book.is_crossed():
+                book.clear()
+                raise ResyncRequired(f"{self.name} {book.product} book crossed")
+            self.books.updated(book)
+
+
+class KrakenAdapter(ExchangeAdapter):
+    name = 'kraken'
+    url = 'wss://ws.kraken.com'
+
+    def __init__(self, products=('XBT/USD', 'ETH/USD'), json_backend=None, books=None, book_depth=10, url=None):
+        super().__init__(products, url)
+        self.decoder = KrakenDecoder(json_backend)
+        self.loads = get_loads(self.decoder.backend)
+        self.books = books
+        self.book_depth = book_depth
+
+    def _subscriptions(self):
+        subscriptions = [{"name": "ticker"}]
+        if self.books is not None:
+            subscriptions.append({"name": "book", "depth": self.book_depth})
+        return subscriptions
+
+    def subscribe_messages(self, products=None):
+        pairs = list(self.products if products is None else products)
+        return [{"event": "subscribe", "pair": pairs, "subscription": subscription}
+                for subscription in self._subscriptions()]
+
+    def unsubscribe_messages(self, products):
+        return [{"event": "unsubscribe", "pair": list(products), "subscription": subscription}
+                for subscription in self._subscriptions()]
+
+    def parse(self, message):
+        quote = self.decoder.decode(message)
+        if quote is not None:
+            return [quote]
+        if self.books is not None and message[:1] == '[' and '"book-' in message:
+            self._parse_book(message)
+        return []
+
+    def _parse_book(self, message):
+        data = self.loads(message)
+        # [channelID, payload, (payload,) "book-N", pair]; bids and asks may arrive in separate payloads
+        product = data[-1]
+        checksum = None
+
+        with self.books.lock:
+            book = self.books.get(self.name, product, self.book_depth)
+            for payload in data[1:-2]:
+                if 'as' in payload or 'bs' in payload:
+                    book.clear()
+                    for level in payload.get('as', []):
+                        book.apply('ask', level[0], level[1])
+                    for level in payload.get('bs', []):
+                        book.apply('bid', level[0], level[1])
+                    book.synced = True
+                    continue
+
+                if not book.synced:
+                    raise ResyncRequired(f"{self.name} {product} update before snapshot")
+                for level in payload.get('a', []):
+                    book.apply('ask', level[0], level[1])
+                for level in payload.get('b', []):
+                    book.apply('bid', level[0], level[1])
+                checksum = payload.get('c', checksum)
+
+            book.truncate()
+            if checksum is not None and book.kraken_checksum() != int(checksum):
+                book.clear()
+                raise ResyncRequired(f"{self.name} {product} checksum mismatch")
+            self.books.updated(book)
+
+
+class FeedEngine:
+    """Runs every exchange adapter on a single asyncio event loop.
+
+    Each adapter gets its own connection task which resubscribes after
+    every reconnect, backs off with full jitter on failures and treats a
+    connection that has been silent for `stale_after` seconds as dead.
+    If a FrameRecorder is given every raw frame is captured before parsing,
+    and replay() feeds a capture back through the same path offline.
+    watch() follows a ProductRegistry, subscribing and unsubscribing
+    products on the live connections as it changes.
+    """
+
+    def __init__(self, aggregator, adapters, stale_after=30.0, backoff_base=0.5, backoff_max=30.0, recorder=None):
+        self.aggregator = aggregator
+        self.adapters = list(adapters)
+        self.recorder = recorder
+        self.stale_after = stale_after
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.loop = None
+        self._thread = None
+        self._tasks = []
+        self._stopping = False
+        # Open connection per adapter name, for runtime subscription changes
+        self._sockets = {}
+
+        # Per-feed health, read by display/metrics code
+        self.connected = {adapter.name: False for adapter in self.adapters}
+        self.messages = {adapter.name: 0 for adapter in self.adapters}
+        self.reconnects = {adapter.name: 0 for adapter in self.adapters}
+        self.parse_errors = {adapter.name: 0 for adapter in self.adapters}
+        self.last_message = {adapter.name: None for adapter in self.adapters}
+        self.last_tick = {}
+
+    def start(self):
+        """Run the event loop on a background daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name='feed-engine', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        # wait_for() can swallow a cancel that races a completed recv(), so the
+        # adapter loops also check this flag
+        self._stopping = True
+        if self.loop is not None:
+            for task in self._tasks:
+                self.loop.call_soon_threadsafe(task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.run())
+        finally:
+            self.loop.close()
+
+    async def run(self):
+        """Run all adapters until cancelled"""
+        self._tasks = [asyncio.ensure_future(self._run_adapter(adapter)) for adapter in self.adapters]
+        try:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            pass
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _run_adapter(self, adapter):
+        attempt = 0
+        while not self._stopping:
+            try:
+                async with websockets.connect(adapter.url, ping_interval=20, ping_timeout=20, max_size=None) as ws:
+                    print(f" Connected to {adapter.name}")
+                    self.connected[adapter.name] = True
+                    for message in adapter.subscribe_messages():
+                        await ws.send(json.dumps(message))
+                    self._sockets[adapter.name] = ws
+
+                    try:
+                        while not self._stopping:
+                            message = await asyncio.wait_for(ws.recv(), timeout=self.stale_after)
+                            attempt = 0
+                            self._handle(adapter, message)
+                    finally:
+                        self._sockets.pop(adapter.name, None)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                print(f"{adapter.name} feed stale for {self.stale_after:.0f}s, reconnecting")
+            except ResyncRequired as e:
+                print(f"{adapter.name} order book out of sync ({e}), resubscribing")
+            except Exception as e:
+                print(f"{adapter.name} Error: {e}")
+
+            self.connected[adapter.name] = False
+            # Quotes from a dead connection must not keep setting the consolidated best price
+            self.aggregator.drop_venue(adapter.name)
+            for key in [key for key in self.last_tick if key[0] == adapter.name]:
+                self.last_tick.pop(key, None)
+            if self._stopping:
+                break
+            self.reconnects[adapter.name] += 1
+            delay = self._backoff(attempt)
+            attempt += 1
+            print(f"{adapter.name} connection closed, reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def watch(self, registry):
+        """Track a ProductRegistry: adapters take its products now and follow every later change"""
+        for adapter in self.adapters:
+            if adapter.name in registry.exchanges():
+                adapter.set_products(registry.products(adapter.name))
+        registry.on_change(self._products_changed)
+        return self
+
+    def _products_changed(self, exchange, added, removed):
+        adapter = next((adapter for adapter in self.adapters if adapter.name == exchange), None)
+        if adapter is None:
+            return
+        removed_set = set(removed)
+        adapter.set_products([product for product in adapter.products if product not in removed_set] + list(added))
+        for product in removed:
+            self.last_tick.pop((exchange, product), None)
+
+        messages = []
+        if removed:
+            messages += adapter.unsubscribe_messages(removed)
+        if added:
+            messages += adapter.subscribe_messages(added)
+        # Without a live connection the next connect subscribes to the new product list anyway
+        if self.loop is not None and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._send(exchange, messages), self.loop)
+
+    async def _send(self, exchange, messages):
+        ws = self._sockets.get(exchange)
+        if ws is None:
+            return
+        try:
+            for message in messages:
+                await ws.send(json.dumps(message))
+        except Exception as e:
+            # The connection loop notices the failure and resubscribes on reconnect
+            print(f"{exchange} Error updating subscriptions: {e}")
+
+    def start_replay(self, path, speed=1.0):
+        """Replay a capture on a background daemon thread instead of connecting"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.replay, args=(path, speed), name='feed-replay', daemon=True)
+            self._thread.start()
+        return self
+
+    def replay(self, path, speed=1.0):
+        """Feed a frame capture through the adapters without network access.
+
+        Ticks are stamped with the time each frame was captured rather than
+        the time it is replayed, so a replay builds the same history and bars
+        at any speed. Exchange timestamps in the captured frames are dropped
+        so replayed ticks do not skew the exchange→receive latency histogram.
+        """
+        adapters = {adapter.name: adapter for adapter in self.adapters}
+        self.aggregator.replaying = True
+
+        def deliver(exchange, message, wall_ns):
+            adapter = adapters.get(exchange)
+            if adapter is None or self._stopping:
+                return
+            try:
+                self._handle(adapter, message, replay_time=wall_ns / 1e9)
+            except ResyncRequired as e:
+                # A live session would reconnect; the capture carries the fresh snapshot that followed
+                self.reconnects[adapter.name] += 1
+                print(f"{adapter.name} order book out of sync during replay ({e})")
+
+        start = time.perf_counter()
+        count = replay_frames(read_frames(path), deliver, speed)
+        elapsed = time.perf_counter() - start
+        print(f"Replayed {count} frames from {path} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} frames/sec)")
+        return count
+
+    def _handle(self, adapter, message, replay_time=None):
+        """Parse one frame and apply its quotes; replay_time is the captured wall time of a replayed frame"""
+        replay = replay_time is not None
+        receive_ns = time.monotonic_ns()
+        if self.recorder is not None and not replay:
+            self.recorder.record(adapter.name, message, receive_ns)
+        now = time.time()
+        self.messages[adapter.name] += 1
+        self.last_message[adapter.name] = now
+        try:
+            quotes = adapter.parse(message)
+        except ResyncRequired:
+            raise
+        except Exception:
+            self.parse_errors[adapter.name] += 1
+            return
+
+        symbols = adapter.symbols
+        for quote in quotes:
+            product = symbols.get(quote.product)
+            if product is None:
+                # Still in flight after an unsubscribe; a replay keeps whatever was captured
+                if not replay:
+                    continue
+                product = quote.product
+            self.last_tick[(adapter.name, product)] = now
+            self.aggregator.update_data(
+                adapter.name, product, quote.bid, quote.ask, quote.volume,
+                exchange_time=None if replay else quote.exchange_time, receive_ns=receive_ns,
+                timestamp=replay_time
+            )
+
+    def register_metrics(self, registry):
+        """Expose feed health on a MetricsRegistry; values are read from the state above at scrape time.
+
+        Message rates are left to the scraper (rate(feed_messages_total[1m])):
+        a rate kept between scrapes would depend on how many scrapers there
+        are and how often they poll.
+        """
+        messages = registry.counter('feed_messages_total', 'Raw frames received', ['feed'])
+        errors = registry.counter('feed_parse_errors_total', 'Frames that failed to parse', ['feed'])
+        reconnects = registry.counter('feed_reconnects_total', 'Connection drops and resyncs', ['feed'])
+        connected = registry.gauge('feed_connected', '1 while the feed is connected', ['feed'])
+        silence = registry.gauge('feed_seconds_since_message', 'Seconds since the last frame of any kind', ['feed'])
+        tick_age = registry.gauge('product_seconds_since_tick', 'Seconds since the last quote', ['feed', 'product'])
+        reported = set()
+
+        def collect():
+            now = time.time()
+            for name in self.messages:
+                messages.labels(name).set(self.messages[name])
+                errors.labels(name).set(self.parse_errors[name])
+                reconnects.labels(name).set(self.reconnects[name])
+                connected.labels(name).set(1 if self.connected[name] else 0)
+                if self.last_message[name] is not None:
+                    silence.labels(name).set(now - self.last_message[name])
+            ticks = dict(self.last_tick)
+            for name, product in reported - ticks.keys():
+                # Unsubscribed or disconnected; feed_connected already reports the latter
+                tick_age.remove(name, product)
+            for (name, product), seen in ticks.items():
+                tick_age.labels(name, product).set(now - seen)
+            reported.clear()
+            reported.update(ticks)
+
+        registry.on_collect(collect)
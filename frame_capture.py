@@ -0,0 +1,124 @@
+"""Raw WebSocket frame capture and replay.
+
+A capture is a gzip stream of one line per frame:
+
+    <wall clock ns>\t<monotonic receive ns>\t<exchange>\t<raw frame>
+
+FrameRecorder appends frames from the feed thread onto a queue and a
+background thread compresses them, sync-flushing the gzip stream every
+`flush_interval` seconds so a capture that is still being written can be
+read up to its last flush. read_frames() streams a capture back without
+loading it into memory and replay_frames() paces it at the original
+speed, N times faster, or as fast as possible.
+"""
+import gzip
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+_STOP = object()
+
+
+def default_capture_path(directory='captures'):
+    return Path(directory) / f"frames-{datetime.now().strftime('%Y%m%d-%H%M%S')}.gz"
+
+
+class FrameRecorder:
+    """Writes every raw frame with its receive timestamps to a compressed capture file"""
+
+    def __init__(self, path=None, flush_interval=1.0, compresslevel=6):
+        self.path = Path(path) if path is not None else default_capture_path()
+        self.flush_interval = flush_interval
+        self.compresslevel = compresslevel
+        self.frames = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='frame-recorder', daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, exchange, message, receive_ns):
+        """Queue one frame; called on the feed thread so it does no I/O"""
+        self._queue.put((time.time_ns(), receive_ns, exchange, message))
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self):
+        with gzip.open(self.path, 'ab', compresslevel=self.compresslevel) as f:
+            next_flush = time.monotonic() + self.flush_interval
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+                if item is not None:
+                    wall_ns, receive_ns, exchange, message = item
+                    if isinstance(message, bytes):
+                        message = message.decode('utf-8')
+                    # JSON never needs a raw newline, so flattening keeps one frame per line
+                    message = message.replace('\n', ' ')
+                    f.write(f"{wall_ns}\t{receive_ns}\t{exchange}\t{message}\n".encode('utf-8'))
+                    self.frames += 1
+
+                if time.monotonic() >= next_flush:
+                    f.flush(zlib.Z_SYNC_FLUSH)
+                    next_flush = time.monotonic() + self.flush_interval
+
+
+def read_frames(path):
+    """Yield (wall_ns, receive_ns, exchange, message) for every frame in a capture.
+
+    A capture that is still being written ends at its last flush instead of
+    raising.
+    """
+    with gzip.open(path, 'rb') as f:
+        try:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                wall_ns, receive_ns, exchange, message = line[:-1].decode('utf-8').split('\t', 3)
+                yield int(wall_ns), int(receive_ns), exchange, message
+        except EOFError:
+            return
+
+
+def replay_frames(frames, deliver, speed=1.0):
+    """Call deliver(exchange, message, wall_ns) for every frame, keeping the original spacing.
+
+    wall_ns is the capture's time.time_ns() for the frame, so consumers can
+    stamp ticks with the time they originally arrived. speed=1 replays in
+    real time, speed=N N times faster and speed=None (or 0) as fast as
+    possible. Returns the number of frames delivered.
+
+    Spacing comes from the monotonic receive_ns, which wall clock steps do
+    not disturb. Recorders append, so one capture can hold several runs
+    whose monotonic clocks are unrelated; pacing restarts whenever
+    receive_ns goes backwards.
+    """
+    count = 0
+    start = first = previous = None
+    for wall_ns, receive_ns, exchange, message in frames:
+        if speed:
+            if first is None or receive_ns < previous:
+                first, start = receive_ns, time.monotonic_ns()
+            previous = receive_ns
+            delay = (start + (receive_ns - first) / speed - time.monotonic_ns()) / 1e9
+            if delay > 0:
+                time.sleep(delay)
+        deliver(exchange, message, wall_ns)
+        count += 1
+    return count
@@ -0,0 +1,117 @@
+import bisect
+import threading
+
+# Stage names, in pipeline order
+EXCHANGE_TO_RECEIVE = 'exchange→receive'
+RECEIVE_TO_UPDATE = 'receive→update'
+UPDATE_TO_BOARD = 'update→board'
+UPDATE_TO_PICKLE = 'update→pickle'
+STAGES = (EXCHANGE_TO_RECEIVE, RECEIVE_TO_UPDATE, UPDATE_TO_BOARD, UPDATE_TO_PICKLE)
+
+
+def _bucket_bounds():
+    """Upper bucket bounds in ns: 4 sub-buckets per power of two from 1µs to ~1100s"""
+    bounds = []
+    value = 1000
+    while value < 2 ** 40:
+        for step in range(4):
+            bounds.append(value + value * step // 4)
+        value *= 2
+    return bounds
+
+
+BUCKET_BOUNDS = _bucket_bounds()
+
+
+class LatencyHistogram:
+    """Fixed log-linear histogram of nanosecond latencies (~19% bucket resolution)"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        if ns < 0:
+            ns = 0
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (capped at the max), in ns"""
+        if self.count == 0:
+            return None
+        target = self.count * p / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(BUCKET_BOUNDS[index], self.max) if index < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        """Count, mean and p50/p90/p99/max in milliseconds"""
+        if self.count == 0:
+            return None
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count / 1e6,
+            'p50_ms': self.percentile(50) / 1e6,
+            'p90_ms': self.percentile(90) / 1e6,
+            'p99_ms': self.percentile(99) / 1e6,
+            'max_ms': self.max / 1e6
+        }
+
+
+class FeedLatency:
+    """One feed's stage histograms behind that feed's own lock"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+
+class LatencyTracker:
+    """Per-(feed, stage) latency histograms.
+
+    Each feed has its own lock, so feeds recording from different threads
+    never contend with each other.
+    """
+
+    def __init__(self):
+        self.feeds = {}
+        self._create_lock = threading.Lock()
+
+    def _feed(self, feed):
+        latency = self.feeds.get(feed)
+        if latency is None:
+            with self._create_lock:
+                latency = self.feeds.get(feed)
+                if latency is None:
+                    latency = FeedLatency()
+                    # Replaced rather than mutated so summary() can iterate without a lock
+                    self.feeds = {**self.feeds, feed: latency}
+        return latency
+
+    def record(self, feed, stage, ns):
+        latency = self._feed(feed)
+        with latency.lock:
+            histogram = latency.histograms.get(stage)
+            if histogram is None:
+                histogram = latency.histograms[stage] = LatencyHistogram()
+            histogram.record(ns)
+
+    def summary(self):
+        """{feed: {stage: summary}} with stages in pipeline order"""
+        items = []
+        for feed, latency in self.feeds.items():
+            with latency.lock:
+                items += [(feed, stage, histogram.summary()) for stage, histogram in latency.histograms.items()]
+        result = {}
+        for feed, stage, summary in sorted(items, key=lambda item: (item[0], STAGES.index(item[1]))):
+            result.setdefault(feed, {})[stage] = summary
+        return result
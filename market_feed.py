@@ -0,0 +1,399 @@
+"""Binary publish/subscribe feed of market state for dashboards.
+
+MarketPublisher serves the aggregator's MarketState over TCP or a Unix
+socket. A new subscriber gets a full snapshot, then only the products
+that changed, batched every `interval` seconds. Each subscriber tracks
+which products are dirty rather than queueing messages. A slow reader
+therefore receives the latest quote per product once it catches up
+instead of a growing backlog: updates are conflated.
+
+Wire format, little-endian. Every message is FRAME (payload length,
+type) followed by its payload:
+
+    DEFINE     repeated (id u16, exchange len u8, product len u8, exchange, product)
+    SNAPSHOT   count u16, then count QUOTE records; replaces all quotes
+    DELTA      count u16, then count QUOTE records
+    SENTIMENT  UTF-8 JSON of the latest sentiment data
+    REMOVE     count u16, then count ids u16 of products that are gone
+
+QUOTE is (id u16, bid, ask, volume, timestamp f64): 34 bytes per product.
+Products are introduced once with DEFINE and referred to by id afterwards;
+a product that is removed and later comes back keeps its id.
+"""
+import asyncio
+import json
+import socket
+import struct
+import threading
+import time
+
+FRAME = struct.Struct('<IB')
+DEFINE_HEADER = struct.Struct('<HBB')
+COUNT = struct.Struct('<H')
+QUOTE = struct.Struct('<Hdddd')
+
+DEFINE = 1
+SNAPSHOT = 2
+DELTA = 3
+SENTIMENT = 4
+REMOVE = 5
+
+DEFAULT_PORT = 9109
+
+
+def parse_address(address):
+    """'host:port', ':port' or 'unix:/path' -> (host, port) or path"""
+    if address.startswith('unix:'):
+        return address[5:]
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def _frame(kind, payload):
+    return FRAME.pack(len(payload), kind) + payload
+
+
+def _encode_defines(entries):
+    parts = []
+    for product_id, exchange, product in entries:
+        exchange_bytes, product_bytes = exchange.encode(), product.encode()
+        parts.append(DEFINE_HEADER.pack(product_id, len(exchange_bytes), len(product_bytes)))
+        parts.append(exchange_bytes)
+        parts.append(product_bytes)
+    return _frame(DEFINE, b''.join(parts))
+
+
+def _encode_quotes(kind, records):
+    payload = COUNT.pack(len(records)) + b''.join(
+        QUOTE.pack(product_id, quote['bid'], quote['ask'], quote['volume'], quote['timestamp'])
+        for product_id, quote in records
+    )
+    return _frame(kind, payload)
+
+
+def _encode_removes(product_ids):
+    product_ids = list(product_ids)
+    return _frame(REMOVE, COUNT.pack(len(product_ids)) + struct.pack(f'<{len(product_ids)}H', *product_ids))
+
+
+class _Subscriber:
+    def __init__(self, writer):
+        self.writer = writer
+        self.dirty = set()
+        self.removed = set()
+        self.defined = 0
+        self.sentiment_dirty = False
+        self.wake = asyncio.Event()
+        self.task = asyncio.current_task()
+
+
+class MarketPublisher:
+    """Publishes MarketState deltas to any number of subscribers from its own event loop thread"""
+
+    def __init__(self, market, host='127.0.0.1', port=DEFAULT_PORT, path=None, interval=0.05):
+        self.market = market
+        self.host = host
+        self.port = port
+        self.path = path
+        self.interval = interval
+
+        self.ids = {}
+        self.products = []
+        self.subscribers = set()
+        self.sentiment = None
+        self.messages_sent = 0
+        self.bytes_sent = 0
+
+        self.loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._stopped = None
+        self._published = {}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name='market-publisher', daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+
+    def stop(self):
+        if self.loop is not None and self._stopped is not None:
+            self.loop.call_soon_threadsafe(self._stopped.set_result, None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def publish_sentiment(self, sentiment_data):
+        """Send new sentiment data to every subscriber; safe to call from any thread"""
+        payload = _frame(SENTIMENT, json.dumps(sentiment_data, default=str).encode('utf-8'))
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._set_sentiment, payload)
+        else:
+            self.sentiment = payload
+
+    def _set_sentiment(self, payload):
+        self.sentiment = payload
+        for subscriber in self.subscribers:
+            subscriber.sentiment_dirty = True
+            subscriber.wake.set()
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.serve())
+        finally:
+            self.loop.close()
+
+    async def serve(self):
+        self._stopped = asyncio.get_running_loop().create_future()
+        if self.path is not None:
+            server = await asyncio.start_unix_server(self._handle, self.path)
+        else:
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+
+        poller = asyncio.ensure_future(self._poll())
+        try:
+            await self._stopped
+        finally:
+            poller.cancel()
+            server.close()
+            tasks = [subscriber.task for subscriber in self.subscribers]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _product_id(self, exchange, product):
+        key = (exchange, product)
+        product_id = self.ids.get(key)
+        if product_id is None:
+            product_id = self.ids[key] = len(self.products)
+            self.products.append(key)
+        return product_id
+
+    async def _poll(self):
+        """Find products whose quote changed since the last pass and mark them dirty for everyone"""
+        versions = None
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.market.versions() == versions:
+                continue
+            versions = self.market.versions()
+
+            changed = []
+            live = set()
+            for exchange, products in self.market.snapshot().items():
+                for product, quote in products.items():
+                    product_id = self._product_id(exchange, product)
+                    live.add(product_id)
+                    # Snapshots reuse a product's dict until it ticks, so identity means unchanged
+                    if self._published.get(product_id) is not quote:
+                        self._published[product_id] = quote
+                        changed.append(product_id)
+            removed = [product_id for product_id in self._published if product_id not in live]
+            for product_id in removed:
+                del self._published[product_id]
+
+            if changed or removed:
+                for subscriber in self.subscribers:
+                    subscriber.dirty.update(changed)
+                    subscriber.dirty.difference_update(removed)
+                    subscriber.removed.update(removed)
+                    subscriber.removed.difference_update(changed)
+                    subscriber.wake.set()
+
+    def _defines_for(self, subscriber):
+        if subscriber.defined == len(self.products):
+            return b''
+        entries = [(product_id, *self.products[product_id])
+                   for product_id in range(subscriber.defined, len(self.products))]
+        subscriber.defined = len(self.products)
+        return _encode_defines(entries)
+
+    async def _send(self, subscriber, data):
+        subscriber.writer.write(data)
+        self.messages_sent += 1
+        self.bytes_sent += len(data)
+        # A slow reader blocks here while its dirty set keeps absorbing updates
+        await subscriber.writer.drain()
+
+    async def _handle(self, reader, writer):
+        subscriber = _Subscriber(writer)
+        self.subscribers.add(subscriber)
+        try:
+            snapshot = [(product_id, quote) for product_id, quote in self._published.items()]
+            await self._send(subscriber, self._defines_for(subscriber) + _encode_quotes(SNAPSHOT, snapshot)
+                             + (self.sentiment or b''))
+
+            while True:
+                await subscriber.wake.wait()
+                subscriber.wake.clear()
+
+                data = self._defines_for(subscriber)
+                if subscriber.dirty:
+                    dirty, subscriber.dirty = subscriber.dirty, set()
+                    records = [(product_id, self._published[product_id]) for product_id in dirty]
+                    # Counts are u16; very large batches are split
+                    for i in range(0, len(records), 0xFFFF):
+                        data += _encode_quotes(DELTA, records[i:i + 0xFFFF])
+                if subscriber.removed:
+                    removed, subscriber.removed = list(subscriber.removed), set()
+                    for i in range(0, len(removed), 0xFFFF):
+                        data += _encode_removes(removed[i:i + 0xFFFF])
+                if subscriber.sentiment_dirty:
+                    subscriber.sentiment_dirty = False
+                    data += self.sentiment
+                if data:
+                    await self._send(subscriber, data)
+        except (ConnectionError, OSError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by serve() on shutdown; returning normally keeps asyncio's
+            # stream callback from reporting it as an error
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            writer.close()
+
+
+class MarketFeedClient:
+    """Subscribes to a MarketPublisher and keeps a local copy of the market and sentiment.
+
+    The socket is read on a background thread that applies deltas as they
+    arrive and reconnects on failure. `version` increases with every applied
+    message, so readers can redraw only when it moves.
+    """
+
+    def __init__(self, address, reconnect_delay=1.0):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.reconnect_delay = reconnect_delay
+
+        self.data = {}
+        self.sentiment = None
+        self.version = 0
+        self.sentiment_version = 0
+        self.connected = False
+        self.bytes_received = 0
+
+        self._products = {}
+        self._stop = False
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='market-feed-client', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop = True
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def snapshot(self):
+        """{exchange: {product: quote}} copy in the same shape as market_data.pkl"""
+        return {exchange: dict(products) for exchange, products in list(self.data.items())}
+
+    def _connect(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect(self.address)
+        return sock
+
+    def _run(self):
+        while not self._stop:
+            try:
+                self._sock = self._connect()
+                self.connected = True
+                self._read(self._sock.makefile('rb'))
+            except (ConnectionError, OSError, struct.error):
+                pass
+            finally:
+                self.connected = False
+                if self._sock is not None:
+                    self._sock.close()
+                    self._sock = None
+            if not self._stop:
+                time.sleep(self.reconnect_delay)
+
+    def _read(self, stream):
+        while not self._stop:
+            header = stream.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return
+            length, kind = FRAME.unpack(header)
+            payload = stream.read(length)
+            if len(payload) < length:
+                return
+            self.bytes_received += FRAME.size + length
+            self.apply(kind, payload)
+
+    def apply(self, kind, payload):
+        """Apply one decoded message to the local state"""
+        if kind == DEFINE:
+            offset = 0
+            while offset < len(payload):
+                product_id, exchange_len, product_len = DEFINE_HEADER.unpack_from(payload, offset)
+                offset += DEFINE_HEADER.size
+                exchange = payload[offset:offset + exchange_len].decode()
+                offset += exchange_len
+                product = payload[offset:offset + product_len].decode()
+                offset += product_len
+                self._products[product_id] = (exchange, product)
+
+        elif kind in (SNAPSHOT, DELTA):
+            data = {} if kind == SNAPSHOT else dict(self.data)
+            touched = {}
+            count = COUNT.unpack_from(payload)[0]
+            for product_id, bid, ask, volume, timestamp in QUOTE.iter_unpack(payload[COUNT.size:COUNT.size + count * QUOTE.size]):
+                exchange, product = self._products[product_id]
+                # Only exchanges named in the message are copied
+                products = touched.get(exchange)
+                if products is None:
+                    products = touched[exchange] = dict(data.get(exchange, {}))
+                spread = ask - bid
+                products[product] = {
+                    'bid': bid,
+                    'ask': ask,
+                    'spread': spread,
+                    'spread_percent': (spread / bid) * 100 if bid > 0 else 0,
+                    'volume': volume,
+                    'timestamp': timestamp
+                }
+            data.update(touched)
+            # Swapped in whole so readers on other threads always see a complete state
+            self.data = data
+            self.version += 1
+
+        elif kind == REMOVE:
+            data = dict(self.data)
+            count = COUNT.unpack_from(payload)[0]
+            for product_id in struct.unpack_from(f'<{count}H', payload, COUNT.size):
+                exchange, product = self._products[product_id]
+                products = data.get(exchange)
+                if products is None or product not in products:
+                    continue
+                products = data[exchange] = dict(products)
+                del products[product]
+                if not products:
+                    del data[exchange]
+            self.data = data
+            self.version += 1
+
+        elif kind == SENTIMENT:
+            self.sentiment = json.loads(payload.decode('utf-8'))
+            self.sentiment_version += 1
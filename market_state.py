@@ -0,0 +1,144 @@
+"""Sharded market state with lock-free, versioned read snapshots.
+
+Quotes are sharded per exchange. Each shard has its own writer lock, so
+feeds for different venues never wait on each other. Every product has
+one QuoteRecord, a __slots__ object that is overwritten in place on each
+tick, so the hot path allocates nothing. Records carry a sequence number
+that is odd while a write is in progress. Readers take no lock: they
+retry a record until they see the same even sequence before and after
+copying its fields, like the quote board's seqlock.
+
+Snapshots turn records back into the {product: quote dict} shape used
+everywhere else. A product's dict is only rebuilt when its record has
+changed, so unchanged quotes keep their identity between snapshots.
+"""
+import time
+import threading
+
+
+class QuoteRecord:
+    """Latest quote for one product, updated in place by its shard's writer"""
+
+    __slots__ = ('seq', 'bid', 'ask', 'spread', 'spread_percent', 'volume', 'timestamp',
+                 'exchange_time', 'receive_ns')
+
+    def __init__(self):
+        self.seq = 0
+        self.bid = self.ask = self.spread = self.spread_percent = self.volume = self.timestamp = 0.0
+        self.exchange_time = self.receive_ns = None
+
+    def read(self):
+        """(seq, quote dict) from a consistent copy of the fields"""
+        while True:
+            seq = self.seq
+            if seq & 1:
+                # The writer was preempted mid-update; let it finish
+                time.sleep(0)
+                continue
+            quote = {
+                'bid': self.bid,
+                'ask': self.ask,
+                'spread': self.spread,
+                'spread_percent': self.spread_percent,
+                'volume': self.volume,
+                'timestamp': self.timestamp,
+                'exchange_time': self.exchange_time,
+                'receive_ns': self.receive_ns
+            }
+            if self.seq == seq:
+                return seq, quote
+
+
+class MarketShard:
+    """Latest quote per product for one exchange"""
+
+    def __init__(self, exchange, lock):
+        self.exchange = exchange
+        self.lock = lock
+        self.quotes = {}
+        self.version = 0
+        # product -> (record seq, quote dict) handed out by the last snapshot
+        self._views = {}
+
+    def update(self, product, bid, ask, spread, spread_percent, volume, timestamp,
+               exchange_time=None, receive_ns=None):
+        """Overwrite a product's quote in place; callers hold self.lock"""
+        record = self.quotes.get(product)
+        if record is None:
+            record = self.quotes[product] = QuoteRecord()
+        record.seq += 1
+        record.bid = bid
+        record.ask = ask
+        record.spread = spread
+        record.spread_percent = spread_percent
+        record.volume = volume
+        record.timestamp = timestamp
+        record.exchange_time = exchange_time
+        record.receive_ns = receive_ns
+        record.seq += 1
+        self.version += 1
+
+    def remove(self, products):
+        """Forget products entirely, e.g. after they are unsubscribed; callers hold self.lock"""
+        removed = False
+        for product in products:
+            if self.quotes.pop(product, None) is not None:
+                self._views.pop(product, None)
+                removed = True
+        if removed:
+            self.version += 1
+
+    def snapshot(self):
+        """{product: quote dict}, reusing the previous dict for every product that has not ticked"""
+        views = self._views
+        data = {}
+        for product, record in list(self.quotes.items()):
+            view = views.get(product)
+            if view is None or view[0] != record.seq:
+                view = views[product] = record.read()
+            data[product] = view[1]
+        return data
+
+
+class MarketState:
+    """All exchange shards plus a cached {exchange: {product: quote}} snapshot.
+
+    snapshot() reuses the previous result until some shard's version moves,
+    so several readers polling an idle market share one copy. Snapshots are
+    shared and must be treated as read-only.
+    """
+
+    def __init__(self, lock_factory=threading.Lock):
+        self.lock_factory = lock_factory
+        self.shards = {}
+        self._create_lock = threading.Lock()
+        self._snapshot = None
+
+    def shard(self, exchange):
+        shard = self.shards.get(exchange)
+        if shard is None:
+            with self._create_lock:
+                shard = self.shards.get(exchange)
+                if shard is None:
+                    shard = MarketShard(exchange, self.lock_factory())
+                    # Replaced rather than mutated so readers can iterate without a lock
+                    self.shards = {**self.shards, exchange: shard}
+        return shard
+
+    def versions(self):
+        """Per-exchange versions; changes whenever any quote does"""
+        return tuple((exchange, shard.version) for exchange, shard in self.shards.items())
+
+    def snapshot(self):
+        """Point-in-time view of every exchange, copied only if something changed"""
+        # Versions are read before copying, so a racing update at worst makes
+        # the next call copy again
+        shards = self.shards
+        versions = tuple((exchange, shard.version) for exchange, shard in shards.items())
+        cached = self._snapshot
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+
+        data = {exchange: shard.snapshot() for exchange, shard in shards.items()}
+        self._snapshot = (versions, data)
+        return data
@@ -0,0 +1,146 @@
+import threading
+import zlib
+
+from sortedcontainers import SortedDict
+
+
+class ResyncRequired(Exception):
+    """Raised when a book is found inconsistent and the feed must resubscribe for a fresh snapshot"""
+
+
+class OrderBook:
+    """Level-2 book for one product with price levels kept sorted.
+
+    Levels are stored in SortedDicts keyed by float price, so inserts,
+    updates and deletes are O(log n) and the top of book is O(1). The raw
+    price/size strings are kept alongside each level because Kraken's
+    checksum is computed over the exchange's own string formatting.
+    """
+
+    def __init__(self, exchange, product, depth=None):
+        self.exchange = exchange
+        self.product = product
+        self.depth = depth
+        self.bids = SortedDict()
+        self.asks = SortedDict()
+        self.synced = False
+        self.updates = 0
+
+    def clear(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.synced = False
+
+    def apply(self, side, price, size):
+        """Set a level's size (strings as received from the exchange); zero size removes it"""
+        levels = self.bids if side == 'bid' else self.asks
+        key = float(price)
+        if float(size) == 0:
+            levels.pop(key, None)
+        else:
+            levels[key] = (price, size)
+        self.updates += 1
+
+    def truncate(self):
+        """Drop levels beyond the subscribed depth, as Kraken expects clients to do"""
+        if self.depth is None:
+            return
+        while len(self.bids) > self.depth:
+            self.bids.popitem(0)
+        while len(self.asks) > self.depth:
+            self.asks.popitem(-1)
+
+    def best_bid(self):
+        return self.bids.peekitem(-1)[0] if self.bids else None
+
+    def best_ask(self):
+        return self.asks.peekitem(0)[0] if self.asks else None
+
+    def is_crossed(self):
+        bid, ask = self.best_bid(), self.best_ask()
+        return bid is not None and ask is not None and bid >= ask
+
+    def top(self, n=10):
+        """Top n levels per side as lists of (price, size) floats"""
+        bids = [(price, float(self.bids[price][1])) for price in self.bids.islice(-n, reverse=True)] if n else []
+        asks = [(price, float(self.asks[price][1])) for price in self.asks.islice(0, n)] if n else []
+        return {'bids': bids, 'asks': asks}
+
+    def vwap_fill(self, side, size):
+        """Average price to buy (side='buy', walks asks) or sell (walks bids) `size` units"""
+        if side == 'buy':
+            levels = ((price, float(self.asks[price][1])) for price in self.asks.irange())
+        else:
+            levels = ((price, float(self.bids[price][1])) for price in self.bids.irange(reverse=True))
+        return vwap_from_levels(levels, size)
+
+    def kraken_checksum(self):
+        """CRC32 over the top 10 asks then top 10 bids, per Kraken's book checksum spec"""
+        parts = []
+        for price in self.asks.islice(0, 10):
+            price_str, size_str = self.asks[price]
+            parts.append(_checksum_field(price_str) + _checksum_field(size_str))
+        for price in self.bids.islice(-10, reverse=True):
+            price_str, size_str = self.bids[price]
+            parts.append(_checksum_field(price_str) + _checksum_field(size_str))
+        return zlib.crc32(''.join(parts).encode())
+
+
+def vwap_from_levels(levels, size):
+    """Walk (price, size) levels best-first and return (average fill price, filled size).
+
+    Filled size is less than `size` when the levels are too thin; the
+    average price is None if nothing could be filled.
+    """
+    remaining = size
+    notional = 0.0
+    for price, level_size in levels:
+        take = min(remaining, level_size)
+        notional += take * price
+        remaining -= take
+        if remaining <= 0:
+            break
+
+    filled = size - max(remaining, 0.0)
+    if filled == 0:
+        return None, 0.0
+    return notional / filled, filled
+
+
+def _checksum_field(value):
+    return value.replace('.', '').lstrip('0')
+
+
+class OrderBookStore:
+    """All order books, keyed by (exchange, product), guarded by one lock"""
+
+    def __init__(self, on_update=None):
+        self.books = {}
+        self.lock = threading.Lock()
+        self.on_update = on_update
+
+    def get(self, exchange, product, depth=None):
+        key = (exchange, product)
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = OrderBook(exchange, product, depth)
+        return book
+
+    def updated(self, book):
+        if self.on_update is not None:
+            self.on_update(book)
+
+    def depth_snapshot(self, n=10):
+        """Top-n depth for every synced book in {exchange: {product: depth}} form"""
+        snapshot = {}
+        for (exchange, product), book in self.books.items():
+            if book.synced:
+                snapshot.setdefault(exchange, {})[product] = book.top(n)
+        return snapshot
+
+    def vwap_fill(self, exchange, product, side, size):
+        with self.lock:
+            book = self.books.get((exchange, product))
+            if book is None or not book.synced:
+                return None, 0.0
+            return book.vwap_fill(side, size)
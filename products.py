@@ -0,0 +1,113 @@
+"""Which products each exchange feed subscribes to.
+
+ProductRegistry holds the subscribed product symbols per exchange, loaded
+from a JSON config shaped like {"coinbase": ["BTC-USD", ...], "kraken":
+[...]}. Symbols are interned, so every structure keyed by product shares one
+string object and dict lookups usually succeed on identity alone.
+
+Products can be added or removed at runtime with subscribe() and
+unsubscribe(), or by editing the config and calling reload(). Listeners
+registered with on_change() are told about every change; FeedEngine uses
+this to send subscribe/unsubscribe frames on live connections, and the
+aggregator to drop unsubscribed products from its market state, quote board,
+history and bars.
+"""
+import json
+import sys
+import threading
+from pathlib import Path
+
+DEFAULT_PRODUCTS = {
+    'coinbase': ['BTC-USD', 'ETH-USD'],
+    'kraken': ['XBT/USD', 'ETH/USD'],
+}
+
+
+class ProductRegistry:
+    """Subscribed products per exchange, kept in subscription order"""
+
+    def __init__(self, products=None, path=None):
+        self.path = Path(path) if path is not None else None
+        self.lock = threading.Lock()
+        self._products = {}
+        self._listeners = []
+        self._mtime = None
+        for exchange, symbols in (DEFAULT_PRODUCTS if products is None else products).items():
+            self.subscribe(exchange, symbols)
+
+    @classmethod
+    def load(cls, path):
+        """Registry from a JSON config file, or the built-in defaults if it does not exist"""
+        registry = cls(path=path)
+        registry.reload()
+        return registry
+
+    def intern(self, product):
+        return sys.intern(str(product))
+
+    def exchanges(self):
+        return list(self._products)
+
+    def products(self, exchange):
+        return list(self._products.get(exchange, ()))
+
+    def count(self):
+        return sum(len(symbols) for symbols in self._products.values())
+
+    def on_change(self, callback):
+        """Call callback(exchange, added, removed) after every subscription change"""
+        self._listeners.append(callback)
+
+    def subscribe(self, exchange, products):
+        """Add products to an exchange's subscription; returns the ones that were new"""
+        exchange = self.intern(exchange)
+        with self.lock:
+            # Dicts keep insertion order, so this doubles as an ordered set
+            current = dict(self._products.get(exchange, {}))
+            added = [symbol for symbol in dict.fromkeys(map(self.intern, products)) if symbol not in current]
+            current.update(dict.fromkeys(added))
+            # Replaced rather than mutated so readers can iterate without the lock
+            self._products = {**self._products, exchange: current}
+        if added:
+            self._notify(exchange, added, [])
+        return added
+
+    def unsubscribe(self, exchange, products):
+        """Remove products from an exchange's subscription; returns the ones that were present"""
+        with self.lock:
+            current = dict(self._products.get(exchange, {}))
+            removed = [symbol for symbol in dict.fromkeys(products) if symbol in current]
+            for symbol in removed:
+                del current[symbol]
+            self._products = {**self._products, exchange: current}
+        if removed:
+            self._notify(exchange, [], removed)
+        return removed
+
+    def reload(self):
+        """Re-read the config file if it changed and apply the difference; returns True if anything did"""
+        if self.path is None or not self.path.exists():
+            return False
+        mtime = self.path.stat().st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            config = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Error reading product config {self.path}: {e}")
+            return False
+
+        changed = False
+        for exchange in set(self._products) | set(config):
+            wanted = list(config.get(exchange, []))
+            keep = set(wanted)
+            stale = [symbol for symbol in self.products(exchange) if symbol not in keep]
+            changed |= bool(self.unsubscribe(exchange, stale))
+            changed |= bool(self.subscribe(exchange, wanted))
+        return changed
+
+    def _notify(self, exchange, added, removed):
+        for callback in list(self._listeners):
+            callback(exchange, added, removed)
@@ -0,0 +1,202 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+# File layout: a fixed header followed by `capacity` fixed-size slots.
+#
+# Header: magic, slot count, slot size, generation (bumped on every publish)
+# Slot:   sequence, exchange, product, bid, ask, spread, spread %, volume, timestamp
+#
+# Each slot is guarded by its own sequence counter (a seqlock): the writer
+# makes it odd before touching the slot and even again afterwards, so a
+# reader that sees the same even value before and after copying the slot
+# knows it got a consistent quote without taking any lock. A released slot
+# keeps an even, non-zero sequence but has an empty exchange name.
+MAGIC = b'QBOARD01'
+HEADER = struct.Struct('<8sIIQ')
+HEADER_SIZE = 64
+GENERATION_OFFSET = 16
+SLOT = struct.Struct('<Q16s16s6d')
+SLOT_SIZE = 96
+SEQ = struct.Struct('<Q')
+NAME_SIZE = 16
+MAX_RETRIES = 100
+
+
+class QuoteBoard:
+    """Memory-mapped quote board with one lock-free slot per (exchange, product)"""
+
+    def __init__(self, path, capacity=64, create=False):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.writable = create
+        self._slots = {}
+        # Released slot indices, reused before untouched ones
+        self._free = []
+        self._next = 0
+        self._slot_lock = threading.Lock()
+        self._mm = None
+        self._inode = None
+        if create:
+            self._create()
+        else:
+            self._open()
+
+    @classmethod
+    def open(cls, path):
+        """Open an existing board read-only; returns None if it does not exist yet"""
+        try:
+            return cls(path, create=False)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _create(self):
+        size = HEADER_SIZE + self.capacity * SLOT_SIZE
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.capacity, SLOT_SIZE, 0).ljust(HEADER_SIZE, b'\0'))
+            f.write(b'\0' * (self.capacity * SLOT_SIZE))
+        # Replace rather than truncate so readers mapped to an old board never fault
+        os.replace(tmp_path, self.path)
+        self._map(size)
+
+    def _open(self):
+        size = self.path.stat().st_size
+        if size < HEADER_SIZE:
+            raise ValueError(f"{self.path} is not a quote board")
+        self._map(size)
+        magic, capacity, slot_size, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or slot_size != SLOT_SIZE or size < HEADER_SIZE + capacity * SLOT_SIZE:
+            self.close()
+            raise ValueError(f"{self.path} is not a quote board")
+        self.capacity = capacity
+
+    def _map(self, size):
+        with open(self.path, 'r+b' if self.writable else 'rb') as f:
+            access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+            self._mm = mmap.mmap(f.fileno(), size, access=access)
+            self._inode = os.fstat(f.fileno()).st_ino
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _slot_for(self, exchange, product):
+        key = (exchange, product)
+        index = self._slots.get(key)
+        if index is None:
+            with self._slot_lock:
+                index = self._slots.get(key)
+                if index is None:
+                    if self._free:
+                        index = self._free.pop()
+                    elif self._next < self.capacity:
+                        index = self._next
+                        self._next += 1
+                    else:
+                        return None
+                    self._slots[key] = index
+        return index
+
+    def used(self):
+        """Number of slots currently assigned to a product"""
+        return len(self._slots)
+
+    def release(self, exchange, product):
+        """Clear a product's slot so readers drop it and a new product can take it over.
+
+        Callers must ensure nothing publishes the product concurrently.
+        """
+        with self._slot_lock:
+            index = self._slots.pop((exchange, product), None)
+            if index is None:
+                return False
+            mm = self._mm
+            offset = HEADER_SIZE + index * SLOT_SIZE
+            seq = SEQ.unpack_from(mm, offset)[0]
+            SEQ.pack_into(mm, offset, seq + 1)
+            SLOT.pack_into(mm, offset, seq + 1, b'', b'', 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+            SEQ.pack_into(mm, offset, seq + 2)
+            generation = SEQ.unpack_from(mm, GENERATION_OFFSET)[0]
+            SEQ.pack_into(mm, GENERATION_OFFSET, generation + 1)
+            self._free.append(index)
+        return True
+
+    def publish(self, exchange, product, bid, ask, spread, spread_percent, volume, timestamp=None):
+        """Write a quote into its slot; each (exchange, product) must have a single writer at a time"""
+        index = self._slot_for(exchange, product)
+        if index is None:
+            return False
+        if timestamp is None:
+            timestamp = time.time()
+
+        mm = self._mm
+        offset = HEADER_SIZE + index * SLOT_SIZE
+        seq = SEQ.unpack_from(mm, offset)[0]
+        SEQ.pack_into(mm, offset, seq + 1)
+        SLOT.pack_into(
+            mm, offset, seq + 1,
+            exchange.encode()[:NAME_SIZE], product.encode()[:NAME_SIZE],
+            bid, ask, spread, spread_percent, volume, timestamp
+        )
+        SEQ.pack_into(mm, offset, seq + 2)
+
+        generation = SEQ.unpack_from(mm, GENERATION_OFFSET)[0]
+        SEQ.pack_into(mm, GENERATION_OFFSET, generation + 1)
+        return True
+
+    def generation(self):
+        """Total number of publishes, usable as a cheap change marker"""
+        return SEQ.unpack_from(self._mm, GENERATION_OFFSET)[0]
+
+    def is_stale(self):
+        """True if the writer has replaced the board file since it was mapped"""
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def read_slot(self, index):
+        """Consistent copy of one slot, or None if it is empty"""
+        mm = self._mm
+        offset = HEADER_SIZE + index * SLOT_SIZE
+        for _ in range(MAX_RETRIES):
+            before = SEQ.unpack_from(mm, offset)[0]
+            if before & 1:
+                continue
+            raw = mm[offset:offset + SLOT.size]
+            if SEQ.unpack_from(mm, offset)[0] == before:
+                break
+        else:
+            return None
+        seq, exchange, product, bid, ask, spread, spread_percent, volume, timestamp = SLOT.unpack(raw)
+        exchange = exchange.rstrip(b'\0')
+        if seq == 0 or not exchange:
+            return None
+        return (
+            exchange.decode(),
+            product.rstrip(b'\0').decode(),
+            {
+                'bid': bid,
+                'ask': ask,
+                'spread': spread,
+                'spread_percent': spread_percent,
+                'volume': volume,
+                'timestamp': timestamp
+            }
+        )
+
+    def snapshot(self):
+        """Read every slot into the same {exchange: {product: quote}} shape as the pickle"""
+        data = {}
+        for index in range(self.capacity):
+            slot = self.read_slot(index)
+            if slot is None:
+                continue
+            exchange, product, quote = slot
+            data.setdefault(exchange, {})[product] = quote
+        return data
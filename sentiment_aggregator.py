@@ -0,0 +1,133 @@
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SentimentSeries:
+    """Fixed-capacity ring of (timestamp, value) samples backed by NumPy arrays"""
+
+    def __init__(self, capacity=2880):
+        self.capacity = capacity
+        self.timestamp = np.zeros(capacity)
+        self.value = np.zeros(capacity)
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, value):
+        self.timestamp[self.head] = timestamp
+        self.value[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def arrays(self):
+        """(timestamps, values) in oldest-to-newest order"""
+        if self.count < self.capacity:
+            return self.timestamp[:self.count].copy(), self.value[:self.count].copy()
+        order = np.r_[self.head:self.capacity, 0:self.head]
+        return self.timestamp[order], self.value[order]
+
+
+class _DecayedSum:
+    """Exponentially decayed weighted sum, decayed lazily to the time of each update"""
+
+    __slots__ = ('weighted', 'weight', 'count', 'updated')
+
+    def __init__(self, now):
+        self.weighted = 0.0
+        self.weight = 0.0
+        self.count = 0
+        self.updated = now
+
+    def decay_to(self, now, rate):
+        if now > self.updated:
+            factor = math.exp(-rate * (now - self.updated))
+            self.weighted *= factor
+            self.weight *= factor
+            self.updated = now
+
+    def mean(self):
+        return self.weighted / self.weight if self.weight > 0 else 0.0
+
+
+class IncrementalSentiment:
+    """Deduplicated, time-decayed, engagement-weighted sentiment per source.
+
+    Each new item contributes weight * sentiment to its source's running
+    sums; sums decay with the given half-life, so the overall score only
+    needs O(new items) work per refresh. Items already seen (by id or URL)
+    are ignored.
+    """
+
+    def __init__(self, half_life=3600.0, max_seen=50_000, history_size=2880):
+        self.rate = math.log(2) / half_life
+        self.max_seen = max_seen
+        self.seen = OrderedDict()
+        self.sources = {}
+        self.history = SentimentSeries(history_size)
+
+    @staticmethod
+    def item_key(item):
+        return item.get('id') or item.get('url') or f"{item.get('source')}:{item.get('text')}"
+
+    @staticmethod
+    def item_weight(item):
+        """Reddit posts count by log of upvotes; items without a score count once"""
+        score = item.get('score')
+        if score is None:
+            return 1.0
+        return 1.0 + math.log1p(max(score, 0))
+
+    def add(self, items, now=None):
+        """Fold new items into the running sums; returns the items that were not duplicates"""
+        if now is None:
+            now = time.time()
+        fresh = []
+        for item in items:
+            key = self.item_key(item)
+            if key in self.seen:
+                self.seen.move_to_end(key)
+                continue
+            self.seen[key] = now
+            if len(self.seen) > self.max_seen:
+                self.seen.popitem(last=False)
+
+            source = item.get('source', 'unknown')
+            sums = self.sources.get(source)
+            if sums is None:
+                sums = self.sources[source] = _DecayedSum(now)
+            sums.decay_to(now, self.rate)
+            weight = self.item_weight(item)
+            sums.weighted += weight * item['sentiment']
+            sums.weight += weight
+            sums.count += 1
+            fresh.append(item)
+        return fresh
+
+    def overall(self, now=None):
+        """Decayed, weighted mean sentiment across all sources"""
+        if now is None:
+            now = time.time()
+        weighted = weight = 0.0
+        for sums in self.sources.values():
+            factor = math.exp(-self.rate * max(now - sums.updated, 0.0))
+            weighted += sums.weighted * factor
+            weight += sums.weight * factor
+        return weighted / weight if weight > 0 else 0.0
+
+    def by_source(self):
+        """{source: (decayed mean, items seen)}; decay cancels out of each source's mean"""
+        return {source: (sums.mean(), sums.count) for source, sums in self.sources.items()}
+
+    def record(self, now=None):
+        """Append the current overall score to the rolling time series and return it"""
+        if now is None:
+            now = time.time()
+        value = self.overall(now)
+        self.history.append(now, value)
+        return value
@@ -0,0 +1,207 @@
+"""Batched, vectorized polarity scoring compatible with TextBlob.
+
+TextBlob's default analyzer walks each sentence word by word in Python.
+BatchSentimentScorer instead tokenizes a whole batch with one regex pass,
+maps tokens onto a precompiled lexicon array and applies the same rules
+(intensity modifiers such as "very", negation, "!" boosts and averaging
+of assessments) with NumPy over the flattened batch.
+
+Tolerance: for ordinary headlines and post titles the result equals
+TextBlob(text).sentiment.polarity to within 1e-9. Differences are limited
+to constructs TextBlob handles with special cases that are not
+vectorized here: emoticons, "(!)" irony markers, abbreviations with
+periods and repeated negations after a modifier. bench_sentiment.py
+reports the measured agreement.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Characters TextBlob strips from the start and end of words, and quotes it splits words on
+_PUNCTUATION = ".,;:!?()[]{}`\"@#$^&*+-|=~_"
+_QUOTES = "'‘’“”"
+_EDGE = re.escape(_PUNCTUATION + _QUOTES)
+_INNER = re.escape(_QUOTES)
+_SEPARATOR = '\x1e'
+_TOKEN = re.compile(rf"\x1e|!|\.\.\.(?=\s)|[^\s{_EDGE}](?:[^\s{_INNER}]*[^\s{_EDGE}])?")
+# TextBlob splits contractions before tokenizing ("don't" -> "do n't")
+_CONTRACTION = re.compile(r"n't\b")
+
+NEGATIONS = ('no', 'not', 'never')
+MODIFIER_POS = 'RB'
+EXCLAMATION_BOOST = 1.25
+NEGATION_FACTOR = -0.5
+
+
+class Lexicon:
+    """TextBlob's sentiment lexicon compiled into flat NumPy arrays"""
+
+    def __init__(self):
+        from textblob.en import sentiment
+
+        if not dict.__len__(sentiment):
+            sentiment.load()
+
+        words = sorted(sentiment.keys())
+        self.index = {word: i for i, word in enumerate(words)}
+        self.polarity = np.empty(len(words))
+        self.intensity = np.empty(len(words))
+        self.modifier = np.zeros(len(words), dtype=bool)
+        self.adverb = np.array([word.endswith('ly') for word in words])
+        for i, word in enumerate(words):
+            entries = sentiment[word]
+            polarity, _, intensity = entries[None]
+            self.polarity[i] = polarity
+            self.intensity[i] = intensity
+            self.modifier[i] = MODIFIER_POS in entries
+
+
+_lexicon = None
+
+
+def get_lexicon():
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = Lexicon()
+    return _lexicon
+
+
+def _previous(positions):
+    """For each index, the latest marked position strictly before it (-1 if none)"""
+    latest = np.maximum.accumulate(positions)
+    return np.concatenate(([-1], latest[:-1]))
+
+
+def score_batch(texts, lexicon=None):
+    """Polarity for every text in the batch as a float array"""
+    lexicon = lexicon or get_lexicon()
+    n_docs = len(texts)
+    if n_docs == 0:
+        return np.zeros(0)
+
+    joined = _CONTRACTION.sub(" n't", f' {_SEPARATOR} '.join(texts).lower())
+    tokens = _TOKEN.findall(joined + ' ')
+    if not tokens:
+        return np.zeros(n_docs)
+
+    tokens = np.array(tokens, dtype=object)
+    separator = tokens == _SEPARATOR
+    doc = np.cumsum(separator)[~separator]
+    tokens = tokens[~separator]
+    if len(tokens) == 0:
+        return np.zeros(n_docs)
+
+    # Vocabulary lookup once per distinct token
+    unique, inverse = np.unique(tokens.astype(str), return_inverse=True)
+    unique_ids = np.array([lexicon.index.get(token, -1) for token in unique])
+    unique_len = np.array([len(token) for token in unique])
+    unique_neg = np.isin(unique, NEGATIONS)
+    ids = unique_ids[inverse]
+    length = unique_len[inverse]
+    negation = unique_neg[inverse]
+    exclamation = unique[inverse] == '!'
+
+    n = len(ids)
+    position = np.arange(n)
+    known = ids >= 0
+    safe_ids = np.where(known, ids, 0)
+    doc_start = np.concatenate(([True], doc[1:] != doc[:-1]))
+    doc_start_at = np.maximum.accumulate(np.where(doc_start, position, -1))
+
+    last_known = _previous(np.where(known, position, -1))
+    has_last_known = last_known >= doc_start_at
+
+    last_is_modifier = has_last_known & lexicon.modifier[safe_ids[np.maximum(last_known, 0)]]
+
+    # A negation right after an "-ly" modifier negates that modifier's assessment
+    # instead of the next word ("really not good")
+    long_unknown = ~known & (length > 2)
+    pending_reset = np.maximum.accumulate(np.where(long_unknown & ~negation, position, -1))
+    modifier_negation = (
+        negation & ~known & last_is_modifier
+        & lexicon.adverb[safe_ids[np.maximum(last_known, 0)]]
+        & (pending_reset < last_known)
+    )
+
+    # A known adverb modifies the next known word unless a longer unknown word intervenes
+    modifier_reset = np.maximum.accumulate(np.where(long_unknown & ~modifier_negation, position, -1))
+    modified = known & last_is_modifier & (modifier_reset < last_known)
+
+    # A negation applies to the next known word, surviving only single-character words
+    last_negation = _previous(np.where(negation & ~modifier_negation, position, -1))
+    negation_reset = _previous(np.where(((known | (length > 1)) & ~negation) | modifier_negation, position, -1))
+    negated = known & (last_negation >= doc_start_at) & (last_negation > negation_reset)
+
+    intensity = lexicon.intensity[safe_ids]
+    effective_intensity = np.where(negated, 1.0 / intensity, intensity)
+    polarity = lexicon.polarity[safe_ids]
+    polarity = np.where(
+        modified,
+        np.clip(polarity * effective_intensity[np.maximum(last_known, 0)], -1.0, 1.0),
+        polarity
+    )
+
+    # Each run of modifier -> word collapses into one assessment scored by its last word
+    known_positions = np.flatnonzero(known)
+    if len(known_positions) == 0:
+        return np.zeros(n_docs)
+    group_of_known = np.cumsum(~modified[known_positions]) - 1
+    group_at = np.full(n, -1)
+    group_at[known_positions] = group_of_known
+    n_groups = group_of_known[-1] + 1
+    group_last = known_positions[np.concatenate((group_of_known[1:] != group_of_known[:-1], [True]))]
+
+    group_polarity = polarity[group_last]
+    group_doc = doc[group_last]
+    group_negated = np.bincount(group_of_known, weights=negated[known_positions], minlength=n_groups) > 0
+    group_negated[group_at[last_known[modifier_negation]]] = True
+
+    # "!" boosts the latest assessment in the same text, unless a later word
+    # merges into that assessment and rescores it
+    boosted = np.flatnonzero(exclamation & has_last_known)
+    boosted_group = group_at[last_known[boosted]]
+    boosted_group = boosted_group[last_known[boosted] == group_last[boosted_group]]
+    boosts = np.bincount(boosted_group, minlength=n_groups)
+    if boosts.any():
+        group_polarity = np.clip(group_polarity * EXCLAMATION_BOOST ** boosts, -1.0, 1.0)
+
+    group_polarity = np.where(group_negated, group_polarity * NEGATION_FACTOR, group_polarity)
+
+    totals = np.bincount(group_doc, weights=group_polarity, minlength=n_docs)
+    counts = np.bincount(group_doc, minlength=n_docs)
+    return totals / np.maximum(counts, 1)
+
+
+def _score_chunk(texts):
+    return score_batch(texts)
+
+
+class BatchSentimentScorer:
+    """Scores batches in-process, spreading very large batches over a process pool"""
+
+    # Sentiment cache namespace; bump when scoring rules change so stale scores are not reused
+    name = 'batch-v1'
+
+    def __init__(self, parallel_threshold=20_000, chunk_size=5_000, max_workers=None):
+        self.parallel_threshold = parallel_threshold
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+
+    def score(self, texts):
+        """Polarity for every text, in order, as a list of floats"""
+        texts = list(texts)
+        if len(texts) < self.parallel_threshold or self.max_workers < 2:
+            return score_batch(texts).tolist()
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        return np.concatenate(list(self._pool.map(_score_chunk, chunks))).tolist()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,136 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+# Scorer name used when callers do not give one
+DEFAULT_SCORER = 'textblob'
+
+
+def cache_key(text, scorer=DEFAULT_SCORER):
+    """Content hash of the scorer name and the text with case and whitespace normalized"""
+    normalized = _WHITESPACE.sub(' ', text).strip().lower()
+    return hashlib.blake2b(f'{scorer}\0{normalized}'.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SentimentCache:
+    """Two-tier sentiment score cache keyed by scorer and normalized text.
+
+    Scores from different scorers (or versions of one) never share entries,
+    since they can disagree on the same text.
+
+    Hot entries live in an in-memory LRU; every score is also kept in a
+    SQLite file so it survives restarts. Both tiers are bounded: the LRU
+    drops its least recently used entry and the disk tier deletes the
+    least recently used rows once it grows past `disk_size`.
+    """
+
+    def __init__(self, path='sentiment_cache.db', memory_size=4096, disk_size=100_000):
+        self.path = Path(path)
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._dirty = 0
+
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, score REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)')
+        self.db.commit()
+
+    def get(self, text, scorer=DEFAULT_SCORER):
+        """Cached score for text, or None"""
+        key = cache_key(text, scorer)
+        with self.lock:
+            return self._get(key)
+
+    def _get(self, key):
+        score = self.memory.get(key)
+        if score is not None:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return score
+
+        row = self.db.execute('SELECT score FROM scores WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self.db.execute('UPDATE scores SET last_used = ? WHERE key = ?', (time.time(), key))
+            self._dirty += 1
+            self._remember(key, row[0])
+            self.disk_hits += 1
+            return row[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, text, score, scorer=DEFAULT_SCORER):
+        key = cache_key(text, scorer)
+        with self.lock:
+            self._put(key, score)
+
+    def _put(self, key, score):
+        self._remember(key, score)
+        self.db.execute(
+            'INSERT OR REPLACE INTO scores (key, score, last_used) VALUES (?, ?, ?)',
+            (key, score, time.time())
+        )
+        self._dirty += 1
+
+    def _remember(self, key, score):
+        self.memory[key] = score
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get_or_compute(self, text, compute, scorer=DEFAULT_SCORER):
+        """Return the cached score for text, computing and storing it on a miss"""
+        key = cache_key(text, scorer)
+        with self.lock:
+            score = self._get(key)
+        if score is not None:
+            return score
+
+        score = compute(text)
+        with self.lock:
+            self._put(key, score)
+        return score
+
+    def flush(self):
+        """Commit pending disk writes and evict rows beyond the disk bound"""
+        with self.lock:
+            if not self._dirty:
+                return
+            count = self.db.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+            if count > self.disk_size:
+                self.db.execute(
+                    'DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)',
+                    (count - self.disk_size,)
+                )
+            self.db.commit()
+            self._dirty = 0
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_entries': len(self.memory)
+        }
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.db.close()
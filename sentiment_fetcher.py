@@ -0,0 +1,171 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` requests per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class FetchResult:
+    __slots__ = ('url', 'status', 'data', 'not_modified', 'elapsed', 'error', 'attempts')
+
+    def __init__(self, url, status=None, data=None, not_modified=False, elapsed=0.0, error=None, attempts=1):
+        self.url = url
+        self.status = status
+        self.data = data
+        self.not_modified = not_modified
+        self.elapsed = elapsed
+        self.error = error
+        self.attempts = attempts
+
+    @property
+    def ok(self):
+        return self.data is not None
+
+
+class SentimentFetcher:
+    """Concurrent JSON fetcher for sentiment sources.
+
+    Keeps one pooled keep-alive Session per host, throttles each host with
+    its own token bucket and revalidates with ETag / If-Modified-Since so
+    unchanged responses come back as cheap 304s served from the cache.
+    Connection errors, 429s and 5xx responses are retried up to `retries`
+    times, waiting `backoff` * 2**attempt seconds (or the server's
+    Retry-After, capped at `backoff_max`) between attempts.
+    """
+
+    DEFAULT_RATE = 1.0
+    DEFAULT_BURST = 3
+
+    def __init__(self, max_workers=8, timeout=10, rate_limits=None, user_agent='CryptoSentimentBot/1.0',
+                 retries=2, backoff=0.5, backoff_max=10.0):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.user_agent = user_agent
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        # {host: (requests per second, burst)}
+        self.rate_limits = dict(rate_limits or {})
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sentiment-fetch')
+
+        self._sessions = {}
+        self._buckets = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = self.user_agent
+                self._sessions[host] = session
+                rate, burst = self.rate_limits.get(host, (self.DEFAULT_RATE, self.DEFAULT_BURST))
+                self._buckets[host] = TokenBucket(rate, burst)
+            return session, self._buckets[host]
+
+    def fetch(self, url, headers=None):
+        """Fetch one URL as JSON, revalidating against the cached copy if there is one"""
+        host = urlsplit(url).netloc
+        session, bucket = self._host_state(host)
+
+        request_headers = dict(headers or {})
+        with self._lock:
+            cached = self._cache.get(url)
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                request_headers['If-None-Match'] = etag
+            if last_modified:
+                request_headers['If-Modified-Since'] = last_modified
+
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            # Retries draw from the host's bucket too, so they cannot exceed its rate
+            bucket.acquire()
+            try:
+                response = session.get(url, headers=request_headers, timeout=self.timeout)
+                error = None
+            except Exception as e:
+                response, error = None, e
+            if attempt >= self.retries or (response is not None and response.status_code not in RETRY_STATUSES):
+                break
+            time.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+        elapsed = time.perf_counter() - start
+        attempts = attempt + 1
+
+        if response is None:
+            return FetchResult(url, error=error, elapsed=elapsed, attempts=attempts)
+        if response.status_code == 304 and cached is not None:
+            return FetchResult(url, 304, cached[2], not_modified=True, elapsed=elapsed, attempts=attempts)
+        if response.status_code != 200:
+            return FetchResult(url, response.status_code, elapsed=elapsed, attempts=attempts)
+
+        try:
+            data = response.json()
+        except ValueError as e:
+            return FetchResult(url, response.status_code, elapsed=elapsed, error=e, attempts=attempts)
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            with self._lock:
+                self._cache[url] = (etag, last_modified, data)
+        return FetchResult(url, 200, data, elapsed=elapsed, attempts=attempts)
+
+    def _retry_delay(self, attempt, response):
+        """Seconds to wait before retry number attempt + 1"""
+        delay = self.backoff * (2 ** attempt)
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after is not None:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return min(delay, self.backoff_max)
+
+    def fetch_many(self, urls, headers=None):
+        """Fetch several URLs concurrently; results are returned in the same order"""
+        futures = [self.executor.submit(self.fetch, url, headers) for url in urls]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -0,0 +1,217 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+
+def atomic_write(path, payload):
+    """Write bytes to path via a temp file and rename so readers never see a partial file"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DirtyCounter:
+    """Pending-update count for one shard of a SnapshotWriter's state.
+
+    mark() is only called under that shard's own lock, so feeds on
+    different shards share no lock. `marked` is only written by the shard
+    and `flushed` only by the writer, and the writer's condition is only
+    taken when this shard alone reaches max_updates.
+    """
+
+    __slots__ = ('writer', 'marked', 'flushed', 'first_dirty_ns')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.marked = 0
+        self.flushed = 0
+        self.first_dirty_ns = None
+
+    def mark(self, count=1):
+        pending = self.marked - self.flushed
+        if pending <= 0:
+            self.first_dirty_ns = time.monotonic_ns()
+        self.marked += count
+        if pending < self.writer.max_updates <= pending + count:
+            self.writer.wake()
+
+
+class SnapshotWriter:
+    """Background writer that coalesces state updates into periodic pickle snapshots.
+
+    Feed threads call mark_dirty() after changing state; a dedicated thread
+    pickles the state under the caller's lock (if any; state that is
+    already an immutable snapshot needs none) and writes it to disk outside
+    of it, either every `interval` seconds or as soon as `max_updates`
+    updates have accumulated. Sharded state can take one DirtyCounter per
+    shard from counter() instead of calling mark_dirty(). After a failed
+    write the updates stay pending and the thread waits out a backoff that
+    doubles with each consecutive failure, up to `max_backoff` seconds,
+    before trying again.
+    """
+
+    def __init__(self, path, get_state, lock=None, interval=1.0, max_updates=500, on_flush=None,
+                 max_backoff=30.0):
+        self.path = Path(path)
+        self.get_state = get_state
+        self.lock = lock if lock is not None else nullcontext()
+        self.interval = interval
+        self.max_updates = max_updates
+        self.on_flush = on_flush
+        self.max_backoff = max_backoff
+
+        self._pending = 0
+        self._first_dirty_ns = None
+        self._counters = ()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+        self.flush_count = 0
+        self.error_count = 0
+        # Failed flushes since the last successful one
+        self.consecutive_errors = 0
+        self.total_updates = 0
+        self.last_flush_updates = 0
+        self.last_flush_time = None
+        self.last_flush_duration = 0.0
+        self.last_flush_lag_ns = 0
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name='snapshot-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, flush=True):
+        """Stop the background thread, optionally writing any pending updates"""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def counter(self):
+        """A new DirtyCounter for a shard that is updated under its own lock"""
+        counter = DirtyCounter(self)
+        with self._cond:
+            self._counters += (counter,)
+        return counter
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _pending_count(self):
+        return self._pending + sum(counter.marked - counter.flushed for counter in self._counters)
+
+    def mark_dirty(self, count=1):
+        """Record that state changed; cheap enough to call on every tick"""
+        with self._cond:
+            if self._pending == 0:
+                self._first_dirty_ns = time.monotonic_ns()
+            self._pending += count
+            if self._pending >= self.max_updates:
+                self._cond.notify()
+
+    def flush(self):
+        """Write a snapshot now if there are pending updates; returns the number coalesced"""
+        with self._cond:
+            coalesced = self._pending
+            first_dirty_ns = self._first_dirty_ns
+            self._pending = 0
+            taken = []
+            for counter in self._counters:
+                marked = counter.marked
+                if marked > counter.flushed:
+                    taken.append((counter, marked - counter.flushed))
+                    coalesced += marked - counter.flushed
+                    if first_dirty_ns is None or counter.first_dirty_ns < first_dirty_ns:
+                        first_dirty_ns = counter.first_dirty_ns
+                    counter.flushed = marked
+        if coalesced == 0:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            with self.lock:
+                payload = pickle.dumps(self.get_state(), protocol=pickle.HIGHEST_PROTOCOL)
+            atomic_write(self.path, payload)
+        except Exception as e:
+            print(f"Error saving snapshot to {self.path}: {e}")
+            self.error_count += 1
+            self.consecutive_errors += 1
+            with self._cond:
+                for counter, count in taken:
+                    counter.flushed -= count
+                    coalesced -= count
+                if self._pending == 0:
+                    self._first_dirty_ns = first_dirty_ns
+                self._pending += coalesced
+            return 0
+
+        self.consecutive_errors = 0
+        self.last_flush_duration = time.perf_counter() - start
+        # How long the oldest coalesced update waited before readers could see it
+        self.last_flush_lag_ns = time.monotonic_ns() - first_dirty_ns
+        self.last_flush_time = time.time()
+        self.last_flush_updates = coalesced
+        self.total_updates += coalesced
+        self.flush_count += 1
+
+        if self.on_flush is not None:
+            self.on_flush(coalesced, self.last_flush_duration, self.last_flush_lag_ns)
+        return coalesced
+
+    def stats(self):
+        """Return flush statistics"""
+        with self._cond:
+            pending = self._pending_count()
+        return {
+            'flushes': self.flush_count,
+            'errors': self.error_count,
+            'updates': self.total_updates,
+            'pending': pending,
+            'last_flush_updates': self.last_flush_updates,
+            'last_flush_ms': self.last_flush_duration * 1000,
+            'last_flush_lag_ms': self.last_flush_lag_ns / 1e6,
+            'avg_updates_per_flush': self.total_updates / self.flush_count if self.flush_count else 0,
+        }
+
+    def _backoff(self):
+        return min(self.max_backoff, self.interval * 2 ** (self.consecutive_errors - 1))
+
+    def _run(self):
+        deadline = time.monotonic() + self.interval
+        while True:
+            with self._cond:
+                # While backing off, a full batch of pending updates must not cut the wait short
+                backing_off = self.consecutive_errors > 0
+                while not self._stop and (backing_off or self._pending_count() < self.max_updates):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stop:
+                    return
+            self.flush()
+            delay = self._backoff() if self.consecutive_errors else self.interval
+            deadline = time.monotonic() + delay
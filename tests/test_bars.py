@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+import pytest
+
+from bars import COLUMNS, BarEngine, BarRing, BarSeries
+
+
+def test_ticks_within_a_bar_update_it_in_place():
+    series = BarSeries(60, capacity=10)
+    series.update(120.5, 100.0, 1.0)
+    series.update(130.0, 103.0, 2.0)
+    series.update(150.0, 98.0, 1.0)
+    series.update(179.9, 101.0, 0.0)
+
+    assert len(series.ring) == 0
+    start, open_, high, low, close, volume, vwap, ticks = series.current()
+    assert (start, open_, high, low, close, ticks) == (120.0, 100.0, 103.0, 98.0, 101.0, 4)
+    assert volume == 4.0
+    assert vwap == pytest.approx((100.0 + 2 * 103.0 + 98.0) / 4)
+
+
+def test_rollover_closes_the_bar_and_skips_empty_intervals():
+    series = BarSeries(60, capacity=10)
+    series.update(10.0, 100.0, 1.0)
+    series.update(59.999, 105.0, 1.0)
+    # Exactly on the boundary starts the next bar
+    series.update(60.0, 110.0, 0.0)
+    # Nothing between 120 and 300: no bars are made up for the gap
+    series.update(301.0, 90.0, 0.0)
+
+    bars = series.bars(10)
+    assert bars['start'].tolist() == [0.0, 60.0, 300.0]
+    assert bars['open'].tolist() == [100.0, 110.0, 90.0]
+    assert bars['close'].tolist() == [105.0, 110.0, 90.0]
+    assert bars['ticks'].tolist() == [2, 1, 1]
+    # A bar without volume reports its close as VWAP
+    assert bars['vwap'][1] == 110.0
+
+
+def test_bars_limit_counts_the_open_bar():
+    series = BarSeries(1, capacity=100)
+    for t in range(20):
+        series.update(float(t), 100.0 + t, 1.0)
+    bars = series.bars(5)
+    assert bars['start'].tolist() == [15.0, 16.0, 17.0, 18.0, 19.0]
+
+
+def test_ring_grows_then_wraps_at_capacity():
+    ring = BarRing(capacity=100, initial=4)
+    for i in range(250):
+        ring.append((float(i),) + (0.0,) * (len(COLUMNS) - 1))
+    assert ring.size == 100 and len(ring) == 100
+    assert ring.last(1000)['start'].tolist() == [float(i) for i in range(150, 250)]
+
+
+def test_engine_volume_from_24h_deltas_and_resolutions():
+    engine = BarEngine(resolutions=(1, 60), capacity=10)
+    engine.update('coinbase', 'BTC-USD', 0.5, 99.0, 101.0, 1000.0)
+    engine.update('coinbase', 'BTC-USD', 0.7, 100.0, 102.0, 1002.5)
+    # A falling 24h volume means old trades rolled out, not negative volume
+    engine.update('coinbase', 'BTC-USD', 1.2, 101.0, 103.0, 1001.0)
+
+    second = engine.bars('coinbase', 'BTC-USD', 1)
+    minute = engine.bars('coinbase', 'BTC-USD', 60)
+    assert second['volume'].tolist() == [2.5, 0.0]
+    assert minute['volume'].tolist() == [2.5]
+    assert minute['open'][0] == 100.0 and minute['close'][0] == 102.0
+    assert engine.bars('coinbase', 'ETH-USD', 60) is None
+    assert engine.bars('coinbase', 'BTC-USD', 5) is None
+
+
+def test_snapshot_matches_brute_force():
+    rng = np.random.default_rng(1)
+    times = np.sort(rng.uniform(0, 3600, 2000))
+    prices = 100 + np.cumsum(rng.normal(0, 0.1, len(times)))
+    engine = BarEngine(resolutions=(60,), capacity=1000)
+    for t, price in zip(times, prices):
+        engine.update('kraken', 'XBT/USD', t, price, price, 0.0)
+
+    bars = engine.snapshot('kraken', limit=1000, lock=threading.Lock())['XBT/USD'][60]
+    buckets = np.floor(times / 60)
+    starts = np.unique(buckets)
+    assert bars['start'].tolist() == (starts * 60).tolist()
+    for i, bucket in enumerate(starts):
+        in_bar = prices[buckets == bucket]
+        assert (bars['open'][i], bars['close'][i]) == (in_bar[0], in_bar[-1])
+        assert (bars['high'][i], bars['low'][i]) == (in_bar.max(), in_bar.min())
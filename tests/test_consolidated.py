@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from consolidated import ConsolidatedBook, SymbolRegistry
+
+
+def test_symbols_normalize_across_venues():
+    registry = SymbolRegistry()
+    assert registry.canonical('kraken', 'XBT/USD') == 'BTC-USD'
+    assert registry.canonical('coinbase', 'BTC-USD') == 'BTC-USD'
+    assert registry.canonical('kraken', 'xdg/eur') == 'DOGE-EUR'
+    registry.register('kraken', 'XBT/USD', 'BTC-USDX')
+    assert registry.canonical('kraken', 'XBT/USD') == 'BTC-USDX'
+
+
+def test_best_prices_come_from_different_venues():
+    book = ConsolidatedBook(max_age=30.0)
+    book.update('coinbase', 'BTC-USD', 100.0, 102.0, timestamp=1000.0)
+    entry = book.update('kraken', 'XBT/USD', 100.5, 101.5, timestamp=1001.0)
+
+    assert entry['best_bid'] == 100.5 and entry['bid_exchange'] == 'kraken'
+    assert entry['best_ask'] == 101.5 and entry['ask_exchange'] == 'kraken'
+    assert entry['venues'] == 2 and entry['oldest'] == 1000.0
+    assert not entry['arbitrage'] and entry['arbitrage_edge'] == 0.0
+    assert book.get('BTC-USD') is entry
+
+
+def test_crossed_book_across_venues_flags_arbitrage():
+    book = ConsolidatedBook(max_age=30.0)
+    book.update('coinbase', 'BTC-USD', 103.0, 104.0, timestamp=1000.0)
+    entry = book.update('kraken', 'XBT/USD', 100.0, 101.0, timestamp=1000.0)
+    assert entry['arbitrage']
+    assert entry['bid_exchange'] == 'coinbase' and entry['ask_exchange'] == 'kraken'
+    assert entry['arbitrage_edge'] == pytest.approx(2.0)
+
+    # A single venue with a crossed quote is bad data, not arbitrage
+    entry = book.update('coinbase', 'ETH-USD', 11.0, 10.0, timestamp=1000.0)
+    assert entry['spread'] < 0 and not entry['arbitrage']
+
+
+def test_stale_venue_expires_out_of_the_book():
+    book = ConsolidatedBook(max_age=30.0)
+    book.update('coinbase', 'BTC-USD', 103.0, 104.0, timestamp=1000.0)
+    book.update('kraken', 'XBT/USD', 100.0, 101.0, timestamp=1020.0)
+    assert book.get('BTC-USD')['arbitrage']
+
+    # Coinbase's quote is 31s old at 1031: only Kraken's remains and the phantom arbitrage is gone
+    entry = book.snapshot(now=1031.0)['BTC-USD']
+    assert entry['venues'] == 1 and entry['bid_exchange'] == 'kraken'
+    assert not entry['arbitrage'] and entry['oldest'] == 1020.0
+
+    # Once every venue is stale the instrument disappears until it ticks again
+    assert book.snapshot(now=1051.0) == {}
+    book.update('coinbase', 'BTC-USD', 103.0, 104.0, timestamp=1060.0)
+    assert book.get('BTC-USD')['venues'] == 1
+
+
+def test_snapshot_is_a_copy():
+    book = ConsolidatedBook()
+    book.update('coinbase', 'BTC-USD', 100.0, 101.0, timestamp=1000.0)
+    snapshot = book.snapshot(now=1000.0)
+    snapshot['BTC-USD']['best_bid'] = 0.0
+    assert book.get('BTC-USD')['best_bid'] == 100.0
+
+
+def test_remove_drops_a_venue_or_products():
+    book = ConsolidatedBook()
+    # remove() recomputes the survivors as of the wall clock
+    now = time.time()
+    for product in ('XBT/USD', 'ETH/USD'):
+        book.update('kraken', product, 100.0, 101.0, timestamp=now)
+    book.update('coinbase', 'BTC-USD', 99.0, 102.0, timestamp=now)
+
+    book.remove('kraken', ['ETH/USD'])
+    assert book.get('ETH-USD') is None
+    assert book.get('BTC-USD')['venues'] == 2
+
+    # A disconnect drops every product of the venue; the others keep quoting
+    book.remove('kraken')
+    entry = book.get('BTC-USD')
+    assert entry['venues'] == 1 and entry['bid_exchange'] == 'coinbase'
+    book.remove('coinbase')
+    assert book.get('BTC-USD') is None
+    # Removing what is not there is a no-op
+    book.remove('coinbase', ['SOL-USD'])
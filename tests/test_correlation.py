@@ -0,0 +1,180 @@
+import math
+
+import numpy as np
+import pytest
+
+from correlation import CorrelationEngine, LaggedCorrelation
+
+
+def brute_force(x, y, window, lag):
+    """corr(x[t - lag], y[t]) over the pairs whose t is among the last `window` samples"""
+    n = len(x)
+    pairs = [(x[t - max(lag, 0)], y[t + min(lag, 0)])
+             for t in range(max(n - window, 0), n)
+             if t - max(lag, 0) >= 0 and t + min(lag, 0) >= 0]
+    if len(pairs) < 3:
+        return math.nan
+    a, b = np.array(pairs).T
+    if a.std() == 0 or b.std() == 0:
+        return math.nan
+    return float(np.corrcoef(a, b)[0, 1])
+
+
+def expected(tracker, x, y):
+    return np.array([[brute_force(x, y, window, lag) for lag in tracker.lags] for window in tracker.windows])
+
+
+@pytest.mark.parametrize('samples', [2, 5, 40, 137])
+def test_incremental_matches_brute_force(samples):
+    rng = np.random.default_rng(samples)
+    x = rng.normal(size=samples)
+    y = 0.5 * np.roll(x, 2) + rng.normal(size=samples)
+    tracker = LaggedCorrelation(windows=(10, 30), max_lag=3, resync_every=10_000)
+    for a, b in zip(x, y):
+        tracker.append(a, b)
+    np.testing.assert_allclose(tracker.correlations(), expected(tracker, x, y), atol=1e-9)
+
+
+def test_positive_lag_detects_sentiment_leading_returns():
+    rng = np.random.default_rng(7)
+    x = rng.normal(size=300)
+    y = np.empty_like(x)
+    y[:2] = rng.normal(size=2)
+    y[2:] = x[:-2]
+    tracker = LaggedCorrelation(windows=(100,), max_lag=4)
+    for a, b in zip(x, y):
+        tracker.append(a, b)
+    correlations = tracker.correlations()[0]
+    assert tracker.lags[np.nanargmax(correlations)] == 2
+    assert correlations[list(tracker.lags).index(2)] == pytest.approx(1.0)
+
+
+def test_resync_removes_drift_and_keeps_values():
+    rng = np.random.default_rng(3)
+    tracker = LaggedCorrelation(windows=(20, 50), max_lag=2, resync_every=10_000)
+    for a, b in rng.normal(size=(500, 2)) * 1e6:
+        tracker.append(a, b)
+    before = tracker.correlations()
+    tracker.resync()
+    np.testing.assert_allclose(tracker.correlations(), before, atol=1e-6)
+
+
+def test_constant_series_is_undefined():
+    tracker = LaggedCorrelation(windows=(10,), max_lag=1)
+    for i in range(20):
+        tracker.append(0.3, 0.01 * i)
+    assert np.isnan(tracker.correlations()).all()
+
+
+def test_extend_equals_append():
+    rng = np.random.default_rng(11)
+    x, y = rng.normal(size=(2, 900))
+    appended = LaggedCorrelation(windows=(30, 120), max_lag=5)
+    for a, b in zip(x, y):
+        appended.append(a, b)
+    extended = LaggedCorrelation(windows=(30, 120), max_lag=5)
+    extended.extend(x[:400], y[:400])
+    extended.extend(x[400:], y[400:])
+    assert len(extended) == len(appended)
+    np.testing.assert_allclose(extended.correlations(), appended.correlations(), atol=1e-9)
+
+
+def test_engine_pairs_sentiment_with_log_returns():
+    engine = CorrelationEngine(interval=60, windows=(5,), max_lag=1)
+    mids = [100.0, 101.0, 99.0, 102.0, 102.5, 101.0]
+    sentiment = [0.1, 0.4, -0.3, 0.5, 0.2, -0.1]
+    for i, (mid, score) in enumerate(zip(mids, sentiment)):
+        assert engine.due(i * 60.0)
+        engine.sample(i * 60.0, score, {'coinbase': {'BTC-USD': {'bid': mid, 'ask': mid}}})
+    assert not engine.due(5 * 60.0 + 30)
+
+    returns = np.log(np.array(mids[1:]) / mids[:-1])
+    result = engine.results()
+    product = result['products']['coinbase']['BTC-USD']
+    assert result['lags'] == [-1, 0, 1]
+    assert product['samples'][0] == 5
+    assert product['lag0'][0] == pytest.approx(np.corrcoef(sentiment[1:], returns)[0, 1])
+
+
+def test_seed_matches_live_sampling():
+    rng = np.random.default_rng(5)
+    start = 1.7e9
+    # Recorded every 5 minutes, so there is no downtime for the seed to find
+    sentiment_times = start + 300 * np.arange(72) + rng.uniform(0, 60, 72)
+    sentiment_values = rng.normal(size=len(sentiment_times))
+    tick_times = np.sort(start + rng.uniform(-120, 6 * 3600, 5000))
+    mids = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, len(tick_times))))
+
+    seeded = CorrelationEngine(interval=60, windows=(30, 120), max_lag=5)
+    seeded.seed(sentiment_times, sentiment_values, {('coinbase', 'BTC-USD'): (tick_times, mids)})
+
+    live = CorrelationEngine(interval=60, windows=(30, 120), max_lag=5)
+    end = sentiment_times[-1]
+    steps = min(int((end - sentiment_times[0]) // 60), 120 + 5 + 1)
+    for now in end - 60 * np.arange(steps, -1, -1):
+        score = sentiment_values[np.searchsorted(sentiment_times, now, side='right') - 1]
+        mid = mids[np.searchsorted(tick_times, now, side='right') - 1]
+        live.sample(now, score, {'coinbase': {'BTC-USD': {'bid': mid, 'ask': mid}}})
+
+    assert seeded.last_sample == live.last_sample and seeded.samples == live.samples
+    ours = seeded.results()['products']['coinbase']['BTC-USD']
+    theirs = live.results()['products']['coinbase']['BTC-USD']
+    np.testing.assert_allclose(ours['correlation'], theirs['correlation'], atol=1e-9)
+    assert ours['samples'].tolist() == theirs['samples'].tolist()
+
+
+def test_restart_gap_is_not_a_return():
+    engine = CorrelationEngine(interval=60, windows=(50,), max_lag=2)
+    quote = lambda mid: {'coinbase': {'BTC-USD': {'bid': mid, 'ask': mid}}}
+    for i in range(10):
+        engine.sample(i * 60.0, 0.1 * i, quote(100.0 + i))
+    # Down for ten intervals while the price doubled, then back up
+    for i in range(20, 25):
+        engine.sample(i * 60.0, 0.1 * i, quote(200.0 + i))
+
+    tracker = engine.trackers[('coinbase', 'BTC-USD')]
+    returns = tracker.y[:len(tracker)]
+    # Nine returns before the gap, the skipped grid points, then four after the first live sample
+    assert len(tracker) == 24
+    assert np.isnan(returns[9:20]).all()
+    assert np.nanmax(returns) < math.log(101 / 100) + 1e-12
+    lag0 = tracker.lags.tolist().index(0)
+    assert tracker.n[0, lag0] == 13
+    # A lag-2 pair would need the sentiment two grid points back, which is inside the gap
+    assert tracker.n[0, tracker.lags.tolist().index(2)] == 7 + 2
+
+
+def test_seed_keeps_downtime_as_a_gap():
+    rng = np.random.default_rng(9)
+    start = 1.7e9
+    up = [(0, 3 * 3600), (5 * 3600, 8 * 3600)]
+    sentiment_times = np.concatenate([start + np.arange(a, b, 300) for a, b in up])
+    sentiment_values = rng.normal(size=len(sentiment_times))
+    tick_times = np.sort(np.concatenate([start + rng.uniform(a - 120, b, 2000) for a, b in up]))
+    mids = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, len(tick_times))))
+    # A jump across the downtime that must not show up as a return
+    mids[tick_times > start + 4 * 3600] *= 1.5
+
+    seeded = CorrelationEngine(interval=60, windows=(120, 400), max_lag=5)
+    seeded.seed(sentiment_times, sentiment_values, {('coinbase', 'BTC-USD'): (tick_times, mids)})
+
+    live = CorrelationEngine(interval=60, windows=(120, 400), max_lag=5)
+    end = sentiment_times[-1]
+    steps = min(int((end - sentiment_times[0]) // 60), 400 + 5 + 1)
+    for now in end - 60 * np.arange(steps, -1, -1):
+        latest = np.searchsorted(sentiment_times, now, side='right') - 1
+        if now - sentiment_times[latest] > 900:
+            continue
+        mid = mids[np.searchsorted(tick_times, now, side='right') - 1]
+        live.sample(now, sentiment_values[latest], {'coinbase': {'BTC-USD': {'bid': mid, 'ask': mid}}})
+
+    ours = seeded.trackers[('coinbase', 'BTC-USD')]
+    theirs = live.trackers[('coinbase', 'BTC-USD')]
+    assert len(ours) == len(theirs)
+    assert np.nanmax(np.abs(ours.y)) < 0.1
+    np.testing.assert_allclose(ours.correlations(), theirs.correlations(), atol=1e-9)
+    np.testing.assert_array_equal(ours.n, theirs.n)
+
+    # The first live sample after a restart pairs nothing with the seeded mid
+    seeded.sample(end + 3600, 0.5, {'coinbase': {'BTC-USD': {'bid': 500.0, 'ask': 500.0}}})
+    assert np.nanmax(np.abs(ours.y)) < 0.1
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import decoding
+from decoding import CoinbaseDecoder, KrakenDecoder, Quote, available_backends, get_loads
+
+COINBASE_TICKER = json.dumps({
+    'type': 'ticker', 'product_id': 'BTC-USD', 'best_bid': '100.5', 'best_ask': '101.25',
+    'volume_24h': '1234.5', 'time': '2024-01-02T03:04:05.500000Z'
+})
+COINBASE_HEARTBEAT = json.dumps({'type': 'heartbeat', 'product_id': 'BTC-USD', 'sequence': 1})
+COINBASE_ACK = json.dumps({'type': 'subscriptions', 'channels': [{'name': 'ticker', 'product_ids': ['BTC-USD']}]})
+KRAKEN_TICKER = json.dumps([
+    340, {'a': ['101.25', 1, '1.0'], 'b': ['100.5', 2, '2.0'], 'v': ['10.0', '2500.5']}, 'ticker', 'XBT/USD'
+])
+KRAKEN_HEARTBEAT = json.dumps({'event': 'heartbeat'})
+KRAKEN_STATUS = json.dumps({'event': 'subscriptionStatus', 'subscription': {'name': 'ticker'}})
+KRAKEN_BOOK = json.dumps([336, {'b': [['100.5', '1.0', '1700000000.0']]}, 'book-10', 'XBT/USD'])
+
+
+def refuse(message):
+    raise AssertionError(f"parsed a frame the prefilter should have skipped: {message}")
+
+
+@pytest.fixture(params=available_backends())
+def backend(request):
+    return request.param
+
+
+@pytest.mark.parametrize('as_bytes', [False, True])
+def test_coinbase_ticker(backend, as_bytes):
+    message = COINBASE_TICKER.encode() if as_bytes else COINBASE_TICKER
+    quote = CoinbaseDecoder(backend).decode(message)
+    assert quote == Quote('BTC-USD', 100.5, 101.25, 1234.5, pytest.approx(1704164645.5))
+
+
+@pytest.mark.parametrize('as_bytes', [False, True])
+def test_kraken_ticker(backend, as_bytes):
+    message = KRAKEN_TICKER.encode() if as_bytes else KRAKEN_TICKER
+    assert KrakenDecoder(backend).decode(message) == Quote('XBT/USD', 100.5, 101.25, 2500.5)
+
+
+def test_prefilter_skips_frames_without_parsing():
+    coinbase = CoinbaseDecoder('json')
+    coinbase._loads = refuse
+    assert coinbase.decode(COINBASE_HEARTBEAT) is None
+    assert coinbase.decode(COINBASE_HEARTBEAT.encode()) is None
+
+    kraken = KrakenDecoder('json')
+    kraken._loads = refuse
+    for message in (KRAKEN_HEARTBEAT, KRAKEN_STATUS, KRAKEN_BOOK):
+        assert kraken.decode(message) is None
+        assert kraken.decode(message.encode()) is None
+
+
+def test_frames_that_pass_the_prefilter_are_still_checked(backend):
+    # The subscription ack names the ticker channel, so only the parsed type rejects it
+    assert decoding._is_coinbase_ticker(COINBASE_ACK)
+    assert CoinbaseDecoder(backend).decode(COINBASE_ACK) is None
+
+
+def test_without_prefilter_every_frame_is_parsed(backend):
+    assert CoinbaseDecoder(backend, prefilter=False).decode(COINBASE_HEARTBEAT) is None
+    assert KrakenDecoder(backend, prefilter=False).decode(KRAKEN_STATUS) is None
+    assert KrakenDecoder(backend, prefilter=False).decode(KRAKEN_TICKER).product == 'XBT/USD'
+
+
+def test_falls_back_to_json_without_optional_backends(monkeypatch):
+    monkeypatch.setattr(decoding, 'msgspec', None)
+    monkeypatch.setattr(decoding, 'orjson', None)
+    assert available_backends() == ['json']
+    assert get_loads() is json.loads
+
+    decoder = CoinbaseDecoder()
+    assert decoder.backend == 'json' and decoder._typed is None
+    assert decoder.decode(COINBASE_TICKER).bid == 100.5
+    assert KrakenDecoder().backend == 'json'
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_loads('yaml')
+
+
+def test_msgspec_matches_json():
+    pytest.importorskip('msgspec')
+    typed = CoinbaseDecoder('msgspec')
+    plain = CoinbaseDecoder('json')
+    assert typed._typed is not None
+    for message in (COINBASE_TICKER, COINBASE_HEARTBEAT, COINBASE_ACK):
+        assert typed.decode(message) == plain.decode(message)
+    # A ticker frame that fails the typed schema is skipped rather than raising
+    assert typed.decode('{"type": "ticker", "best_bid": [1]}') is None
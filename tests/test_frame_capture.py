@@ -0,0 +1,46 @@
+import time
+
+from frame_capture import FrameRecorder, read_frames, replay_frames
+
+
+def test_capture_round_trip(tmp_path):
+    path = tmp_path / 'frames.gz'
+    recorder = FrameRecorder(path, flush_interval=0.01).start()
+    recorder.record('coinbase', '{"type": "ticker",\n"price": "1"}', 10)
+    recorder.record('kraken', b'[1, {"a": ["2"]}, "ticker", "XBT/USD"]', 20)
+    recorder.stop()
+    # A later run appends to the same capture
+    recorder = FrameRecorder(path).start()
+    recorder.record('coinbase', '{"type": "heartbeat"}', 5)
+    recorder.stop()
+
+    frames = list(read_frames(path))
+    assert [(receive_ns, exchange) for _, receive_ns, exchange, _ in frames] == [
+        (10, 'coinbase'), (20, 'kraken'), (5, 'coinbase')]
+    assert frames[0][3] == '{"type": "ticker", "price": "1"}'
+    assert frames[1][3] == '[1, {"a": ["2"]}, "ticker", "XBT/USD"]'
+    assert all(wall_ns > 0 for wall_ns, _, _, _ in frames)
+
+
+def test_replay_delivers_wall_time_as_fast_as_possible():
+    frames = [(1000 + i, i * 10**9, 'coinbase', str(i)) for i in range(5)]
+    delivered = []
+    start = time.monotonic()
+    assert replay_frames(frames, lambda *frame: delivered.append(frame), speed=0) == 5
+    assert time.monotonic() - start < 1.0
+    assert delivered == [('coinbase', str(i), 1000 + i) for i in range(5)]
+
+
+def test_replay_paces_each_run_of_an_appended_capture():
+    ms = 10**6
+    # The second run's monotonic clock started below the first run's
+    frames = [(0, receive_ns, 'coinbase', '') for receive_ns in
+              (5000 * ms, 5100 * ms, 200 * ms, 300 * ms, 400 * ms)]
+    delivered = []
+    start = time.monotonic()
+    replay_frames(frames, lambda *frame: delivered.append(time.monotonic() - start), speed=1)
+    # 100 ms within the first run, then 200 ms within the second
+    assert delivered[1] >= 0.09
+    assert delivered[2] - delivered[1] < 0.05
+    assert delivered[4] - delivered[2] >= 0.19
+    assert delivered[4] < 1.0
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from market_feed import (DELTA, DEFINE, FRAME, SNAPSHOT, MarketFeedClient, MarketPublisher,
+                         _encode_defines, _encode_quotes, parse_address)
+from market_state import MarketState
+
+
+def tick(market, exchange, product, bid, ask, volume=10.0, timestamp=1.7e9):
+    shard = market.shard(exchange)
+    with shard.lock:
+        spread = ask - bid
+        shard.update(product, bid, ask, spread, spread / bid * 100, volume, timestamp)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def quote(bid, ask, volume=1.0, timestamp=2.0):
+    return {'bid': bid, 'ask': ask, 'volume': volume, 'timestamp': timestamp}
+
+
+def test_parse_address():
+    assert parse_address('unix:/tmp/feed.sock') == '/tmp/feed.sock'
+    assert parse_address(':9109') == ('127.0.0.1', 9109)
+    assert parse_address('0.0.0.0:1234') == ('0.0.0.0', 1234)
+
+
+def test_snapshot_and_delta_decode():
+    # apply() takes payloads, so the FRAME header is sliced off each encoded message
+    client = MarketFeedClient('127.0.0.1:1')
+    client.apply(DEFINE, _encode_defines([(0, 'coinbase', 'BTC-USD'), (1, 'kraken', 'XBT/USD')])[FRAME.size:])
+    client.apply(SNAPSHOT, _encode_quotes(SNAPSHOT, [(0, quote(100.0, 101.0)), (1, quote(99.5, 100.5))])[FRAME.size:])
+    before = client.data
+    client.apply(DELTA, _encode_quotes(DELTA, [(1, quote(99.0, 99.25, 5.0, 3.0))])[FRAME.size:])
+
+    assert client.version == 2
+    assert client.data['coinbase']['BTC-USD']['bid'] == 100.0
+    kraken = client.data['kraken']['XBT/USD']
+    assert (kraken['bid'], kraken['ask'], kraken['volume'], kraken['timestamp']) == (99.0, 99.25, 5.0, 3.0)
+    assert kraken['spread'] == pytest.approx(0.25)
+    # Deltas swap in a new dict; the previous state is left untouched for readers still holding it
+    assert before['kraken']['XBT/USD']['bid'] == 99.5
+    # Exchanges a delta does not mention are shared, not copied
+    assert client.data['coinbase'] is before['coinbase']
+
+
+def test_publisher_round_trip():
+    market = MarketState()
+    tick(market, 'coinbase', 'BTC-USD', 100.0, 101.0)
+    publisher = MarketPublisher(market, port=0, interval=0.01).start()
+    client = MarketFeedClient(('127.0.0.1', publisher.port), reconnect_delay=0.05).start()
+    try:
+        assert wait_for(lambda: client.data.get('coinbase', {}).get('BTC-USD', {}).get('bid') == 100.0)
+
+        tick(market, 'kraken', 'XBT/USD', 99.0, 99.5)
+        tick(market, 'coinbase', 'BTC-USD', 102.0, 103.0, volume=12.5, timestamp=1.7e9 + 1)
+        assert wait_for(lambda: client.data.get('kraken', {}).get('XBT/USD', {}).get('ask') == 99.5
+                        and client.data['coinbase']['BTC-USD']['bid'] == 102.0)
+        btc = client.data['coinbase']['BTC-USD']
+        assert (btc['ask'], btc['volume'], btc['timestamp']) == (103.0, 12.5, 1.7e9 + 1)
+
+        publisher.publish_sentiment({'overall_sentiment': 0.25})
+        assert wait_for(lambda: client.sentiment == {'overall_sentiment': 0.25})
+    finally:
+        client.stop()
+        publisher.stop()
+
+    # Everything the client holds matches the market state it mirrored
+    expected = {exchange: {product: (q['bid'], q['ask'], q['volume'], q['timestamp'])
+                           for product, q in products.items()}
+                for exchange, products in market.snapshot().items()}
+    received = {exchange: {product: (q['bid'], q['ask'], q['volume'], q['timestamp'])
+                           for product, q in products.items()}
+                for exchange, products in client.data.items()}
+    assert received == expected
+
+
+def test_slow_subscriber_gets_conflated_latest_quote():
+    market = MarketState()
+    publisher = MarketPublisher(market, port=0, interval=0.01).start()
+    client = MarketFeedClient(('127.0.0.1', publisher.port), reconnect_delay=0.05).start()
+    try:
+        assert wait_for(lambda: client.connected)
+        for i in range(200):
+            tick(market, 'coinbase', 'ETH-USD', 2000.0 + i, 2001.0 + i)
+        assert wait_for(lambda: client.data.get('coinbase', {}).get('ETH-USD', {}).get('bid') == 2199.0)
+        # Far fewer messages than ticks: publishes are batched per interval
+        assert publisher.messages_sent < 200
+    finally:
+        client.stop()
+        publisher.stop()
+
+
+def test_removed_products_are_dropped_by_subscribers():
+    market = MarketState()
+    tick(market, 'coinbase', 'BTC-USD', 100.0, 101.0)
+    tick(market, 'coinbase', 'SOL-USD', 20.0, 20.1)
+    publisher = MarketPublisher(market, port=0, interval=0.01).start()
+    client = MarketFeedClient(('127.0.0.1', publisher.port), reconnect_delay=0.05).start()
+    try:
+        assert wait_for(lambda: 'SOL-USD' in client.data.get('coinbase', {}))
+        shard = market.shard('coinbase')
+        with shard.lock:
+            shard.remove(['SOL-USD'])
+        assert wait_for(lambda: 'SOL-USD' not in client.data.get('coinbase', {}))
+        assert client.data['coinbase']['BTC-USD']['bid'] == 100.0
+
+        # Coming back reuses the product's id and shows up again
+        tick(market, 'coinbase', 'SOL-USD', 21.0, 21.1)
+        assert wait_for(lambda: client.data.get('coinbase', {}).get('SOL-USD', {}).get('bid') == 21.0)
+        assert publisher.ids[('coinbase', 'SOL-USD')] == 1
+    finally:
+        client.stop()
+        publisher.stop()
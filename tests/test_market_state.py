@@ -0,0 +1,114 @@
+import threading
+import time
+
+from market_state import MarketShard, MarketState, QuoteRecord
+
+
+class RacedRecord(QuoteRecord):
+    """A record whose writer completes one update while a reader is copying the fields"""
+
+    __slots__ = ('raced',)
+
+    def __getattribute__(self, name):
+        if name == 'volume' and not object.__getattribute__(self, 'raced'):
+            self.raced = True
+            self.seq += 1
+            self.bid, self.ask, self.volume = 200.0, 201.0, 7.0
+            self.seq += 1
+        return object.__getattribute__(self, name)
+
+
+def test_record_read_retries_a_torn_copy():
+    record = RacedRecord()
+    record.raced = False
+    record.seq = 2
+    record.bid, record.ask, record.volume = 100.0, 101.0, 5.0
+    # The first copy saw bid 100 next to volume 7; the retry sees the finished update
+    seq, quote = record.read()
+    assert seq == 4
+    assert (quote['bid'], quote['ask'], quote['volume']) == (200.0, 201.0, 7.0)
+
+
+def test_record_read_waits_for_the_writer():
+    record = QuoteRecord()
+    record.seq = 1
+    record.bid = 100.0
+
+    def finish():
+        time.sleep(0.05)
+        record.bid = 101.0
+        record.seq = 2
+
+    writer = threading.Thread(target=finish)
+    writer.start()
+    seq, quote = record.read()
+    writer.join()
+    assert seq == 2 and quote['bid'] == 101.0
+
+
+def test_concurrent_reads_are_never_torn():
+    shard = MarketShard('coinbase', threading.Lock())
+    shard.update('BTC-USD', 0.0, 1.0, 1.0, 0.0, 0.0, 0.0)
+    record = shard.quotes['BTC-USD']
+    stop = threading.Event()
+
+    def write():
+        price = 0.0
+        while not stop.is_set():
+            price += 1.0
+            shard.update('BTC-USD', price, price + 1.0, 1.0, price, price, price)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(2000):
+            seq, quote = record.read()
+            assert seq % 2 == 0
+            assert quote['ask'] - quote['bid'] == 1.0
+            assert quote['volume'] == quote['timestamp'] == quote['spread_percent'] == quote['bid']
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_shard_snapshot_reuses_unchanged_quotes():
+    shard = MarketShard('coinbase', threading.Lock())
+    shard.update('BTC-USD', 100.0, 101.0, 1.0, 1.0, 5.0, 10.0)
+    shard.update('ETH-USD', 10.0, 11.0, 1.0, 10.0, 5.0, 10.0)
+    first = shard.snapshot()
+
+    shard.update('ETH-USD', 10.5, 11.0, 0.5, 4.8, 6.0, 11.0)
+    second = shard.snapshot()
+    assert second['BTC-USD'] is first['BTC-USD']
+    assert second['ETH-USD'] is not first['ETH-USD']
+    assert second['ETH-USD']['bid'] == 10.5 and first['ETH-USD']['bid'] == 10.0
+
+    version = shard.version
+    shard.remove(['ETH-USD', 'SOL-USD'])
+    assert shard.version == version + 1
+    assert list(shard.snapshot()) == ['BTC-USD']
+    shard.remove(['SOL-USD'])
+    assert shard.version == version + 1
+
+
+def test_market_snapshot_is_cached_until_a_version_moves():
+    market = MarketState()
+    coinbase = market.shard('coinbase')
+    assert market.shard('coinbase') is coinbase
+    coinbase.update('BTC-USD', 100.0, 101.0, 1.0, 1.0, 5.0, 10.0)
+    market.shard('kraken').update('XBT/USD', 99.0, 100.0, 1.0, 1.0, 2.0, 10.0)
+
+    snapshot = market.snapshot()
+    assert market.snapshot() is snapshot
+    assert market.versions() == (('coinbase', 1), ('kraken', 1))
+
+    market.shard('kraken').update('XBT/USD', 99.5, 100.0, 0.5, 0.5, 2.0, 11.0)
+    updated = market.snapshot()
+    assert updated is not snapshot
+    assert updated['kraken']['XBT/USD']['bid'] == 99.5
+    # The idle exchange's quotes keep their identity
+    assert updated['coinbase']['BTC-USD'] is snapshot['coinbase']['BTC-USD']
+
+    # A new exchange changes the version tuple even before it quotes
+    market.shard('bitstamp')
+    assert market.snapshot() is not updated
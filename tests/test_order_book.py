@@ -0,0 +1,91 @@
+import zlib
+
+import pytest
+
+pytest.importorskip('sortedcontainers')
+
+from order_book import OrderBook, OrderBookStore, ResyncRequired, vwap_from_levels
+
+ASKS = [('5541.30000', '2.50700000'), ('5541.80000', '0.33000000'), ('5542.70000', '0.64700000')]
+BIDS = [('5541.20000', '1.52900000'), ('5539.90000', '0.30000000'), ('5539.50000', '5.00000000')]
+
+
+def kraken_book(asks=ASKS, bids=BIDS, depth=10):
+    book = OrderBook('kraken', 'XBT/USD', depth)
+    for price, size in asks:
+        book.apply('ask', price, size)
+    for price, size in bids:
+        book.apply('bid', price, size)
+    return book
+
+
+def expected_checksum(asks, bids):
+    """Kraken's spec spelled out: strip '.' and leading zeros, asks ascending then bids descending"""
+    def field(value):
+        return value.replace('.', '').lstrip('0')
+    asks = sorted(asks, key=lambda level: float(level[0]))[:10]
+    bids = sorted(bids, key=lambda level: -float(level[0]))[:10]
+    return zlib.crc32(''.join(field(price) + field(size) for price, size in asks + bids).encode())
+
+
+def test_checksum_matches_spec():
+    assert kraken_book().kraken_checksum() == expected_checksum(ASKS, BIDS)
+
+
+def test_checksum_uses_only_top_ten_levels():
+    asks = [(f'{100 + i}.00000', '1.00000000') for i in range(15)]
+    bids = [(f'{99 - i}.00000', f'{i + 1}.00000000') for i in range(15)]
+    book = kraken_book(asks, bids, depth=None)
+    assert book.kraken_checksum() == expected_checksum(asks, bids)
+    # Changing a level below the top ten must not change the checksum
+    book.apply('bid', '85.00000', '9.00000000')
+    assert book.kraken_checksum() == expected_checksum(asks, bids)
+
+
+def test_checksum_keeps_exchange_string_formatting():
+    book = kraken_book()
+    before = book.kraken_checksum()
+    # Same value, different formatting: Kraken checksums the strings it sent
+    book.apply('ask', '5541.3', '2.507')
+    assert book.kraken_checksum() != before
+
+
+def test_zero_size_removes_level_and_truncate_keeps_depth():
+    book = kraken_book(depth=2)
+    book.apply('ask', '5541.30000', '0.00000000')
+    assert book.best_ask() == 5541.8
+    book.truncate()
+    assert len(book.bids) == 2 and len(book.asks) == 2
+    assert book.best_bid() == 5541.2
+
+
+def test_vwap_fill_walks_levels():
+    price, filled = vwap_from_levels([(10.0, 1.0), (11.0, 1.0)], 1.5)
+    assert filled == 1.5
+    assert price == pytest.approx((10.0 + 0.5 * 11.0) / 1.5)
+    assert vwap_from_levels([(10.0, 1.0)], 2.0) == (10.0, 1.0)
+
+
+def test_kraken_adapter_resyncs_on_checksum_mismatch():
+    pytest.importorskip('websockets')
+    import json
+    from feed_engine import KrakenAdapter
+
+    store = OrderBookStore()
+    adapter = KrakenAdapter(('XBT/USD',), books=store)
+    snapshot = [0, {'as': [list(level) + ['1'] for level in ASKS],
+                    'bs': [list(level) + ['1'] for level in BIDS]}, 'book-10', 'XBT/USD']
+    adapter.parse(json.dumps(snapshot))
+    book = store.get('kraken', 'XBT/USD')
+    assert book.synced
+
+    asks = [('5541.30000', '1.00000000')] + ASKS[1:]
+    good = [0, {'a': [['5541.30000', '1.00000000', '2']], 'c': str(expected_checksum(asks, BIDS))},
+            'book-10', 'XBT/USD']
+    adapter.parse(json.dumps(good))
+    assert book.asks[5541.3] == ('5541.30000', '1.00000000')
+
+    bad = [0, {'a': [['5541.30000', '2.00000000', '3']], 'c': '12345'}, 'book-10', 'XBT/USD']
+    with pytest.raises(ResyncRequired):
+        adapter.parse(json.dumps(bad))
+    assert not book.synced
@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+
+from quote_board import HEADER_SIZE, SEQ, QuoteBoard
+
+
+class TearingBuffer(bytearray):
+    """Board memory where a writer finishes a publish while the first slot copy is taken"""
+
+    def __init__(self, data, publish):
+        super().__init__(data)
+        self.publish = publish
+        self.copies = 0
+
+    def __getitem__(self, key):
+        raw = super().__getitem__(key)
+        self.copies += 1
+        if self.copies == 1:
+            self.publish(self)
+        return raw
+
+
+@pytest.fixture
+def board(tmp_path):
+    board = QuoteBoard(tmp_path / 'board.bin', capacity=4, create=True)
+    yield board
+    board.close()
+
+
+def test_reader_sees_published_quotes_and_generation(board, tmp_path):
+    reader = QuoteBoard.open(tmp_path / 'board.bin')
+    assert reader.generation() == 0 and reader.snapshot() == {}
+
+    board.publish('coinbase', 'BTC-USD', 100.0, 101.0, 1.0, 1.0, 5.0, timestamp=10.0)
+    board.publish('kraken', 'XBT/USD', 99.0, 100.0, 1.0, 1.0, 2.0, timestamp=11.0)
+    board.publish('coinbase', 'BTC-USD', 102.0, 103.0, 1.0, 1.0, 6.0, timestamp=12.0)
+
+    assert reader.generation() == 3
+    snapshot = reader.snapshot()
+    assert snapshot['coinbase']['BTC-USD']['bid'] == 102.0
+    assert snapshot['coinbase']['BTC-USD']['timestamp'] == 12.0
+    assert snapshot['kraken']['XBT/USD']['volume'] == 2.0
+    reader.close()
+
+
+def test_torn_read_is_retried(board):
+    board.publish('coinbase', 'BTC-USD', 100.0, 101.0, 1.0, 1.0, 5.0, timestamp=10.0)
+
+    def publish(mm):
+        # Finish a whole publish behind the reader's back: the slot's sequence moves on
+        board._mm = mm
+        board.publish('coinbase', 'BTC-USD', 200.0, 201.0, 1.0, 0.5, 7.0, timestamp=20.0)
+
+    mapped = board._mm
+    mm = TearingBuffer(mapped[:], publish)
+    board._mm = mm
+    try:
+        exchange, product, quote = board.read_slot(0)
+    finally:
+        board._mm = mapped
+    assert mm.copies == 2
+    assert (exchange, product, quote['bid'], quote['timestamp']) == ('coinbase', 'BTC-USD', 200.0, 20.0)
+
+
+def test_slot_mid_write_is_not_read(board):
+    board.publish('coinbase', 'BTC-USD', 100.0, 101.0, 1.0, 1.0, 5.0)
+    # An odd sequence means a writer is inside the slot; the reader gives up rather than return it
+    seq = SEQ.unpack_from(board._mm, HEADER_SIZE)[0]
+    SEQ.pack_into(board._mm, HEADER_SIZE, seq + 1)
+    assert board.read_slot(0) is None
+    SEQ.pack_into(board._mm, HEADER_SIZE, seq + 2)
+    assert board.read_slot(0)[2]['bid'] == 100.0
+
+
+def test_concurrent_reads_are_never_torn(board):
+    stop = threading.Event()
+
+    def write():
+        price = 0.0
+        while not stop.is_set():
+            price += 1.0
+            board.publish('coinbase', 'BTC-USD', price, price + 1.0, 1.0, 1.0, price, timestamp=price)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        seen = 0
+        while seen < 2000:
+            slot = board.read_slot(0)
+            if slot is None:
+                continue
+            quote = slot[2]
+            assert quote['ask'] - quote['bid'] == 1.0
+            assert quote['volume'] == quote['timestamp'] == quote['bid']
+            seen += 1
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_release_clears_the_slot_and_reuses_it(board):
+    board.publish('coinbase', 'BTC-USD', 100.0, 101.0, 1.0, 1.0, 5.0)
+    board.publish('coinbase', 'ETH-USD', 10.0, 11.0, 1.0, 10.0, 5.0)
+    generation = board.generation()
+
+    assert board.release('coinbase', 'BTC-USD')
+    assert not board.release('coinbase', 'BTC-USD')
+    assert board.generation() == generation + 1
+    assert board.used() == 1
+    assert board.read_slot(0) is None
+    assert list(board.snapshot()['coinbase']) == ['ETH-USD']
+
+    board.publish('kraken', 'XBT/USD', 99.0, 100.0, 1.0, 1.0, 2.0)
+    assert board.read_slot(0)[:2] == ('kraken', 'XBT/USD')
+    assert board.used() == 2
+
+
+def test_full_board_rejects_new_products(board):
+    for i in range(4):
+        assert board.publish('coinbase', f'P{i}', 1.0, 2.0, 1.0, 1.0, 0.0)
+    assert not board.publish('coinbase', 'P4', 1.0, 2.0, 1.0, 1.0, 0.0)
+    assert board.release('coinbase', 'P2')
+    assert board.publish('coinbase', 'P4', 1.0, 2.0, 1.0, 1.0, 0.0)
@@ -0,0 +1,65 @@
+import pickle
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('textblob')
+
+from textblob import TextBlob
+
+from sentiment_batch import BatchSentimentScorer, score_batch
+
+HEADLINES = [
+    "Bitcoin surges to a new all-time high as ETF inflows accelerate",
+    "Ethereum price crashes after a terrible week for DeFi",
+    "This is not a good time to buy, analysts warn",
+    "Very bullish! Extremely happy with these gains!!",
+    "Regulators are never going to approve this awful proposal",
+    "Markets were quiet on Tuesday",
+    "I don't think the rally is sustainable, but it's fun while it lasts",
+    "Is this the best or the worst crypto winter ever?",
+    "Not very good news for miners as fees drop",
+    "",
+    "   ",
+    "BTC",
+    "Incredibly disappointing earnings. Really sad day. Still hopeful though!",
+    "“Amazing” results, says CEO… investors are less impressed",
+]
+
+
+def corpus():
+    """The fixed headlines plus any titles saved by a previous aggregator run"""
+    texts = list(HEADLINES)
+    snapshot = Path(__file__).resolve().parent.parent / 'sentiment_data.pkl'
+    if snapshot.exists():
+        with open(snapshot, 'rb') as f:
+            data = pickle.load(f)
+        texts += [item['text'] for item in data.get('reddit', []) + data.get('news', [])]
+    return texts
+
+
+def test_batch_matches_textblob():
+    texts = corpus()
+    expected = [TextBlob(text).sentiment.polarity for text in texts]
+    assert score_batch(texts).tolist() == pytest.approx(expected, abs=1e-9)
+
+
+def test_batch_is_independent_of_neighbours():
+    texts = HEADLINES
+    together = score_batch(texts).tolist()
+    alone = [score_batch([text])[0] for text in texts]
+    assert together == pytest.approx(alone, abs=1e-12)
+
+
+def test_scorer_process_pool_matches_in_process():
+    texts = HEADLINES * 5
+    scorer = BatchSentimentScorer(parallel_threshold=0, chunk_size=7, max_workers=2)
+    try:
+        pooled = scorer.score(texts)
+    finally:
+        scorer.close()
+    assert pooled == pytest.approx(score_batch(texts).tolist(), abs=1e-12)
+
+
+def test_empty_batch():
+    assert BatchSentimentScorer().score([]) == []
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+from sentiment_fetcher import SentimentFetcher, TokenBucket
+
+
+class StubServer:
+    """Local HTTP server answering from a per-path script of (status, headers, body) responses"""
+
+    def __init__(self):
+        self.requests = []
+        self.scripts = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append((self.path, dict(self.headers), time.monotonic()))
+                script = stub.scripts.get(self.path, [])
+                status, headers, body = script.pop(0) if len(script) > 1 else script[0]
+                if callable(status):
+                    status, headers, body = status(self.headers)
+                payload = json.dumps(body).encode() if body is not None else b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def hits(self, path):
+        return [request for request in self.requests if request[0] == path]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def server():
+    stub = StubServer()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = SentimentFetcher(max_workers=4, timeout=5, backoff=0.05, backoff_max=0.5)
+    yield fetcher
+    fetcher.close()
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate=20.0, capacity=3)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.03
+    for _ in range(4):
+        bucket.acquire()
+    # Four more tokens at 20/s take about 0.2s to refill
+    assert time.monotonic() - start >= 0.18
+
+
+def test_fetch_many_is_throttled_per_host(server):
+    server.scripts['/a'] = [(200, {}, {'ok': True})]
+    host = server.url.split('//', 1)[1]
+    fetcher = SentimentFetcher(max_workers=8, rate_limits={host: (10.0, 2)})
+    start = time.monotonic()
+    try:
+        results = fetcher.fetch_many([f'{server.url}/a'] * 6)
+    finally:
+        fetcher.close()
+    assert all(result.ok for result in results)
+    # Two requests in the burst, then one per 0.1s
+    assert time.monotonic() - start >= 0.39
+
+
+def test_etag_revalidation_serves_cached_body(server, fetcher):
+    def conditional(headers):
+        if headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, None
+        return 200, {'ETag': '"v1"', 'Last-Modified': 'Wed, 14 Oct 2026 10:00:00 GMT'}, {'posts': [1, 2]}
+
+    server.scripts['/feed'] = [(conditional, None, None)]
+    first = fetcher.fetch(f'{server.url}/feed')
+    second = fetcher.fetch(f'{server.url}/feed')
+
+    assert first.status == 200 and not first.not_modified
+    assert second.status == 304 and second.not_modified
+    assert second.data == {'posts': [1, 2]}
+    sent = server.hits('/feed')[1][1]
+    assert sent['If-None-Match'] == '"v1"'
+    assert sent['If-Modified-Since'] == 'Wed, 14 Oct 2026 10:00:00 GMT'
+
+
+def test_retries_transient_errors_with_backoff(server, fetcher):
+    server.scripts['/flaky'] = [(503, {}, None), (502, {}, None), (200, {}, {'ok': True})]
+    result = fetcher.fetch(f'{server.url}/flaky')
+
+    assert result.ok and result.attempts == 3
+    times = [request[2] for request in server.hits('/flaky')]
+    # Backoff of 0.05s, then 0.1s
+    assert times[1] - times[0] >= 0.04
+    assert times[2] - times[1] >= 0.09
+
+
+def test_honours_retry_after_and_gives_up(server):
+    server.scripts['/limited'] = [(429, {'Retry-After': '0.2'}, None)]
+    fetcher = SentimentFetcher(retries=1, backoff=0.01)
+    try:
+        result = fetcher.fetch(f'{server.url}/limited')
+    finally:
+        fetcher.close()
+
+    assert not result.ok and result.status == 429 and result.attempts == 2
+    times = [request[2] for request in server.hits('/limited')]
+    assert times[1] - times[0] >= 0.19
+
+
+def test_client_errors_are_not_retried(server, fetcher):
+    server.scripts['/missing'] = [(404, {}, None)]
+    result = fetcher.fetch(f'{server.url}/missing')
+    assert result.status == 404 and result.attempts == 1
+    assert len(server.hits('/missing')) == 1
@@ -0,0 +1,81 @@
+import pickle
+import threading
+import time
+
+import snapshot
+from snapshot import SnapshotWriter
+
+
+class FlakyWrite:
+    """atomic_write that fails the first `failures` calls and records when each call happened"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+        self.done = threading.Event()
+
+    def __call__(self, path, payload):
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.failures:
+            raise OSError('disk full')
+        path.write_bytes(payload)
+        self.done.set()
+
+
+def test_failed_flush_keeps_updates_pending(tmp_path, monkeypatch):
+    write = FlakyWrite(failures=2)
+    monkeypatch.setattr(snapshot, 'atomic_write', write)
+    state = {'quotes': 1}
+    writer = SnapshotWriter(tmp_path / 'state.pkl', lambda: state, interval=0.5, max_backoff=1.5)
+    shard = writer.counter()
+    writer.mark_dirty(3)
+    shard.mark(2)
+
+    assert writer.flush() == 0
+    assert writer.flush() == 0
+    assert (writer.error_count, writer.consecutive_errors) == (2, 2)
+    assert writer.stats()['pending'] == 5
+    assert shard.flushed == 0
+    assert writer.flush_count == 0 and not (tmp_path / 'state.pkl').exists()
+
+    # The first success writes everything marked so far and clears the failure streak
+    shard.mark()
+    assert writer.flush() == 6
+    assert writer.consecutive_errors == 0 and writer.error_count == 2
+    assert shard.flushed == shard.marked == 3
+    assert writer.stats()['pending'] == 0
+    assert writer.last_flush_updates == 6 and writer.flush_count == 1
+    assert pickle.loads((tmp_path / 'state.pkl').read_bytes()) == state
+    assert writer.flush() == 0
+
+
+def test_backoff_doubles_up_to_the_limit(tmp_path):
+    writer = SnapshotWriter(tmp_path / 'state.pkl', dict, interval=0.5, max_backoff=3.0)
+    delays = []
+    for errors in range(1, 6):
+        writer.consecutive_errors = errors
+        delays.append(writer._backoff())
+    assert delays == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_writer_thread_backs_off_then_recovers(tmp_path, monkeypatch):
+    write = FlakyWrite(failures=2)
+    monkeypatch.setattr(snapshot, 'atomic_write', write)
+    writer = SnapshotWriter(tmp_path / 'state.pkl', lambda: {'ok': True}, interval=0.05, max_updates=1,
+                            max_backoff=1.0).start()
+    try:
+        writer.mark_dirty()
+        # While backing off, more updates than max_updates must not trigger an early retry
+        for _ in range(20):
+            writer.mark_dirty()
+            time.sleep(0.005)
+        assert write.done.wait(5)
+    finally:
+        writer.stop(flush=False)
+
+    first, second, third = write.calls[:3]
+    assert second - first >= 0.045
+    assert third - second >= 0.095
+    assert writer.error_count == 2 and writer.consecutive_errors == 0
+    assert writer.flush_count >= 1
+    assert pickle.loads((tmp_path / 'state.pkl').read_bytes()) == {'ok': True}
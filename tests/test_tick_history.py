@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from tick_history import TickRing
+
+
+def fill(ring, count):
+    for i in range(count):
+        ring.append(float(i), 100.0 + i, 101.0 + 2 * i, 1.0)
+
+
+@pytest.mark.parametrize('count', [0, 5, 16, 23, 40])
+def test_window_matches_sorted_copy(count):
+    ring = TickRing(capacity=16, initial=4)
+    fill(ring, count)
+    kept = np.arange(max(count - 16, 0), count, dtype=np.float64)
+    for seconds in (0, 1, 3, 10, 16, 100):
+        now = count - 1.0
+        ticks = ring.window(seconds, now)
+        expected = kept[kept >= now - seconds]
+        assert ticks['timestamp'].tolist() == expected.tolist()
+        assert ticks['bid'].tolist() == (100.0 + expected).tolist()
+        assert ticks['ask'].tolist() == (101.0 + 2 * expected).tolist()
+
+
+def test_window_inside_one_half_is_a_view():
+    ring = TickRing(capacity=16, initial=16)
+    fill(ring, 20)
+    # The newest four ticks sit at the start of the buffer, before the wrap point
+    ticks = ring.window(3, 19.0)
+    assert ticks['timestamp'].tolist() == [16.0, 17.0, 18.0, 19.0]
+    assert np.shares_memory(ticks['bid'], ring.bid)
+
+
+def test_last_and_summaries_across_wrap():
+    ring = TickRing(capacity=8, initial=8)
+    fill(ring, 13)
+    assert ring.last(3)['timestamp'].tolist() == [10.0, 11.0, 12.0]
+    assert ring.last(50)['timestamp'].tolist() == [float(i) for i in range(5, 13)]
+    # Spread is 1 + i, mid is 100.5 + 1.5 * i
+    assert ring.spread_range(4, 12.0) == (9.0, 13.0)
+    assert ring.mean_mid(4, 12.0) == pytest.approx(100.5 + 1.5 * 10)
+    assert ring.mean_mid(1, 100.0) is None
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from tick_log import INDEX_DTYPE, RECORD, TickLogReader, TickLogWriter, stream_dir
+
+
+def write_ticks(writer, exchange, product, timestamps):
+    for t in timestamps:
+        writer.append(exchange, product, t, t + 0.5, t + 1.0, 1.0)
+
+
+def test_segments_roll_on_size_and_age(tmp_path):
+    writer = TickLogWriter(tmp_path, segment_bytes=10 * RECORD.size, segment_seconds=100, index_every=4)
+    # 25 ticks one second apart fill two segments by size and start a third
+    write_ticks(writer, 'coinbase', 'BTC-USD', np.arange(25, dtype=np.float64))
+    # A tick past the age limit rolls even though the segment has room
+    write_ticks(writer, 'coinbase', 'BTC-USD', [200.0])
+    writer.close()
+
+    segments = sorted(stream_dir(tmp_path, 'coinbase', 'BTC-USD').glob('*.seg'))
+    assert [float(path.stem) for path in segments] == [0.0, 10.0, 20.0, 200.0]
+    assert [path.stat().st_size // RECORD.size for path in segments] == [10, 10, 5, 1]
+
+    # Every fourth record of a segment is indexed, counting from its first
+    index = np.fromfile(segments[1].with_suffix('.idx'), dtype=INDEX_DTYPE)
+    assert index['timestamp'].tolist() == [10.0, 14.0, 18.0]
+    assert index['record'].tolist() == [0, 4, 8]
+
+
+def test_range_reads_match_a_full_scan(tmp_path):
+    rng = np.random.default_rng(1)
+    timestamps = np.sort(rng.uniform(0, 1000, 3000))
+    writer = TickLogWriter(tmp_path, segment_bytes=700 * RECORD.size, segment_seconds=400, index_every=16)
+    write_ticks(writer, 'kraken', 'XBT/USD', timestamps)
+    writer.close()
+
+    reader = TickLogReader(tmp_path)
+    assert reader.streams() == [('kraken', 'XBT_USD')]
+    for t0, t1 in [(0, 1000), (-5, 3), (123.4, 567.8), (399.0, 401.0), (timestamps[700], timestamps[700]),
+                   (999.5, 2000), (2000, 3000)]:
+        ticks = reader.read('kraken', 'XBT/USD', t0, t1)
+        expected = timestamps[(timestamps >= t0) & (timestamps <= t1)]
+        assert ticks['timestamp'].tolist() == expected.tolist()
+        assert ticks['bid'].tolist() == (expected + 0.5).tolist()
+
+
+def test_range_returns_a_view_per_segment(tmp_path):
+    writer = TickLogWriter(tmp_path, segment_bytes=10 * RECORD.size, index_every=4)
+    write_ticks(writer, 'coinbase', 'ETH-USD', np.arange(30, dtype=np.float64))
+    writer.close()
+
+    reader = TickLogReader(tmp_path)
+    views = reader.range('coinbase', 'ETH-USD', 5, 15)
+    assert [view['timestamp'].tolist() for view in views] == [[5.0, 6.0, 7.0, 8.0, 9.0],
+                                                             [10.0, 11.0, 12.0, 13.0, 14.0, 15.0]]
+    assert all(isinstance(view, np.memmap) for view in views)
+    # Inside one segment the read is that segment's view, not a copy
+    assert isinstance(reader.read('coinbase', 'ETH-USD', 21, 24), np.memmap)
+    assert len(reader.read('coinbase', 'missing', 0, 100)) == 0
+
+
+def test_evicted_segments_reopen_and_keep_appending(tmp_path):
+    writer = TickLogWriter(tmp_path, max_open=2)
+    for t in range(5):
+        for product in ('A', 'B', 'C'):
+            writer.append('coinbase', product, float(t), 1.0, 2.0, 0.0)
+    assert len(writer._open) == 2
+    writer.flush()
+    writer.close()
+
+    reader = TickLogReader(tmp_path)
+    for product in ('A', 'B', 'C'):
+        assert reader.read('coinbase', product, 0, 10)['timestamp'].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+        assert len(list(stream_dir(tmp_path, 'coinbase', product).glob('*.seg'))) == 1
+
+
+@pytest.mark.parametrize('t0, t1', [(0, 0), (3, 3)])
+def test_single_tick_ranges(tmp_path, t0, t1):
+    writer = TickLogWriter(tmp_path, index_every=2)
+    write_ticks(writer, 'coinbase', 'BTC-USD', [0.0, 1.0, 2.0, 3.0])
+    writer.close()
+    assert TickLogReader(tmp_path).read('coinbase', 'BTC-USD', t0, t1)['timestamp'].tolist() == [float(t0)]
@@ -0,0 +1,146 @@
+import threading
+import time
+
+import numpy as np
+
+
+class TickRing:
+    """Bounded columnar ring buffer of ticks for a single product.
+
+    Columns are NumPy arrays that start at `initial` ticks and double up to
+    `capacity`, so products that rarely tick stay small. Appending a tick is
+    four scalar stores plus an occasional amortized grow. Once full, the
+    oldest tick is overwritten.
+    """
+
+    def __init__(self, capacity=100_000, initial=1024):
+        self.capacity = capacity
+        self.size = min(initial, capacity)
+        self.timestamp = np.zeros(self.size, dtype=np.float64)
+        self.bid = np.zeros(self.size, dtype=np.float64)
+        self.ask = np.zeros(self.size, dtype=np.float64)
+        self.volume = np.zeros(self.size, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        size = min(self.size * 2, self.capacity)
+        for name in ('timestamp', 'bid', 'ask', 'volume'):
+            grown = np.zeros(size, dtype=np.float64)
+            grown[:self.size] = getattr(self, name)
+            setattr(self, name, grown)
+        # Only full, unwrapped buffers grow, so the next free slot is just past the old end
+        self.head = self.size
+        self.size = size
+
+    def append(self, timestamp, bid, ask, volume):
+        if self.count == self.size and self.size < self.capacity:
+            self._grow()
+        i = self.head
+        self.timestamp[i] = timestamp
+        self.bid[i] = bid
+        self.ask[i] = ask
+        self.volume[i] = volume
+        self.head = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def _halves(self):
+        """Physical (start, stop) ranges holding the ticks, oldest first"""
+        if self.count < self.size or self.head == 0:
+            return ((0, self.count),)
+        return ((self.head, self.size), (0, self.head))
+
+    def _slice(self, column, start):
+        """Ticks from logical position `start` to the newest, oldest first.
+
+        A view unless the range spans the wrap point; then only the range is copied.
+        """
+        parts = []
+        for lo, hi in self._halves():
+            length = hi - lo
+            if start < length:
+                parts.append(column[lo + start:hi])
+            start = max(start - length, 0)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else column[:0]
+
+    def _search(self, timestamp):
+        """Logical position of the first tick at or after timestamp"""
+        position = 0
+        for lo, hi in self._halves():
+            half = self.timestamp[lo:hi]
+            index = int(np.searchsorted(half, timestamp, side='left'))
+            if index < len(half):
+                return position + index
+            position += len(half)
+        return position
+
+    def last(self, n):
+        """The newest n ticks as a dict of arrays"""
+        start = self.count - min(n, self.count)
+        return {name: self._slice(getattr(self, name), start)
+                for name in ('timestamp', 'bid', 'ask', 'volume')}
+
+    def window(self, seconds, now=None):
+        """Ticks from the last `seconds` seconds as a dict of arrays"""
+        if now is None:
+            now = time.time()
+        start = self._search(now - seconds)
+        return {name: self._slice(getattr(self, name), start)
+                for name in ('timestamp', 'bid', 'ask', 'volume')}
+
+    def spread_range(self, seconds, now=None):
+        """(min, max) spread over the window, or None if it is empty"""
+        ticks = self.window(seconds, now)
+        if len(ticks['timestamp']) == 0:
+            return None
+        spread = ticks['ask'] - ticks['bid']
+        return float(spread.min()), float(spread.max())
+
+    def mean_mid(self, seconds, now=None):
+        """Mean mid price over the window, or None if it is empty"""
+        ticks = self.window(seconds, now)
+        if len(ticks['timestamp']) == 0:
+            return None
+        return float(((ticks['bid'] + ticks['ask']) * 0.5).mean())
+
+
+class TickHistory:
+    """Bounded per-(exchange, product) tick history"""
+
+    def __init__(self, capacity=100_000):
+        self.capacity = capacity
+        self.rings = {}
+        self.lock = threading.Lock()
+
+    def append(self, exchange, product, timestamp, bid, ask, volume):
+        """Record a tick; callers that already serialize updates may skip the lock"""
+        ring = self.rings.get((exchange, product))
+        if ring is None:
+            with self.lock:
+                ring = self.rings.setdefault((exchange, product), TickRing(self.capacity))
+        ring.append(timestamp, bid, ask, volume)
+
+    def get(self, exchange, product):
+        return self.rings.get((exchange, product))
+
+    def remove(self, exchange, product):
+        with self.lock:
+            self.rings.pop((exchange, product), None)
+
+    def window(self, exchange, product, seconds, now=None):
+        ring = self.get(exchange, product)
+        return ring.window(seconds, now) if ring is not None else None
+
+    def spread_range(self, exchange, product, seconds, now=None):
+        ring = self.get(exchange, product)
+        return ring.spread_range(seconds, now) if ring is not None else None
+
+    def mean_mid(self, exchange, product, seconds, now=None):
+        ring = self.get(exchange, product)
+        return ring.mean_mid(seconds, now) if ring is not None else None
@@ -0,0 +1,210 @@
+import os
+import re
+import struct
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+# Every tick is a fixed-width little-endian record so segments can be
+# memory-mapped straight into a NumPy structured array.
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('volume', '<f8')
+])
+RECORD = struct.Struct('<4d')
+
+# Sparse index entries: (timestamp, record number) every `index_every` records
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('record', '<i8')
+])
+INDEX = struct.Struct('<dq')
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+# Segment names carry their start time rounded to the microsecond
+NAME_PRECISION = 1e-6
+
+
+def stream_dir(root, exchange, product):
+    """Directory holding the segments for one (exchange, product) stream"""
+    return Path(root) / exchange / re.sub(r'[^A-Za-z0-9.-]', '_', product)
+
+
+class _Segment:
+    def __init__(self, directory, start):
+        self.start = start
+        self.path = directory / f'{start:020.6f}{SEGMENT_SUFFIX}'
+        self.index_path = self.path.with_suffix(INDEX_SUFFIX)
+        self.data = self.index = None
+        self.open()
+        self.records = self.path.stat().st_size // RECORD.size
+        self.bytes = self.records * RECORD.size
+
+    def open(self):
+        """(Re)open both files for appending; a segment can be closed and reopened any number of times"""
+        self.data = open(self.path, 'ab')
+        self.index = open(self.index_path, 'ab')
+
+    @property
+    def is_open(self):
+        return self.data is not None
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.index.close()
+            self.data = self.index = None
+
+
+class TickLogWriter:
+    """Append-only, segmented binary tick log.
+
+    Each (exchange, product) stream gets its own directory of segments.
+    A segment is rolled once it exceeds `segment_bytes` or is older than
+    `segment_seconds`; alongside it a sparse index records the timestamp
+    of every `index_every`-th tick.
+
+    Each open segment holds two file descriptors. At most `max_open`
+    segments stay open: the least recently written one is closed, and it
+    is reopened when its product next ticks. This keeps hundreds of
+    products under the process's file limit.
+    """
+
+    def __init__(self, root, segment_bytes=64 * 1024 * 1024, segment_seconds=3600, index_every=1024, max_open=128):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.index_every = index_every
+        self.max_open = max_open
+        self.segments = {}
+        # Keys of segments with open files, least recently written first
+        self._open = OrderedDict()
+
+    def append(self, exchange, product, timestamp, bid, ask, volume):
+        """Append one tick; not thread-safe, callers serialize writes"""
+        key = (exchange, product)
+        segment = self.segments.get(key)
+        if segment is None or segment.bytes >= self.segment_bytes or timestamp - segment.start >= self.segment_seconds:
+            segment = self._roll(exchange, product, timestamp)
+        elif not segment.is_open:
+            segment.open()
+        self._touch(key)
+
+        if segment.records % self.index_every == 0:
+            segment.index.write(INDEX.pack(timestamp, segment.records))
+        segment.data.write(RECORD.pack(timestamp, bid, ask, volume))
+        segment.records += 1
+        segment.bytes += RECORD.size
+
+    def _touch(self, key):
+        self._open[key] = None
+        self._open.move_to_end(key)
+        while len(self._open) > self.max_open:
+            evicted, _ = self._open.popitem(last=False)
+            self.segments[evicted].close()
+
+    def _roll(self, exchange, product, timestamp):
+        old = self.segments.pop((exchange, product), None)
+        if old is not None:
+            old.close()
+            self._open.pop((exchange, product), None)
+        directory = stream_dir(self.root, exchange, product)
+        directory.mkdir(parents=True, exist_ok=True)
+        segment = _Segment(directory, timestamp)
+        self.segments[(exchange, product)] = segment
+        return segment
+
+    def flush(self):
+        """Push buffered records to the OS so readers can see them"""
+        for key in self._open:
+            segment = self.segments[key]
+            segment.data.flush()
+            segment.index.flush()
+
+    def close(self):
+        for segment in self.segments.values():
+            segment.close()
+        self.segments.clear()
+        self._open.clear()
+
+
+class TickLogReader:
+    """Range queries over a tick log using memory-mapped segments"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def streams(self):
+        """List (exchange, product directory) pairs present in the log"""
+        if not self.root.exists():
+            return []
+        return sorted(
+            (exchange.name, product.name)
+            for exchange in self.root.iterdir() if exchange.is_dir()
+            for product in exchange.iterdir() if product.is_dir()
+        )
+
+    def _segments(self, exchange, product):
+        directory = stream_dir(self.root, exchange, product)
+        if not directory.exists():
+            return []
+        return sorted(
+            (float(path.stem), path)
+            for path in directory.glob(f'*{SEGMENT_SUFFIX}')
+        )
+
+    def _map(self, path):
+        records = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        if records == 0:
+            return None
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(records,))
+
+    def _slice(self, path, records, t0, t1):
+        """Narrow [t0, t1] with the sparse index, then binary search within the block"""
+        lo, hi = 0, len(records)
+        index_path = path.with_suffix(INDEX_SUFFIX)
+        if index_path.exists():
+            index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+            if len(index):
+                i = np.searchsorted(index['timestamp'], t0, side='left') - 1
+                if i >= 0:
+                    lo = int(index['record'][i])
+                j = np.searchsorted(index['timestamp'], t1, side='right')
+                if j < len(index):
+                    hi = min(hi, int(index['record'][j]))
+        timestamps = records['timestamp'][lo:hi]
+        start = lo + int(np.searchsorted(timestamps, t0, side='left'))
+        end = lo + int(np.searchsorted(timestamps, t1, side='right'))
+        return records[start:end]
+
+    def range(self, exchange, product, t0, t1):
+        """Ticks with t0 <= timestamp <= t1 as a list of zero-copy views, one per segment"""
+        segments = self._segments(exchange, product)
+        views = []
+        for n, (start, path) in enumerate(segments):
+            next_start = segments[n + 1][0] if n + 1 < len(segments) else float('inf')
+            if start - NAME_PRECISION > t1 or next_start + NAME_PRECISION < t0:
+                continue
+            records = self._map(path)
+            if records is None:
+                continue
+            view = self._slice(path, records, t0, t1)
+            if len(view):
+                views.append(view)
+        return views
+
+    def read(self, exchange, product, t0=0.0, t1=None):
+        """Ticks in [t0, t1] as one array (copies only when the range spans segments)"""
+        if t1 is None:
+            t1 = time.time()
+        views = self.range(exchange, product, t0, t1)
+        if not views:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        if len(views) == 1:
+            return views[0]
+        return np.concatenate(views)